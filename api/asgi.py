@@ -0,0 +1,235 @@
+"""
+asyncio-native entry point for the convo endpoint, with the same request and
+response contract (and CORS behaviour) as `convo.handler`. Turns run on the
+AsyncOpenAI client, so a worker holds no thread while waiting on the model.
+
+Run it locally with several workers via `python serve.py`.
+"""
+import asyncio
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from api.convo import (
+        CORS_HEADERS, answered_count, parse_turn_request, replay_error, request_error, run_turn,
+        stream_dump_state, turn_usage,
+    )
+    from api.async_turn import handle_turn_async, speculative_turn_async, stream_turn_async
+    from api.replay_cache import IdempotencyMismatch, TurnInProgress, get_replay_cache, idempotency_key
+    from api.session_store import SessionConflict
+    from api.streaming import STREAM_CONTENT_TYPES, encode_event
+    from api.timing import annotate, emit, span, timed_request
+    from api.usage import TEMPLATE, budget_mode, metered, usage_totals
+    from api.startup import load_env
+except ImportError:
+    from convo import (
+        CORS_HEADERS, answered_count, parse_turn_request, replay_error, request_error, run_turn,
+        stream_dump_state, turn_usage,
+    )
+    from async_turn import handle_turn_async, speculative_turn_async, stream_turn_async
+    from replay_cache import IdempotencyMismatch, TurnInProgress, get_replay_cache, idempotency_key
+    from session_store import SessionConflict
+    from streaming import STREAM_CONTENT_TYPES, encode_event
+    from timing import annotate, emit, span, timed_request
+    from usage import TEMPLATE, budget_mode, metered, usage_totals
+    from startup import load_env
+
+# Turns allowed in flight per worker process; further requests wait for a slot.
+DEFAULT_MAX_CONCURRENCY = 256
+
+
+def max_concurrency_from_env() -> int:
+    load_env()
+    return int(os.environ.get("NOORISH_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+
+
+async def run_turn_async(mode, state, theme_state, user_message) -> Tuple[str, Any, Any, Dict[str, Any]]:
+    """Async dispatch for run_turn; modes without an async implementation run on a thread."""
+    if budget_mode() == TEMPLATE:
+        return await asyncio.to_thread(run_turn, mode, state, theme_state, user_message)
+    if mode == "sequential":
+        reply, state, theme_state = await handle_turn_async(state, theme_state, user_message)
+        return reply, state, theme_state, {}
+    if mode in ("speculative", "speculative_both"):
+        reply, state, theme_state, metrics = await speculative_turn_async(
+            state, theme_state, user_message, generate_both=mode == "speculative_both",
+        )
+        return reply, state, theme_state, {"speculation": metrics.to_dict()}
+    return await asyncio.to_thread(run_turn, mode, state, theme_state, user_message)
+
+
+class ConvoApp:
+    """Minimal ASGI application; no framework dependency."""
+
+    def __init__(self, max_concurrency: Optional[int] = None):
+        # None reads NOORISH_MAX_CONCURRENCY on the first request, after .env is loaded.
+        self.max_concurrency = max_concurrency
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        if scope["method"] == "OPTIONS":
+            await self._respond(send, 200, b"")
+            return
+        if scope["method"] != "POST":
+            await self._respond_json(send, 405, {"error": "Method not allowed"})
+            return
+        if self._slots is None:
+            if self.max_concurrency is None:
+                self.max_concurrency = max_concurrency_from_env()
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        async with self._slots:
+            with timed_request() as timer:
+                try:
+                    await self._handle_post(scope, receive, send, timer)
+                finally:
+                    annotate(usage_totals=usage_totals())
+                    emit(timer)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                return b"".join(chunks) or b"{}"
+
+    @staticmethod
+    def _headers(content_type: str, timer=None) -> List[Tuple[bytes, bytes]]:
+        headers = [(b"content-type", content_type.encode())]
+        if content_type != "application/json":
+            headers += [(b"cache-control", b"no-cache"), (b"x-accel-buffering", b"no")]
+        headers += [(name.lower().encode(), value.encode()) for name, value in CORS_HEADERS]
+        if timer is not None:
+            headers += [
+                (b"server-timing", timer.server_timing().encode()),
+                (b"timing-allow-origin", b"*"),
+            ]
+        return headers
+
+    async def _respond(self, send, status: int, body: bytes, content_type="application/json", timer=None):
+        annotate(status=status)
+        await send({"type": "http.response.start", "status": status, "headers": self._headers(content_type, timer)})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _respond_json(self, send, status: int, payload: Dict[str, Any], timer=None):
+        await self._respond(send, status, json.dumps(payload).encode("utf-8"), timer=timer)
+
+    async def _handle_post(self, scope, receive, send, timer):
+        with span("read_body"):
+            body = await self._read_body(receive)
+        headers = dict(scope.get("headers") or [])
+        accept = headers.get(b"accept", b"").decode("latin-1")
+        try:
+            key = idempotency_key(body, headers.get(b"idempotency-key", b"").decode("latin-1"))
+        except ValueError as exc:
+            await self._respond_json(send, 400, {"error": f"Invalid request: {exc}"}, timer)
+            return
+        if key is None:
+            await self._respond_to(send, body, accept, timer)
+            return
+
+        cache = get_replay_cache()
+        while True:
+            try:
+                claim = cache.claim(key, body)
+                if claim.owner:
+                    break
+                with span("replay_wait"):
+                    replay = await claim.wait_async()
+            except (IdempotencyMismatch, TurnInProgress) as exc:
+                status, message = replay_error(exc)
+                await self._respond_json(send, status, {"error": message}, timer)
+                return
+            # None: the first attempt left nothing to replay, so claim the key again.
+            if replay is not None:
+                annotate(replayed=True)
+                await self._respond(send, replay.status, replay.body, replay.content_type, timer)
+                return
+        try:
+            await self._respond_to(send, body, accept, timer, claim)
+        finally:
+            claim.release()
+
+    async def _respond_to(self, send, body: bytes, accept: str, timer, claim=None):
+        try:
+            request = parse_turn_request(body, accept)
+        except Exception as exc:
+            status, message = request_error(exc)
+            out = json.dumps({"error": message}).encode("utf-8")
+        else:
+            if request.stream_format:
+                await self._stream_reply(send, request, timer, claim)
+                return
+            status, out = await self._complete_turn(request)
+        if claim is not None:
+            claim.finish(status, out)
+        await self._respond(send, status, out, timer=timer)
+
+    async def _complete_turn(self, request) -> Tuple[int, bytes]:
+        try:
+            answered_before = answered_count(request.theme_state)
+            with metered(request.theme_state) as meter:
+                with span("turn"):
+                    reply, new_state, new_theme_state, metrics = await run_turn_async(
+                        request.mode, request.conversation_state, request.theme_state, request.user_message
+                    )
+            annotate(advanced=answered_count(new_theme_state) > answered_before)
+            usage = turn_usage(meter, new_theme_state)
+            with span("serialize"):
+                payload = {"content": reply}
+                payload.update(request.dump_state(new_state, new_theme_state))
+                payload["usage"] = usage
+                if metrics:
+                    payload["metrics"] = metrics
+                out = json.dumps(payload).encode("utf-8")
+            annotate(response_bytes=len(out))
+            return 200, out
+        except SessionConflict as exc:
+            return 409, json.dumps({"error": f"Session has moved on; reload it: {exc}"}).encode("utf-8")
+        except Exception as exc:
+            return 500, json.dumps({"error": str(exc)}).encode("utf-8")
+
+    async def _stream_reply(self, send, request, timer, claim=None):
+        fmt = request.stream_format
+        annotate(status=200)
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": self._headers(STREAM_CONTENT_TYPES[fmt], timer),
+        })
+        try:
+            with metered(request.theme_state) as meter:
+                events = stream_turn_async(
+                    request.conversation_state, request.theme_state, request.user_message,
+                    dump_state=stream_dump_state(request, meter),
+                )
+                async for event in events:
+                    frame = encode_event(event, fmt)
+                    if claim is not None and event["type"] == "done":
+                        # Duplicates get the final reply and state, not a second run.
+                        claim.finish(200, frame, STREAM_CONTENT_TYPES[fmt])
+                    await send({"type": "http.response.body", "body": frame, "more_body": True})
+        except Exception as exc:
+            # Headers are already sent, so report the failure in-band.
+            error = encode_event({"type": "error", "error": str(exc)}, fmt)
+            await send({"type": "http.response.body", "body": error, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+
+app = ConvoApp()
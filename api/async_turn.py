@@ -0,0 +1,185 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+try:
+    from api.conversation_state import ConversationState
+    from api.theme_state import ThemeState
+    from api.llm_client import get_async_client
+    from api.prompts import build_prompt
+    from api.speculative import SPECULATION_STATS, SpeculationStats, TurnMetrics
+    from api.state_codec import dump_response_state
+    from api.timing import span
+    from api.fast_turn import plain_reply
+    from api.usage import TEMPLATE, budget_mode, record_usage
+    from api.model_router import route_async
+    from api.turn_steps import (
+        pending_question, skips_classifier, apply_verdict, preview_branch,
+        score_finished_themes, generate_reply_async, finish_turn, reply_kind,
+    )
+    from api.verdict_cache import classify_answer_async, known_verdict, model_verdict_async, accepted_answers
+except ImportError:
+    from conversation_state import ConversationState
+    from theme_state import ThemeState
+    from llm_client import get_async_client
+    from prompts import build_prompt
+    from speculative import SPECULATION_STATS, SpeculationStats, TurnMetrics
+    from state_codec import dump_response_state
+    from timing import span
+    from fast_turn import plain_reply
+    from usage import TEMPLATE, budget_mode, record_usage
+    from model_router import route_async
+    from turn_steps import (
+        pending_question, skips_classifier, apply_verdict, preview_branch,
+        score_finished_themes, generate_reply_async, finish_turn, reply_kind,
+    )
+    from verdict_cache import classify_answer_async, known_verdict, model_verdict_async, accepted_answers
+
+
+async def _verdict(client: Any, state: ConversationState, theme_state: ThemeState, user_message: str) -> Optional[bool]:
+    question = pending_question(state, theme_state)
+    if question is None:
+        return None
+    if skips_classifier(theme_state):
+        return True
+    return await classify_answer_async(client, question, user_message, accepted_answers(theme_state))
+
+
+async def _counted(metrics: TurnMetrics, fn, *args):
+    # Counted once the call actually starts; a task cancelled before then never ran.
+    metrics.llm_calls += 1
+    return await fn(*args)
+
+
+async def handle_turn_async(
+    state: ConversationState,
+    theme_state: ThemeState,
+    user_message: str,
+    client: Optional[Any] = None,
+) -> tuple[str, ConversationState, ThemeState]:
+    """handle_turn on the AsyncOpenAI client; the event loop is free while the model works."""
+    client = client or get_async_client()
+    answered = await _verdict(client, state, theme_state, user_message)
+    state, theme_state = apply_verdict(state, theme_state, user_message, answered)
+    prompt = build_prompt(state, theme_state, user_message)
+    bot_reply = finish_turn(await generate_reply_async(client, prompt), state)
+    return bot_reply, state, theme_state
+
+
+async def speculative_turn_async(
+    state: ConversationState,
+    theme_state: ThemeState,
+    user_message: str,
+    client: Optional[Any] = None,
+    generate_both: bool = False,
+    stats: Optional[SpeculationStats] = None,
+) -> tuple[str, ConversationState, ThemeState, TurnMetrics]:
+    """
+    speculative_turn on the AsyncOpenAI client. Unlike the thread-based version,
+    a losing branch still in flight is actually cancelled.
+    """
+    client = client or get_async_client()
+    stats = stats or SPECULATION_STATS
+    metrics = TurnMetrics()
+    started = time.perf_counter()
+
+    question = pending_question(state, theme_state)
+    answered = known = None
+    if question is not None:
+        if skips_classifier(theme_state):
+            answered = True
+        else:
+            answered, _ = known_verdict(question, user_message, accepted_answers(theme_state))
+            known = answered
+    if question is None or answered is not None:
+        metrics.verdict = known
+        state, theme_state = apply_verdict(state, theme_state, user_message, answered)
+        bot_reply = await generate_reply_async(client, build_prompt(state, theme_state, user_message))
+        metrics.llm_calls = 1
+    else:
+        metrics.speculated = True
+        advance = preview_branch(state, theme_state, user_message, True)
+        verdict_task = asyncio.ensure_future(_counted(metrics, model_verdict_async, client, question, user_message))
+        advance_task = asyncio.ensure_future(_counted(metrics, generate_reply_async, client, advance[2]))
+        stay = stay_task = None
+        if generate_both:
+            stay = preview_branch(state, theme_state, user_message, False)
+            stay_task = asyncio.ensure_future(_counted(metrics, generate_reply_async, client, stay[2]))
+
+        try:
+            metrics.verdict = await verdict_task
+        except BaseException:
+            advance_task.cancel()
+            if stay_task is not None:
+                stay_task.cancel()
+            raise
+        metrics.hit = metrics.verdict
+        loser = stay_task if metrics.verdict else advance_task
+        if loser is not None:
+            if loser.done():
+                metrics.wasted_calls += 1
+            else:
+                loser.cancel()
+        if metrics.verdict:
+            state, theme_state, _ = advance
+            bot_reply = await advance_task
+        elif stay_task is not None:
+            state, theme_state, _ = stay
+            bot_reply = await stay_task
+        else:
+            state, theme_state, prompt = preview_branch(state, theme_state, user_message, False)
+            bot_reply = await generate_reply_async(client, prompt)
+            metrics.llm_calls += 1
+        score_finished_themes(theme_state)
+
+    bot_reply = finish_turn(bot_reply, state)
+    metrics.duration_ms = (time.perf_counter() - started) * 1000
+    stats.record(metrics)
+    return bot_reply, state, theme_state, metrics
+
+
+async def stream_turn_async(
+    state: ConversationState,
+    theme_state: ThemeState,
+    user_message: str,
+    client: Optional[Any] = None,
+    dump_state: Optional[Callable[[ConversationState, ThemeState], Dict[str, Any]]] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Async counterpart of streaming.stream_turn, yielding the same events."""
+    client = client or get_async_client()
+    answered = await _verdict(client, state, theme_state, user_message)
+    state, theme_state = apply_verdict(state, theme_state, user_message, answered)
+    parts = []
+    if budget_mode() == TEMPLATE:
+        # The session's token budget is spent: no reply call.
+        parts.append(plain_reply(state, theme_state, user_message, answered))
+        yield {"type": "delta", "content": parts[0]}
+    else:
+        prompt = build_prompt(state, theme_state, user_message)
+        kind = reply_kind()
+        with span("reply"):
+            response = await route_async(
+                client,
+                kind,
+                messages=[{"role": "user", "content": prompt}],
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            async for chunk in response:
+                if not chunk.choices:
+                    # The closing chunk carries the usage and no choices.
+                    record_usage(kind, chunk)
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield {"type": "delta", "content": delta}
+
+    streamed = "".join(parts)
+    bot_reply = finish_turn(streamed, state)
+    if len(bot_reply) > len(streamed):
+        yield {"type": "delta", "content": bot_reply[len(streamed):]}
+    done = {"type": "done", "content": bot_reply}
+    dump_state = dump_state or (lambda s, t: dump_response_state(s, t, "legacy"))
+    done.update(dump_state(state, theme_state))
+    yield done
@@ -1,33 +1,183 @@
 import json
-from dataclasses import dataclass, field
-from pathlib import Path
-from typing import List, Dict, Any
-from http.server import BaseHTTPRequestHandler
-from openai import OpenAI
-import os
-import dotenv
+import sys
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Optional
 
 try:
     from api.conversation_state import ConversationState
     from api.theme_state import ThemeState
+    from api.llm_client import get_client
+    from api.model_router import route
+    from api.startup import read_asset
+    from api.theme_scoring import ThemeScore, get_theme_scorer
 except ImportError:
     from conversation_state import ConversationState
     from theme_state import ThemeState
+    from llm_client import get_client
+    from model_router import route
+    from startup import read_asset
+    from theme_scoring import ThemeScore, get_theme_scorer
 
-ROOT_DIR = Path(__file__).resolve().parent.parent
-dotenv.load_dotenv(ROOT_DIR / ".env.local")
-dotenv.load_dotenv(ROOT_DIR / ".env")
+# How long the final assessment waits on theme scores still in flight.
+THEME_SCORE_WAIT = 30.0
 
-with open('api/burnout-prompt.txt') as f:
-    burnout_prompt = f.read()
+ZONES = {
+    "Engaged": "You're energized, connected and effective at work.",
+    "Ineffective": "You're starting to doubt your own effectiveness, even if energy and engagement hold up.",
+    "Overextended": "You're running on empty and pushing through on willpower.",
+    "Disengaged": "You've started pulling away from work to protect yourself.",
+    "Burnout": "Exhaustion and detachment have built up together and are wearing down your sense of what you can do.",
+}
+NEXT_STEPS = {
+    "workload": "List everything on your plate and agree with your manager which 30% can stop or wait.",
+    "control": "Pick one recurring decision you should own and ask for it explicitly this week.",
+    "reward": "Write down what you delivered this month and share it with someone who should know.",
+    "community": "Book time with the one colleague who leaves you less drained than before.",
+    "fairness": "Name the specific unfairness and raise it with someone who can act on it.",
+    "values": "Identify the part of the work that conflicts with what matters to you and decide where your line is.",
+}
 
-def get_burnout(state: ConversationState, theme_state: ThemeState) -> str:
-    pass
 
-def main():
-    get_burnout(None, None)
+class InvalidAssessment(ValueError):
+    """The model's output did not match the shape burnout-prompt.txt asks for."""
+
+
+@dataclass
+class BurnoutResult:
+    score_percent: int
+    evaluation_markdown: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def burnout_prompt() -> str:
+    """The scoring prompt, read once per process from next to this module."""
+    return read_asset("burnout-prompt.txt")
+
+
+def transcript(theme_state: ThemeState) -> str:
+    """The respondent's answers, grouped by theme, for the assessment prompt."""
+    lines = []
+    for index, theme in enumerate(theme_state.themes):
+        conversation = theme_state.get_conversation_state(index)
+        if conversation is None or not conversation.answers:
+            continue
+        lines.append(f"## {theme}")
+        for q_index, answer in sorted(conversation.answers.items()):
+            question = conversation.questions[q_index] if q_index < len(conversation.questions) else ""
+            lines.append(f"Q: {question}\nA: {answer}")
+    return "\n".join(lines)
+
+
+def burnout_request(theme_state: ThemeState) -> dict:
+    """Keyword arguments for the assessment chat completion."""
+    return dict(
+        messages=[
+            {"role": "system", "content": burnout_prompt()},
+            {"role": "user", "content": "Here is the completed conversation:\n\n" + transcript(theme_state)},
+        ],
+        response_format={"type": "json_object"},
+        temperature=0.0,
+    )
+
+
+def parse_burnout(content: Optional[str]) -> BurnoutResult:
+    try:
+        data = json.loads(content or "")
+    except (TypeError, ValueError) as exc:
+        raise InvalidAssessment(f"not JSON: {exc}") from None
+    if not isinstance(data, dict):
+        raise InvalidAssessment("expected a JSON object")
+    score = data.get("score_percent")
+    markdown = data.get("evaluation_markdown")
+    if isinstance(score, bool) or not isinstance(score, int) or not 0 <= score <= 100:
+        raise InvalidAssessment(f"score_percent must be an integer 0-100, got {score!r}")
+    if not isinstance(markdown, str) or not markdown.strip():
+        raise InvalidAssessment("evaluation_markdown must be a non-empty string")
+    return BurnoutResult(score_percent=score, evaluation_markdown=markdown)
 
 
+def assess_burnout(theme_state: ThemeState, client: Optional[Any] = None, attempts: int = 2) -> BurnoutResult:
+    """Score a finished survey, asking again when the output doesn't validate."""
+    client = client or get_client()
+    request = burnout_request(theme_state)
+    for attempt in range(attempts):
+        response = route(client, "assessment", **request)
+        try:
+            return parse_burnout(response.choices[0].message.content)
+        except InvalidAssessment:
+            if attempt + 1 == attempts:
+                raise
+    raise InvalidAssessment("no attempts made")
+
+
+def _level(score: float, higher_is_better: bool = False) -> str:
+    level = "HIGH" if score >= 3.5 else "Moderate" if score >= 2.0 else "Low"
+    good, bad = ("🟢", "🔴") if higher_is_better else ("🔴", "🟢")
+    return f"{level} {good if level == 'HIGH' else '🟡' if level == 'Moderate' else bad}"
+
+
+def burnout_zone(exhaustion: float, cynicism: float, efficacy: float) -> str:
+    """Maslach profile from the three dimension scores (0-5)."""
+    tired, detached, ineffective = exhaustion >= 3.0, cynicism >= 3.0, efficacy <= 2.0
+    if tired and detached:
+        return "Burnout"
+    if tired:
+        return "Overextended"
+    if detached:
+        return "Disengaged"
+    if ineffective:
+        return "Ineffective"
+    return "Engaged"
+
+
+def merge_theme_scores(scores: Dict[str, ThemeScore]) -> BurnoutResult:
+    """Assemble the final assessment from per-dimension scores, without another model call."""
+    exhaustion, cynicism, efficacy = (scores[d] for d in ("exhaustion", "cynicism", "efficacy"))
+    zone = burnout_zone(exhaustion.score, cynicism.score, efficacy.score)
+    percent = round((exhaustion.score + cynicism.score + (5 - efficacy.score)) / 15 * 100)
+    status = "🔴 Critical" if zone == "Burnout" else "🟢 Stable" if zone == "Engaged" else "⚠️ At Risk"
+    next_step = NEXT_STEPS.get(
+        cynicism.driver.split()[0].strip(",.:").lower() if cynicism.driver else "",
+        "Pick the one drain you named that you can influence and change one thing about it this week.",
+    )
+    sections = [
+        "# Your Burnout Assessment Results",
+        f"You're in the **{zone}** zone\n{ZONES[zone]}",
+        "## Your Scores",
+        f"**Exhaustion: {exhaustion.score:.1f}/5.0 — {_level(exhaustion.score)}**\n{exhaustion.summary}",
+        f"**Cynicism: {cynicism.score:.1f}/5.0 — {_level(cynicism.score)}**\n{cynicism.summary}",
+        f"**Professional Efficacy: {efficacy.score:.1f}/5.0 — {_level(efficacy.score, True)}**\n{efficacy.summary}",
+        "## Key Drivers\n" + "\n".join(
+            f"- {name}: {s.driver}" for name, s in
+            (("Exhaustion", exhaustion), ("Cynicism", cynicism), ("Efficacy", efficacy)) if s.driver
+        ),
+        f"**Status: {status}**",
+        f"**Next Step:** {next_step}",
+    ]
+    return BurnoutResult(score_percent=percent, evaluation_markdown="\n\n".join(sections))
+
+
+def get_burnout(state: ConversationState, theme_state: ThemeState, client: Optional[Any] = None) -> str:
+    """
+    The assessment as the JSON document burnout-prompt.txt describes. Dimension
+    scores computed in the background as each theme finished are merged; if any
+    is missing, the whole survey is assessed in one call instead.
+    """
+    theme_state.set_conversation_state(theme_state.current_theme_index, state)
+    scores = get_theme_scorer().collect(theme_state, timeout=THEME_SCORE_WAIT)
+    if all(d in scores for d in ("exhaustion", "cynicism", "efficacy")):
+        return json.dumps(merge_theme_scores(scores).to_dict())
+    return json.dumps(assess_burnout(theme_state, client).to_dict())
+
+
+def main():
+    """Score one exported theme_state: python -m api.burnout theme_state.json (or stdin)."""
+    raw = open(sys.argv[1]).read() if len(sys.argv) > 1 else sys.stdin.read()
+    theme_state = ThemeState.from_dict(json.loads(raw))
+    print(assess_burnout(theme_state).evaluation_markdown)
+
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
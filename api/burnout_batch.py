@@ -0,0 +1,250 @@
+"""
+Score a JSONL dump of finished surveys offline.
+
+    python -m api.burnout_batch exports.jsonl scores.jsonl --concurrency 16
+
+Each input line is one JSON object holding a survey in any wire format the
+endpoint accepts ("theme_state", compact "state", or a bare theme_state),
+plus an optional "id" / "request_id" / "session_id". Each output line is
+{"id", "line", "ok", "score_percent", "evaluation_markdown"} or, on failure,
+{"id", "line", "ok": false, "error"}. Output is in completion order.
+
+Lines are read lazily and at most `2 * concurrency` are in flight, so memory
+does not grow with the file. A checkpoint next to the output records the
+first input line not yet known to be written; rerunning the same command
+resumes from there and skips the few later lines that had already finished.
+An output that the checkpoint doesn't tie to this input is never appended
+to: pass --restart to overwrite it.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence, Set, Tuple
+
+try:
+    from api.burnout import assess_burnout
+    from api.llm_gateway import GatewaySettings, LLMGateway, set_gateway
+    from api.state_codec import load_request_state
+    from api.theme_state import ThemeState
+except ImportError:
+    from burnout import assess_burnout
+    from llm_gateway import GatewaySettings, LLMGateway, set_gateway
+    from state_codec import load_request_state
+    from theme_state import ThemeState
+
+CHECKPOINT_SUFFIX = ".checkpoint"
+
+
+class CheckpointMismatch(ValueError):
+    """The output already holds results that its checkpoint doesn't tie to this input."""
+
+
+@dataclass
+class BatchStats:
+    read: int = 0
+    skipped: int = 0
+    ok: int = 0
+    failed: int = 0
+    elapsed_s: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        done = self.ok + self.failed
+        return {
+            "read": self.read,
+            "skipped": self.skipped,
+            "ok": self.ok,
+            "failed": self.failed,
+            "elapsed_s": round(self.elapsed_s, 3),
+            "per_second": round(done / self.elapsed_s, 2) if self.elapsed_s else 0.0,
+        }
+
+
+def record_id(record: Dict[str, Any], line: int) -> str:
+    for key in ("id", "request_id", "session_id"):
+        if record.get(key) is not None:
+            return str(record[key])
+    return str(line)
+
+
+def theme_state_from_record(record: Dict[str, Any]) -> ThemeState:
+    if "state" not in record and "theme_state" not in record:
+        record = {"theme_state": record}
+    _, theme_state, _ = load_request_state(record)
+    return theme_state
+
+
+def score_line(raw: bytes, line: int, client: Optional[Any] = None) -> Dict[str, Any]:
+    """Score one input line; never raises, so a bad record can't stop the batch."""
+    ident = str(line)
+    try:
+        record = json.loads(raw)
+        if not isinstance(record, dict):
+            raise ValueError("each line must be a JSON object")
+        ident = record_id(record, line)
+        result = assess_burnout(theme_state_from_record(record), client)
+    except Exception as exc:
+        return {"id": ident, "line": line, "ok": False, "error": f"{type(exc).__name__}: {exc}"}
+    return {"id": ident, "line": line, "ok": True, **result.to_dict()}
+
+
+def read_lines(path: Path, offset: int, first_line: int) -> Iterator[Tuple[int, int, bytes]]:
+    """Yield (line number, byte offset, raw line) for non-blank lines from `offset` on."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        line = first_line
+        while True:
+            start = f.tell()
+            raw = f.readline()
+            if not raw:
+                return
+            if raw.strip():
+                yield line, start, raw
+            line += 1
+
+
+def load_checkpoint(path: Path, source: Path) -> Tuple[int, int]:
+    """(next line, its byte offset) to resume `source` from; CheckpointMismatch if it isn't for `source`."""
+    try:
+        data = json.loads(path.read_text())
+    except (OSError, ValueError):
+        raise CheckpointMismatch(f"no readable checkpoint at {path}") from None
+    if data.get("input") != str(source.resolve()):
+        raise CheckpointMismatch(f"{path} is for {data.get('input')}, not {source.resolve()}")
+    return int(data["next_line"]), int(data["offset"])
+
+
+def save_checkpoint(path: Path, source: Path, next_line: int, offset: int) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({"input": str(source.resolve()), "next_line": next_line, "offset": offset}))
+    os.replace(tmp, path)
+
+
+def finished_after(output: Path, next_line: int) -> Set[int]:
+    """
+    Lines at or past the checkpoint that are already in the output. Also cuts
+    off a torn last line left by a crash mid-write.
+    """
+    done: Set[int] = set()
+    if not output.exists():
+        return done
+    good_end = 0
+    with open(output, "rb") as f:
+        for raw in f:
+            try:
+                line = json.loads(raw)["line"]
+            except (ValueError, KeyError, TypeError):
+                break
+            good_end += len(raw)
+            if line >= next_line:
+                done.add(line)
+    with open(output, "rb+") as f:
+        f.truncate(good_end)
+    return done
+
+
+def run_batch(
+    source: Path,
+    output: Path,
+    concurrency: int = 8,
+    client: Optional[Any] = None,
+    score: Callable[[bytes, int, Optional[Any]], Dict[str, Any]] = score_line,
+    checkpoint_every: int = 25,
+) -> BatchStats:
+    """
+    Score every line of `source` into `output`, resuming from the checkpoint.
+    Raises CheckpointMismatch rather than mix in results for another input.
+    """
+    checkpoint = output.with_name(output.name + CHECKPOINT_SUFFIX)
+    if output.exists() and output.stat().st_size:
+        resume_line, resume_offset = load_checkpoint(checkpoint, source)
+    else:
+        resume_line, resume_offset = 0, 0
+    skip = finished_after(output, resume_line)
+    # Claim the output for this input before anything is written to it.
+    save_checkpoint(checkpoint, source, resume_line, resume_offset)
+    stats = BatchStats()
+    started = time.perf_counter()
+    window = max(1, concurrency) * 2
+    # Submitted but not yet written: line -> byte offset. The checkpoint is the
+    # earliest of these, or just past the last line read when there are none.
+    open_lines: Dict[int, int] = {}
+    read_up_to = (resume_line, resume_offset)
+
+    def mark() -> Tuple[int, int]:
+        if open_lines:
+            line = min(open_lines)
+            return line, open_lines[line]
+        return read_up_to
+
+    with open(output, "ab") as out, ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        pending: Dict[Future, int] = {}
+        since_checkpoint = 0
+
+        def drain() -> None:
+            nonlocal since_checkpoint
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                out.write(json.dumps(result).encode("utf-8") + b"\n")
+                if result["ok"]:
+                    stats.ok += 1
+                else:
+                    stats.failed += 1
+                del open_lines[pending.pop(future)]
+                since_checkpoint += 1
+            if since_checkpoint >= checkpoint_every:
+                # Results must be on disk before the checkpoint moves past them.
+                out.flush()
+                save_checkpoint(checkpoint, source, *mark())
+                since_checkpoint = 0
+
+        for line, start, raw in read_lines(source, resume_offset, resume_line):
+            read_up_to = (line + 1, start + len(raw))
+            if line in skip:
+                stats.skipped += 1
+                continue
+            stats.read += 1
+            open_lines[line] = start
+            pending[pool.submit(score, raw, line, client)] = line
+            if len(pending) >= window:
+                drain()
+        while pending:
+            drain()
+        out.flush()
+        save_checkpoint(checkpoint, source, *mark())
+
+    stats.elapsed_s = time.perf_counter() - started
+    return stats
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", type=Path)
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--restart", action="store_true", help="ignore any checkpoint and overwrite the output")
+    args = parser.parse_args(argv)
+
+    if args.restart:
+        args.output.unlink(missing_ok=True)
+        args.output.with_name(args.output.name + CHECKPOINT_SUFFIX).unlink(missing_ok=True)
+    # This process is the only caller, so let the gateway admit as many calls as there are workers.
+    settings = GatewaySettings.from_env()
+    set_gateway(LLMGateway(replace(settings, max_concurrency=max(settings.max_concurrency, args.concurrency))))
+    try:
+        stats = run_batch(args.input, args.output, concurrency=args.concurrency)
+    except CheckpointMismatch as exc:
+        print(f"{args.output} holds results for another input ({exc}); rerun with --restart to overwrite it",
+              file=sys.stderr)
+        return 2
+    print(json.dumps(stats.to_dict()), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+Memory-compact, slotted session representation for keeping many live
+sessions in one process.
+
+Survey definitions (themes and questions) are interned: every session of the
+same survey points at one immutable SurveyDef. Per-session data is packed
+into a few arrays: one int per theme for position and flags, and all answers
+joined into a single string with (key, end offset) arrays alongside.
+CompactSession converts losslessly to and from ThemeState and therefore the
+existing to_dict/from_dict and compact wire formats.
+"""
+import threading
+import weakref
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    from api.conversation_state import ConversationState
+    from api.theme_state import ThemeState
+    from api.state_codec import decode_compact, encode_compact
+    from api.survey_templates import survey_fingerprint
+except ImportError:
+    from conversation_state import ConversationState
+    from theme_state import ThemeState
+    from state_codec import decode_compact, encode_compact
+    from survey_templates import survey_fingerprint
+
+_AWAITING = 1
+_DID_ANSWER = 2
+_FLAG_BITS = 2
+_NO_CONVERSATION = -1
+# Answer keys pack (theme index, question index) into one unsigned int.
+_QUESTION_BITS = 16
+
+
+class SurveyDef:
+    """An immutable survey definition, shared by every session that uses it."""
+
+    __slots__ = ("fingerprint", "themes", "theme_questions", "__weakref__")
+
+    def __init__(self, themes: Sequence[str], theme_questions: Sequence[Sequence[str]]):
+        self.themes: Tuple[str, ...] = tuple(themes)
+        self.theme_questions: Tuple[Tuple[str, ...], ...] = tuple(tuple(q) for q in theme_questions)
+        self.fingerprint = survey_fingerprint(self.themes, self.theme_questions)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if hasattr(self, "fingerprint"):
+            raise AttributeError("SurveyDef is immutable")
+        object.__setattr__(self, name, value)
+
+
+_SURVEYS: "weakref.WeakValueDictionary[str, SurveyDef]" = weakref.WeakValueDictionary()
+_surveys_lock = threading.Lock()
+
+
+def intern_survey(themes: Sequence[str], theme_questions: Sequence[Sequence[str]]) -> SurveyDef:
+    """The shared SurveyDef for this content; dropped once no session uses it."""
+    survey = SurveyDef(themes, theme_questions)
+    with _surveys_lock:
+        existing = _SURVEYS.get(survey.fingerprint)
+        if existing is not None:
+            return existing
+        _SURVEYS[survey.fingerprint] = survey
+    return survey
+
+
+class CompactSession:
+    __slots__ = (
+        "survey", "template", "theme_index", "addressed", "positions",
+        "answer_keys", "answer_ends", "answer_text", "summaries", "theme_scores",
+        "usage",
+    )
+
+    def __init__(
+        self,
+        survey: SurveyDef,
+        template: str = "",
+        theme_index: int = 0,
+        addressed: int = 0,
+        positions: Optional[array] = None,
+        answer_keys: Optional[array] = None,
+        answer_ends: Optional[array] = None,
+        answer_text: str = "",
+        summaries: Optional[Dict[str, str]] = None,
+        theme_scores: Optional[Dict[str, Dict[str, Any]]] = None,
+        usage: Optional[Dict[str, Dict[str, int]]] = None,
+    ):
+        self.survey = survey
+        self.template = template
+        self.theme_index = theme_index
+        # Bit i set: theme i has been addressed.
+        self.addressed = addressed
+        # Per theme: (current_index << 2 | flags), or -1 if it has no conversation yet.
+        self.positions = positions if positions is not None else array("i", [_NO_CONVERSATION] * len(survey.themes))
+        self.answer_keys = answer_keys if answer_keys is not None else array("I")
+        self.answer_ends = answer_ends if answer_ends is not None else array("I")
+        self.answer_text = answer_text
+        # Usually empty, so only kept when there is something to keep.
+        self.summaries = summaries or None
+        self.theme_scores = theme_scores or None
+        self.usage = usage or None
+
+    @classmethod
+    def from_theme_state(cls, theme_state: ThemeState) -> "CompactSession":
+        """
+        Pack a ThemeState. Raises ValueError for states that don't follow the
+        survey they claim (a conversation with other questions, say), since
+        those could not be restored exactly.
+        """
+        survey = intern_survey(theme_state.themes, theme_state.theme_questions)
+        addressed = 0
+        for idx, name in theme_state.themes_addressed.items():
+            if not 0 <= idx < len(survey.themes) or survey.themes[idx] != name:
+                raise ValueError(f"Addressed theme {idx} does not match the survey")
+            addressed |= 1 << idx
+        positions = array("i", [_NO_CONVERSATION] * len(survey.themes))
+        keys, ends, parts, end = array("I"), array("I"), [], 0
+        for idx, conv in theme_state.conversations.items():
+            if not 0 <= idx < len(survey.themes) or tuple(conv.questions) != survey.theme_questions[idx]:
+                raise ValueError(f"Conversation {idx} does not match the survey")
+            flags = (_AWAITING if conv.awaiting_answer else 0) | (_DID_ANSWER if conv.did_answer else 0)
+            positions[idx] = conv.current_index << _FLAG_BITS | flags
+            for q, answer in conv.answers.items():
+                keys.append(idx << _QUESTION_BITS | q)
+                end += len(answer)
+                ends.append(end)
+                parts.append(answer)
+        return cls(
+            survey,
+            template=theme_state.template,
+            theme_index=theme_state.current_theme_index,
+            addressed=addressed,
+            positions=positions,
+            answer_keys=keys,
+            answer_ends=ends,
+            answer_text="".join(parts),
+            summaries=dict(theme_state.summaries),
+            theme_scores=dict(theme_state.theme_scores),
+            usage=dict(theme_state.usage),
+        )
+
+    def answers(self, theme_index: int) -> Dict[int, str]:
+        answers, start = {}, 0
+        for key, end in zip(self.answer_keys, self.answer_ends):
+            if key >> _QUESTION_BITS == theme_index:
+                answers[key & ((1 << _QUESTION_BITS) - 1)] = self.answer_text[start:end]
+            start = end
+        return answers
+
+    def to_theme_state(self) -> ThemeState:
+        survey = self.survey
+        theme_questions: List[List[str]] = [list(q) for q in survey.theme_questions]
+        theme_state = ThemeState(
+            themes=list(survey.themes),
+            theme_questions=theme_questions,
+            current_theme_index=self.theme_index,
+            template=self.template,
+            summaries=dict(self.summaries or {}),
+            theme_scores=dict(self.theme_scores or {}),
+            usage=dict(self.usage or {}),
+        )
+        for idx, name in enumerate(survey.themes):
+            if self.addressed >> idx & 1:
+                theme_state.themes_addressed[idx] = name
+        for idx, packed in enumerate(self.positions):
+            if packed == _NO_CONVERSATION:
+                continue
+            theme_state.conversations[idx] = ConversationState(
+                questions=theme_questions[idx],
+                current_index=packed >> _FLAG_BITS,
+                answers=self.answers(idx),
+                awaiting_answer=bool(packed & _AWAITING),
+                did_answer=bool(packed & _DID_ANSWER),
+            )
+        return theme_state
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CompactSession":
+        return cls.from_theme_state(ThemeState.from_dict(data))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self.to_theme_state().to_dict()
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> "CompactSession":
+        """From the compact wire format (see state_codec.encode_compact)."""
+        return cls.from_theme_state(decode_compact(payload)[1])
+
+    def to_payload(self) -> Dict[str, Any]:
+        return encode_compact(self.to_theme_state())
@@ -1,244 +1,366 @@
 import json
-from pathlib import Path
 from http.server import BaseHTTPRequestHandler
-from openai import OpenAI
-import os
-import dotenv
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
 
 try:
     from api.conversation_state import ConversationState
     from api.theme_state import ThemeState
     from api.does_answer import does_answer, too_short
+    from api.verdict_cache import classify_answer, accepted_answers
     from api.burnout import get_burnout
+    from api.llm_client import get_client
+    from api.prompts import build_prompt
+    from api.speculative import speculative_turn
+    from api.state_codec import load_request_state, dump_response_state
+    from api.survey_templates import BURNOUT_V1
+    from api.session_store import SessionConflict, SessionNotFound, wants_session, open_session
+    from api.timing import annotate, current_timer, emit, span, timed_request
+    from api.streaming import STREAM_FORMATS, STREAM_CONTENT_TYPES, stream_turn, encode_event
+    from api.structured_turn import structured_turn
+    from api.replay_cache import IdempotencyMismatch, TurnInProgress, get_replay_cache, idempotency_key
+    from api.fast_turn import fast_turn
+    from api.multi_answer import extract_turn
+    from api.usage import TEMPLATE, UsageMeter, budget_mode, metered, usage_totals
+    from api.turn_steps import (
+        pending_question, skips_classifier, apply_verdict, generate_reply, finish_turn,
+    )
 except ImportError:
     from conversation_state import ConversationState
     from theme_state import ThemeState
     from does_answer import does_answer, too_short
+    from verdict_cache import classify_answer, accepted_answers
     from burnout import get_burnout
+    from llm_client import get_client
+    from prompts import build_prompt
+    from speculative import speculative_turn
+    from state_codec import load_request_state, dump_response_state
+    from survey_templates import BURNOUT_V1
+    from session_store import SessionConflict, SessionNotFound, wants_session, open_session
+    from timing import annotate, current_timer, emit, span, timed_request
+    from streaming import STREAM_FORMATS, STREAM_CONTENT_TYPES, stream_turn, encode_event
+    from structured_turn import structured_turn
+    from replay_cache import IdempotencyMismatch, TurnInProgress, get_replay_cache, idempotency_key
+    from fast_turn import fast_turn
+    from multi_answer import extract_turn
+    from usage import TEMPLATE, UsageMeter, budget_mode, metered, usage_totals
+    from turn_steps import (
+        pending_question, skips_classifier, apply_verdict, generate_reply, finish_turn,
+    )
 
-# Load .env.local first (local dev) and fall back to a standard .env if present.
-ROOT_DIR = Path(__file__).resolve().parent.parent
-dotenv.load_dotenv(ROOT_DIR / ".env.local")
-dotenv.load_dotenv(ROOT_DIR / ".env")
 
-def build_prompt(state: ConversationState, theme_state: ThemeState, user_message: str) -> str:
+def handle_turn(
+    state: ConversationState,
+    theme_state: ThemeState,
+    user_message: str,
+    client: Optional[Any] = None,
+) -> tuple[str, ConversationState, ThemeState]:
     """
-    Build an instruction for the LLM.
-    The LLM's goal is to be friendly but always move toward the next question.
+    Update state with the latest user response. Then ask the next question conversationally.
+    Pass `client` to override the shared, connection-pooled client (e.g. with a fake in tests).
     """
-    # Current and remaining questions
-    if state.complete:
-        current_q = None
-        remaining = []
-    else:
-        current_q = state.questions[state.current_index]
-        remaining = state.questions[state.current_index + 1:]
-
-    current_theme = theme_state.current_theme if not state.complete else theme_state.current_theme
-
-    previous_qas = []
-    for i in sorted(state.answers.keys()):
-        a = state.answers[i]
-        question = state.questions[i] if i < len(state.questions) else f"Question {i + 1}"
-        theme_label = theme_state.current_theme
-        if theme_label:
-            previous_qas.append(f"[{theme_label}] Q: {question}\nA: {a}")
-        else:
-            previous_qas.append(f"Q: {question}\nA: {a}")
-    previous_block = "\n\n".join(previous_qas) if previous_qas else "None yet."
-
-    prompt = f"""
-        You are a super emphathtic and highly emotionally intelligent interviewer running a structured conversation.
-        Your main goal is to make sure the user answers each question in a list of questions.
-        When you get a reply from a user to an answer, apply your best judgement to determine whether the user actually addressed the question or not. 
+    # Reuse the warm instance's pooled client instead of a fresh TLS handshake per turn
+    client = client or get_client()
+
+    question = pending_question(state, theme_state)
+    answered = None
+    if question is not None:
+        #print(question, user_message)
+        # if too_short(client, question, user_message):
+        #     state.did_answer = False
+        #     if not state.current_index in state.answers:
+        #         state.answers[state.current_index] = ''
+        #     state.answers[state.current_index] += ' ' + user_message + ". "
+        #     return "thanks for sharing that, do you mind elaborating a bit?", state
+        answered = skips_classifier(theme_state) or classify_answer(
+            client, question, user_message, accepted_answers(theme_state)
+        )
 
-        Be warm and conversational. Acknowledge what the user said. 
+    state, theme_state = apply_verdict(state, theme_state, user_message, answered)
 
-        Conversation context:
-        Previous questions and answers:
-        {previous_block}
+    # Build system-style prompt
+    prompt = build_prompt(state, theme_state, user_message)
+    bot_reply = finish_turn(generate_reply(client, prompt), state)
 
-        Last user message:
-        {user_message}
+    return bot_reply, state, theme_state
 
-        {"All questions have already been answered. Thank the user and briefly summarize their answers." if state.complete else ""}
 
-        {"Current theme: " + current_theme if current_theme else ""}
+def answered_count(theme_state: ThemeState) -> int:
+    return sum(len(conv.answers) for conv in theme_state.conversations.values())
+
+
+TURN_MODES = ("sequential", "speculative", "speculative_both", "structured", "fast", "extract")
+
+
+def run_turn(
+    mode: str,
+    state: ConversationState,
+    theme_state: ThemeState,
+    user_message: str,
+    client: Optional[Any] = None,
+) -> tuple[str, ConversationState, ThemeState, Dict[str, Any]]:
+    """Dispatch a turn to the selected mode. Returns the reply, states and per-turn metrics."""
+    if budget_mode() == TEMPLATE:
+        # The session's token budget is spent; whatever the mode, reply without the model.
+        reply, state, theme_state, metrics = fast_turn(
+            state, theme_state, user_message, client=client, template_only=True,
+        )
+        return reply, state, theme_state, {"fast": metrics}
+    if mode == "sequential":
+        reply, state, theme_state = handle_turn(state, theme_state, user_message, client=client)
+        return reply, state, theme_state, {}
+    if mode in ("speculative", "speculative_both"):
+        reply, state, theme_state, metrics = speculative_turn(
+            state, theme_state, user_message, client=client,
+            generate_both=mode == "speculative_both",
+        )
+        return reply, state, theme_state, {"speculation": metrics.to_dict()}
+    if mode == "structured":
+        reply, state, theme_state, metrics = structured_turn(state, theme_state, user_message, client=client)
+        return reply, state, theme_state, {"structured": metrics}
+    if mode == "fast":
+        reply, state, theme_state, metrics = fast_turn(state, theme_state, user_message, client=client)
+        return reply, state, theme_state, {"fast": metrics}
+    if mode == "extract":
+        reply, state, theme_state, metrics = extract_turn(state, theme_state, user_message, client=client)
+        return reply, state, theme_state, {"extract": metrics}
+    raise ValueError(f"Unknown turn mode: {mode}")
+
+
+CORS_HEADERS = (
+    ("Access-Control-Allow-Origin", "*"),
+    ("Access-Control-Allow-Methods", "POST, OPTIONS"),
+    ("Access-Control-Allow-Headers", "Content-Type, Idempotency-Key"),
+)
+
+
+def stream_format_for(data: Dict[str, Any], accept: str = "") -> Optional[str]:
+    """Pick the streaming format from the body (`stream`) or the Accept header."""
+    requested = data.get("stream")
+    if requested is True:
+        return "sse"
+    if requested in STREAM_FORMATS:
+        return requested
+    if requested in (None, False) and "text/event-stream" in (accept or ""):
+        return "sse"
+    if requested not in (None, False):
+        raise ValueError(f"Unknown stream format: {requested}")
+    return None
+
+
+@dataclass
+class TurnRequest:
+    """A parsed POST body, shared by the HTTP handler and the ASGI app."""
+    user_message: str
+    mode: str
+    stream_format: Optional[str]
+    conversation_state: ConversationState
+    theme_state: ThemeState
+    # Serializes the post-turn states into the response (or commits them to the session store)
+    dump_state: Callable[[ConversationState, ThemeState], Dict[str, Any]]
+
+
+def parse_turn_request(body: bytes, accept: str = "") -> TurnRequest:
+    """
+    Parse and validate a turn request. Raises SessionNotFound, SessionConflict,
+    or any other exception for a malformed body.
+    """
+    with span("parse"):
+        data = json.loads(body.decode("utf-8"))
+    user_message = data.get("content", "")
+    mode = data.get("mode") or "sequential"
+    annotate(mode=mode, request_bytes=len(body))
+    if mode not in TURN_MODES:
+        raise ValueError(f"Unknown turn mode: {mode}")
+    stream_format = stream_format_for(data, accept)
+    if stream_format and mode != "sequential":
+        raise ValueError("Streaming is only available in sequential mode")
+    with span("load_state"):
+        if wants_session(data):
+            session = open_session(data)
+            conversation_state, theme_state = session.state, session.theme_state
+            dump_state = lambda s, t: session.commit(t)
+        else:
+            conversation_state, theme_state, state_format = load_request_state(data)
+            dump_state = lambda s, t: dump_response_state(s, t, state_format)
+    return TurnRequest(user_message, mode, stream_format, conversation_state, theme_state, dump_state)
 
-        {"Current question you want them to answer next: " + current_q if current_q else ""}
 
-        Remaining questions after that:
-        {remaining}
+def request_error(exc: Exception) -> tuple[int, str]:
+    """Status code and message for a request that failed to parse."""
+    if isinstance(exc, SessionNotFound):
+        return 404, f"Unknown or expired session: {exc}"
+    if isinstance(exc, SessionConflict):
+        return 409, f"Session has moved on; reload it: {exc}"
+    return 400, f"Invalid request: {exc}"
 
-        Instructions:
-        - If there is a current question, make sure your reply clearly includes a paraphrase of that question in natural language. 
-        - Do not repeat the question verbatim. Instead rephrase it differently but keep the same meaning. 
-        - If the user answers very shortly ask for clarification
-        """
-    return prompt.strip()
 
-def handle_turn(state: ConversationState, theme_state: ThemeState, user_message: str) -> tuple[str, ConversationState, ThemeState]:
-    """
-    Update state with the latest user response. Then ask the next question conversationally.
-    """
-    # Only record an answer if we previously asked for one
-    client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-
-    # If this is the very first turn and no flag was set, expect an answer
-    if not state.awaiting_answer and not state.answers and state.current_index == 0:
-        state.awaiting_answer = True
-
-    if (
-        state.awaiting_answer
-        and not state.complete
-        and state.current_index not in state.answers
-    ):
-        #print(state.questions[state.current_index], user_message)
-        # if too_short(client, state.questions[state.current_index], user_message):
-        #     state.did_answer = False
-        #     if not state.current_index in state.answers:
-        #         state.answers[state.current_index] = ''
-        #     state.answers[state.current_index] += ' ' + user_message + ". "
-        #     return "thanks for sharing that, do you mind elaborating a bit?", state
-        
-        # don't check chitchat theme for does answer
-        if theme_state.current_theme == 'chitchat' or does_answer(client, state.questions[state.current_index], user_message):
-            state.answers[state.current_index] = user_message + '.'
-            state.current_index += 1
-            state.did_answer = True
-        else:
-            state.did_answer = False
-
-    # Persist the latest state for the current theme
-    theme_state.set_conversation_state(theme_state.current_theme_index, state)
-
-    # If we finished this theme and there is another theme, move to the next one
-    if state.complete:
-        theme_state.mark_current_addressed()
-        if theme_state.has_more_themes():
-            theme_state.advance_theme()
-            # Resume a prior conversation for this theme if it exists; otherwise start fresh
-            existing = theme_state.get_conversation_state(theme_state.current_theme_index)
-            if existing:
-                state = existing
-            else:
-                state = ConversationState(
-                    questions=theme_state.current_questions,
-                    current_index=0,
-                    answers={},
-                    awaiting_answer=True,
-                    did_answer=False,
-                )
-                theme_state.set_conversation_state(theme_state.current_theme_index, state)
-    # Build system-style prompt
-    prompt = build_prompt(state, theme_state, user_message)
+def turn_usage(meter: UsageMeter, theme_state: ThemeState) -> Dict[str, Any]:
+    """Add the turn's token usage to the session and return what the response reports about it."""
+    usage = meter.summary()
+    meter.commit(theme_state)
+    annotate(turn_tokens=usage["turn"]["total_tokens"], session_tokens=usage["session_tokens"], budget=usage["budget"])
+    return usage
 
-    # Call the model. Using chat completions for stability on Vercel.
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
-    )
 
-    bot_reply = response.choices[0].message.content
+def stream_dump_state(request: TurnRequest, meter: UsageMeter):
+    """dump_state for stream_turn: charges the turn to the session and adds usage to the done event."""
+    def dump(state: ConversationState, theme_state: ThemeState) -> Dict[str, Any]:
+        usage = turn_usage(meter, theme_state)
+        return dict(request.dump_state(state, theme_state), usage=usage)
+    return dump
 
-    # We just asked the next question (if any); expect an answer next turn
-    state.awaiting_answer = not state.complete
 
-    if state.complete:
-        bot_reply += " Thanks for completing the survey, next steps to follow..."
+def replay_error(exc: Exception) -> tuple[int, str]:
+    """Status code and message for an idempotency key that can't be served."""
+    if isinstance(exc, IdempotencyMismatch):
+        return 422, str(exc)
+    return 409, f"A request with this idempotency key is still in progress: {exc}"
 
-    return bot_reply, state, theme_state
 
-    
 class handler(BaseHTTPRequestHandler):
     # Vercel may return errors before hitting handler methods; ensure CORS on all paths.
     server_version = "NoorishServer/1.0"
 
     def end_headers(self):
         # Always attach CORS headers, even on errors.
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.send_header("Access-Control-Allow-Methods", "POST, OPTIONS")
-        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        for name, value in CORS_HEADERS:
+            self.send_header(name, value)
+        timer = current_timer()
+        if timer is not None:
+            self.send_header("Server-Timing", timer.server_timing())
+            self.send_header("Timing-Allow-Origin", "*")
         super().end_headers()
 
-    def _set_headers(self, status=200):
+    def _set_headers(self, status=200, content_type="application/json"):
+        annotate(status=status)
         self.send_response(status)
-        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Type", content_type)
+        if content_type != "application/json":
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("X-Accel-Buffering", "no")
         self.end_headers()
 
+    def _write_error(self, status, message):
+        self._set_headers(status)
+        self.wfile.write(json.dumps({"error": message}).encode("utf-8"))
+
+    def _stream_reply(self, request: TurnRequest, claim=None):
+        fmt = request.stream_format
+        self._set_headers(200, STREAM_CONTENT_TYPES[fmt])
+        try:
+            with metered(request.theme_state) as meter:
+                events = stream_turn(
+                    request.conversation_state, request.theme_state, request.user_message,
+                    dump_state=stream_dump_state(request, meter),
+                )
+                for event in events:
+                    frame = encode_event(event, fmt)
+                    if claim is not None and event["type"] == "done":
+                        # Duplicates get the final reply and state, not a second run.
+                        claim.finish(200, frame, STREAM_CONTENT_TYPES[fmt])
+                    self.wfile.write(frame)
+                    self.wfile.flush()
+        except Exception as exc:
+            # Headers are already sent, so report the failure in-band.
+            self.wfile.write(encode_event({"type": "error", "error": str(exc)}, fmt))
+
     def do_OPTIONS(self):
         self._set_headers(200)
 
     def do_POST(self):
-        length = int(self.headers.get("Content-Length", 0))
-        body = self.rfile.read(length) if length else b"{}"
+        # One timer per request: feeds the Server-Timing header and the structured log line.
+        with timed_request() as timer:
+            try:
+                self._handle_post()
+            finally:
+                annotate(usage_totals=usage_totals())
+                emit(timer)
+
+    def _handle_post(self):
+        with span("read_body"):
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length) if length else b"{}"
 
-        conversation_state = ConversationState(questions=[])
-        theme_state = ThemeState(themes=[], theme_questions=[])
         try:
-            data = json.loads(body.decode("utf-8"))
-            user_message = data.get("content", "")
-            raw_state = data.get("conversation_state", {})
-            raw_theme = data.get("theme_state", {})
-            if isinstance(raw_state, str):
-                raw_state = json.loads(raw_state or "{}")
-            if isinstance(raw_theme, str):
-                raw_theme = json.loads(raw_theme or "{}")
-            conversation_state = ConversationState.from_dict(raw_state)
-            theme_state = ThemeState.from_dict(raw_theme)
-
-            # If no questions present, pull them from the current theme.
-            if not conversation_state.questions and theme_state.theme_questions:
-                conversation_state.questions = theme_state.current_questions
-            # Track conversation state per theme
-            theme_state.set_conversation_state(theme_state.current_theme_index, conversation_state)
-        except Exception as exc:
-            # If parsing fails for any other reason, surface a clear error
-            self._set_headers(400)
-            self.wfile.write(
-                json.dumps({"error": f"Invalid request: {exc}"}).encode("utf-8")
-            )
+            key = idempotency_key(body, self.headers.get("Idempotency-Key"))
+        except ValueError as exc:
+            self._write_error(400, f"Invalid request: {exc}")
+            return
+        if key is None:
+            self._respond_to(body)
             return
 
+        cache = get_replay_cache()
+        while True:
+            try:
+                claim = cache.claim(key, body)
+                if claim.owner:
+                    break
+                with span("replay_wait"):
+                    replay = claim.wait()
+            except (IdempotencyMismatch, TurnInProgress) as exc:
+                self._write_error(*replay_error(exc))
+                return
+            # None: the first attempt left nothing to replay, so claim the key again.
+            if replay is not None:
+                annotate(replayed=True)
+                self._set_headers(replay.status, replay.content_type)
+                self.wfile.write(replay.body)
+                return
         try:
-            reply, new_state, new_theme_state = handle_turn(conversation_state, theme_state, user_message)
+            self._respond_to(body, claim)
+        finally:
+            claim.release()
+
+    def _respond_to(self, body: bytes, claim=None):
+        try:
+            request = parse_turn_request(body, self.headers.get("Accept") or "")
+        except Exception as exc:
+            # If parsing fails for any reason, surface a clear error
+            status, message = request_error(exc)
+            out = json.dumps({"error": message}).encode("utf-8")
+        else:
+            if request.stream_format:
+                self._stream_reply(request, claim)
+                return
+            status, out = self._complete_turn(request)
+        if claim is not None:
+            claim.finish(status, out)
+        self._set_headers(status)
+        self.wfile.write(out)
+
+    def _complete_turn(self, request: TurnRequest) -> tuple[int, bytes]:
+        try:
+            answered_before = answered_count(request.theme_state)
+            with metered(request.theme_state) as meter:
+                with span("turn"):
+                    reply, new_state, new_theme_state, metrics = run_turn(
+                        request.mode, request.conversation_state, request.theme_state, request.user_message
+                    )
+            annotate(advanced=answered_count(new_theme_state) > answered_before)
+            usage = turn_usage(meter, new_theme_state)
             #print("new_state", new_state)
-            self._set_headers(200)
-            self.wfile.write(
-                json.dumps(
-                    {
-                        "content": reply,
-                        "conversation_state": new_state.to_dict(),
-                        "theme_state": new_theme_state.to_dict(),
-                    }
-                ).encode("utf-8")
-            )
+            with span("serialize"):
+                payload = {"content": reply}
+                payload.update(request.dump_state(new_state, new_theme_state))
+                payload["usage"] = usage
+                if metrics:
+                    payload["metrics"] = metrics
+                out = json.dumps(payload).encode("utf-8")
+            annotate(response_bytes=len(out))
+            return 200, out
+        except SessionConflict as exc:
+            return 409, json.dumps({"error": f"Session has moved on; reload it: {exc}"}).encode("utf-8")
         except Exception as exc:
             # Always return CORS headers, even on failure
-            self._set_headers(500)
-            self.wfile.write(json.dumps({"error": str(exc)}).encode("utf-8"))
+            return 500, json.dumps({"error": str(exc)}).encode("utf-8")
 
 def main():
-    themes=["chitchat", "Exhaustion", "Depersonalization", "Professional efficacy"]
-    theme_questions = [
-        # Chitchat
-        ["Hi, I’d love to ask you a few questions to understand your situation better."],
-        # Exhaustion
-        ['Tell me about the last time you felt completely wiped out. What was happening that day?', 
-         'When you hit that wiped-out feeling, what drains fastest: your patience with people, your physical energy, or your ability to think clearly?'],
-        # Depersonalization
-        ['These days, what part of work makes you want to just check out or stop caring?'],
-        # Professional efficacy
-        ['When you think about your actual skills and what you can do—not how you feel—how confident are you that you\'re still good at your work?',
-         'Looking back over the last few months, is this feeling getting better, staying the same, or getting worse?']
-    ]
-    theme_state = ThemeState(themes=themes, theme_questions=theme_questions)
-
-    
-    state = ConversationState(questions=theme_state.current_questions)
-    theme_state.set_conversation_state(theme_state.current_theme_index, state)
-
-    print(theme_questions[0][0])
+    theme_state = BURNOUT_V1.new_theme_state()
+    state = theme_state.get_conversation_state(theme_state.current_theme_index)
+
+    print(state.questions[0])
         
     while True:
         user_message = input("You: ")
@@ -250,7 +372,8 @@ def main():
         
         if state.complete:
             print("\nBot: That was the last question. Thanks for sharing all of that with me.")
-            print(get_burnout(state))
+            print(get_burnout(state, theme_state))
+            break
 
 
 if __name__ == "__main__":
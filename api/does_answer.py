@@ -1,5 +1,13 @@
+try:
+    from api.llm_client import get_client, get_async_client
+    from api.model_router import route, route_async
+except ImportError:
+    from llm_client import get_client, get_async_client
+    from model_router import route, route_async
+
+
 def too_short(client, question: str, answer: str) -> bool:
-    
+    client = client or get_client()
     prompt = (
         f"Consider the following question and answer pair: \n"
         f"Question: {question}\n"
@@ -10,8 +18,9 @@ def too_short(client, question: str, answer: str) -> bool:
         #"explain your reasoning\n"
         "Respond with only 'too short' or 'long enough'. "
     )
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+    response = route(
+        client,
+        "classify",
         messages=[{"role": "system", "content": prompt}],
         max_tokens=2,
         temperature = 0.0
@@ -21,19 +30,35 @@ def too_short(client, question: str, answer: str) -> bool:
     return answer_text == "too short"
     
 
-def does_answer(client, question: str, message: str) -> bool:
-    """Return True if the message answers the question according to the model."""
+def does_answer_request(question: str, message: str) -> dict:
+    """Keyword arguments for the does_answer chat completion."""
     prompt = (
         f"Does the following message answer the question?\n" 
         f"Question: {question}\n"
         f"Message: {message}\n"
         "Respond with only 'true' or 'false'. If it only partially answers the question, reply with 'true' "
     )
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+    return dict(
         messages=[{"role": "system", "content": prompt}],
         max_tokens=1,
         temperature = 0.0
     )
+
+
+def parse_does_answer(response) -> bool:
     answer_text = response.choices[0].message.content.strip().lower()
     return answer_text == "true"
+
+
+def does_answer(client, question: str, message: str) -> bool:
+    """Return True if the message answers the question according to the model."""
+    client = client or get_client()
+    response = route(client, "classify", **does_answer_request(question, message))
+    return parse_does_answer(response)
+
+
+async def does_answer_async(client, question: str, message: str) -> bool:
+    """does_answer for an AsyncOpenAI client."""
+    client = client or get_async_client()
+    response = await route_async(client, "classify", **does_answer_request(question, message))
+    return parse_does_answer(response)
@@ -0,0 +1,122 @@
+from typing import Any, Dict, Optional
+
+try:
+    from api.conversation_state import ConversationState
+    from api.theme_state import ThemeState
+    from api.llm_client import get_client
+    from api.paraphrase_bank import load_bank
+    from api.prompts import build_prompt
+    from api.survey_templates import find_template
+    from api.timing import annotate
+    from api.turn_steps import (
+        pending_question, skips_classifier, apply_verdict, generate_reply, finish_turn,
+    )
+    from api.verdict_cache import classify_answer_with_source, accepted_answers
+except ImportError:
+    from conversation_state import ConversationState
+    from theme_state import ThemeState
+    from llm_client import get_client
+    from paraphrase_bank import load_bank
+    from prompts import build_prompt
+    from survey_templates import find_template
+    from timing import annotate
+    from turn_steps import (
+        pending_question, skips_classifier, apply_verdict, generate_reply, finish_turn,
+    )
+    from verdict_cache import classify_answer_with_source, accepted_answers
+
+# Template-only replies (see usage.TokenBudget) when the bank has no transition for the turn.
+ACKNOWLEDGEMENT = "Thank you, that's helpful."
+FOLLOW_UP = "I'd love to hear a little more on this one."
+CLOSING = "Thank you for sharing all of that with me."
+
+
+def _bank_for(theme_state: ThemeState):
+    key = theme_state.template
+    if not key:
+        template = find_template(theme_state.themes, theme_state.theme_questions)
+        key = template.key if template else ""
+    return load_bank(key) if key else None
+
+
+def templated_reply(
+    kind: str,
+    state: ConversationState,
+    theme_state: ThemeState,
+    user_message: str,
+) -> Optional[str]:
+    """Assemble a transition reply from the survey's paraphrase bank; None if it has no entry."""
+    bank = _bank_for(theme_state)
+    if bank is None:
+        return None
+    seed = f"{theme_state.current_theme_index}:{state.current_index}:{user_message}"
+    transition = bank.transition(kind, seed)
+    if transition is None:
+        return None
+    if kind == "completion":
+        return transition
+    question = bank.question(theme_state.current_theme_index, state.current_index, seed)
+    return f"{transition} {question}" if question else None
+
+
+def plain_reply(
+    state: ConversationState,
+    theme_state: ThemeState,
+    user_message: str,
+    answered: Optional[bool],
+) -> str:
+    """A reply for any turn with no model call: a fixed lead-in, then the question (paraphrased if the bank has it)."""
+    if state.complete:
+        return CLOSING
+    bank = _bank_for(theme_state)
+    seed = f"{theme_state.current_theme_index}:{state.current_index}:{user_message}"
+    question = bank.question(theme_state.current_theme_index, state.current_index, seed) if bank else None
+    lead = FOLLOW_UP if answered is False else ACKNOWLEDGEMENT
+    return f"{lead} {question or state.questions[state.current_index]}"
+
+
+def fast_turn(
+    state: ConversationState,
+    theme_state: ThemeState,
+    user_message: str,
+    client: Optional[Any] = None,
+    template_only: bool = False,
+) -> tuple[str, ConversationState, ThemeState, Dict[str, Any]]:
+    """
+    Same contract as handle_turn, but turns whose reply is a fixed transition
+    (the first question, moving to a new theme, finishing the survey) are
+    answered from the paraphrase bank without a reply call. With
+    `template_only`, every other turn gets a plain_reply instead of one too.
+    """
+    client = client or get_client()
+    llm_calls = 0
+    question = pending_question(state, theme_state)
+    answered = None
+    if question is not None:
+        if skips_classifier(theme_state):
+            answered = True
+        else:
+            answered, source = classify_answer_with_source(
+                client, question, user_message, accepted_answers(theme_state)
+            )
+            # The pre-classifier, the cache and the local classifier cost no model call.
+            llm_calls += source == "model"
+    theme_before = theme_state.current_theme_index
+    greeting = skips_classifier(theme_state)
+    state, theme_state = apply_verdict(state, theme_state, user_message, answered)
+
+    kind = None
+    if answered and state.complete:
+        kind = "completion"
+    elif theme_state.current_theme_index != theme_before:
+        kind = "first_question" if greeting else "theme_advance"
+    reply = templated_reply(kind, state, theme_state, user_message) if kind else None
+    if reply is None and template_only:
+        reply = plain_reply(state, theme_state, user_message, answered)
+    templated = reply is not None
+    if templated:
+        annotate(reply_source="bank")
+    else:
+        reply = generate_reply(client, build_prompt(state, theme_state, user_message))
+        llm_calls += 1
+    return finish_turn(reply, state), state, theme_state, {"llm_calls": llm_calls, "templated": templated}
@@ -0,0 +1,173 @@
+import os
+import threading
+from dataclasses import dataclass
+from importlib.util import find_spec
+from typing import TYPE_CHECKING, Any, Optional
+
+try:
+    from api.startup import load_env
+except ImportError:
+    from startup import load_env
+
+# The SDK (and httpx under it) is most of a cold start's import time, so it is
+# only imported once a client is actually built.
+if TYPE_CHECKING:
+    import httpx
+    from openai import AsyncOpenAI, OpenAI
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    raw = os.environ.get(name)
+    if raw is None:
+        return default
+    return raw.strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class ClientSettings:
+    """Connection pool and timeout settings for the shared LLM client."""
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 60.0
+    connect_timeout: float = 5.0
+    read_timeout: float = 30.0
+    http2: bool = True
+    max_retries: int = 2
+
+    @classmethod
+    def from_env(cls) -> "ClientSettings":
+        """Read overrides from NOORISH_LLM_* environment variables."""
+        defaults = cls()
+        return cls(
+            max_connections=_env_int("NOORISH_LLM_MAX_CONNECTIONS", defaults.max_connections),
+            max_keepalive_connections=_env_int(
+                "NOORISH_LLM_MAX_KEEPALIVE", defaults.max_keepalive_connections
+            ),
+            keepalive_expiry=_env_float("NOORISH_LLM_KEEPALIVE_EXPIRY", defaults.keepalive_expiry),
+            connect_timeout=_env_float("NOORISH_LLM_CONNECT_TIMEOUT", defaults.connect_timeout),
+            read_timeout=_env_float("NOORISH_LLM_READ_TIMEOUT", defaults.read_timeout),
+            http2=_env_bool("NOORISH_LLM_HTTP2", defaults.http2),
+            max_retries=_env_int("NOORISH_LLM_MAX_RETRIES", defaults.max_retries),
+        )
+
+
+def http2_available() -> bool:
+    """HTTP/2 in httpx needs the optional `h2` package."""
+    return find_spec("h2") is not None
+
+
+def _transport_options(settings: ClientSettings) -> dict:
+    import httpx
+
+    return dict(
+        http2=settings.http2 and http2_available(),
+        limits=httpx.Limits(
+            max_connections=settings.max_connections,
+            max_keepalive_connections=settings.max_keepalive_connections,
+            keepalive_expiry=settings.keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(settings.read_timeout, connect=settings.connect_timeout),
+    )
+
+
+def build_http_client(settings: ClientSettings) -> "httpx.Client":
+    """Build a keep-alive, pooled transport for the OpenAI SDK."""
+    from openai import DefaultHttpxClient
+
+    return DefaultHttpxClient(**_transport_options(settings))
+
+
+def build_async_http_client(settings: ClientSettings) -> "httpx.AsyncClient":
+    """Async counterpart of build_http_client, for the ASGI entry point."""
+    from openai import DefaultAsyncHttpxClient
+
+    return DefaultAsyncHttpxClient(**_transport_options(settings))
+
+
+def build_async_client(settings: Optional[ClientSettings] = None) -> "AsyncOpenAI":
+    from openai import AsyncOpenAI
+
+    load_env()
+    settings = settings or ClientSettings.from_env()
+    return AsyncOpenAI(
+        api_key=os.environ.get("OPENAI_API_KEY"),
+        http_client=build_async_http_client(settings),
+        max_retries=settings.max_retries,
+    )
+
+
+def build_client(settings: Optional[ClientSettings] = None) -> "OpenAI":
+    from openai import OpenAI
+
+    load_env()
+    settings = settings or ClientSettings.from_env()
+    return OpenAI(
+        api_key=os.environ.get("OPENAI_API_KEY"),
+        http_client=build_http_client(settings),
+        max_retries=settings.max_retries,
+    )
+
+
+_client: Optional[Any] = None
+_async_client: Optional[Any] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> Any:
+    """
+    Return the process-wide client, creating it on first use.
+    On a warm serverless instance every turn reuses the same connection pool.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = build_client()
+    return _client
+
+
+def get_async_client() -> Any:
+    """Process-wide AsyncOpenAI client; each worker process runs a single event loop."""
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = build_async_client()
+    return _async_client
+
+
+def set_async_client(client: Optional[Any]) -> None:
+    global _async_client
+    with _client_lock:
+        _async_client = client
+
+
+def set_client(client: Any) -> None:
+    """Install a client (e.g. a fake in tests) as the shared instance."""
+    global _client
+    with _client_lock:
+        _client = client
+
+
+def reset_client() -> None:
+    """Drop the shared client and close its connections."""
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    close = getattr(client, "close", None)
+    if callable(close):
+        close()
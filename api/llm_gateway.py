@@ -0,0 +1,407 @@
+"""
+Every chat completion goes through here. The gateway adds:
+
+- token buckets sized to the account's requests/minute and tokens/minute quotas,
+- a bounded number of calls in flight,
+- retries with jittered exponential backoff that honours Retry-After,
+- a deadline per call, covering queueing, backoff and the request itself,
+- two priority lanes, so interactive turns are served before batch scoring.
+"""
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from api.llm_client import _env_float, _env_int
+    from api.startup import load_env
+    from api.prompts import estimate_tokens
+    from api.timing import annotate
+except ImportError:
+    from llm_client import _env_float, _env_int
+    from startup import load_env
+    from prompts import estimate_tokens
+    from timing import annotate
+
+INTERACTIVE = 0
+BATCH = 1
+
+RETRYABLE_STATUS = {408, 409, 429}
+RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError"}
+
+
+class DeadlineExceeded(TimeoutError):
+    """The call could not complete (or start) within its deadline."""
+
+
+@dataclass(frozen=True)
+class GatewaySettings:
+    """Quotas and retry policy; rpm/tpm of 0 turn that limit off."""
+    rpm: int = 500
+    tpm: int = 200_000
+    max_concurrency: int = 16
+    max_attempts: int = 4
+    backoff_base: float = 0.5
+    backoff_max: float = 8.0
+    interactive_deadline: float = 20.0
+    batch_deadline: float = 120.0
+    # Share of each bucket that batch calls may not dip into.
+    batch_reserve: float = 0.2
+    # Completion tokens charged up front when a call sets no max_tokens.
+    default_completion_tokens: int = 256
+
+    @classmethod
+    def from_env(cls) -> "GatewaySettings":
+        """Read overrides from NOORISH_LLM_* environment variables."""
+        load_env()
+        d = cls()
+        return cls(
+            rpm=_env_int("NOORISH_LLM_RPM", d.rpm),
+            tpm=_env_int("NOORISH_LLM_TPM", d.tpm),
+            max_concurrency=_env_int("NOORISH_LLM_CONCURRENCY", d.max_concurrency),
+            max_attempts=_env_int("NOORISH_LLM_MAX_ATTEMPTS", d.max_attempts),
+            backoff_base=_env_float("NOORISH_LLM_BACKOFF_BASE", d.backoff_base),
+            backoff_max=_env_float("NOORISH_LLM_BACKOFF_MAX", d.backoff_max),
+            interactive_deadline=_env_float("NOORISH_LLM_DEADLINE", d.interactive_deadline),
+            batch_deadline=_env_float("NOORISH_LLM_BATCH_DEADLINE", d.batch_deadline),
+            batch_reserve=_env_float("NOORISH_LLM_BATCH_RESERVE", d.batch_reserve),
+        )
+
+    def deadline_for(self, priority: int) -> float:
+        return self.batch_deadline if priority == BATCH else self.interactive_deadline
+
+
+class TokenBucket:
+    """Refills continuously at `per_minute / 60` per second, up to `per_minute`."""
+
+    def __init__(self, per_minute: float, clock=time.monotonic):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self._clock = clock
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def take(self, amount: float, floor: float = 0.0) -> float:
+        """
+        Take `amount` if that leaves at least `floor` in the bucket and return 0;
+        otherwise take nothing and return the seconds until it would.
+        """
+        # A single call bigger than the whole bucket would otherwise wait forever.
+        amount = min(amount, self.capacity - floor)
+        with self._lock:
+            self._refill()
+            missing = amount + floor - self.level
+            if missing <= 0:
+                self.level -= amount
+                return 0.0
+            return missing / self.rate
+
+    def adjust(self, delta: float) -> None:
+        """Give back (or charge) the difference once the real cost is known."""
+        with self._lock:
+            self._refill()
+            self.level = min(self.capacity, self.level + delta)
+
+
+class PriorityGate:
+    """Counting semaphore that wakes waiters by (priority, arrival)."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._waiting: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def acquire(self, priority: int, timeout: float) -> bool:
+        entry = (priority, next(self._seq))
+        until = time.monotonic() + timeout
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            while self.active >= self.limit or self._waiting[0] != entry:
+                remaining = until - time.monotonic()
+                if remaining <= 0:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+                    return False
+                self._cond.wait(remaining)
+            heapq.heappop(self._waiting)
+            self.active += 1
+            self._cond.notify_all()
+            return True
+
+    def release(self) -> None:
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+
+class AsyncPriorityGate:
+    """PriorityGate for coroutines on one event loop."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._waiting: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._cond = asyncio.Condition()
+
+    async def acquire(self, priority: int, timeout: float) -> bool:
+        entry = (priority, next(self._seq))
+
+        def ready():
+            return self.active < self.limit and self._waiting[0] == entry
+
+        async with self._cond:
+            heapq.heappush(self._waiting, entry)
+            try:
+                await asyncio.wait_for(self._cond.wait_for(ready), max(timeout, 0))
+            except asyncio.TimeoutError:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+                return False
+            heapq.heappop(self._waiting)
+            self.active += 1
+            self._cond.notify_all()
+            return True
+
+    async def release(self) -> None:
+        async with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+
+@dataclass
+class GatewayStats:
+    calls: int = 0
+    retries: int = 0
+    throttled: int = 0
+    deadline_exceeded: int = 0
+    failures: int = 0
+    by_status: Dict[int, int] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def bump(self, name: str, status: Optional[int] = None) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+            if status is not None:
+                self.by_status[status] = self.by_status.get(status, 0) + 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "deadline_exceeded": self.deadline_exceeded,
+                "failures": self.failures,
+                "by_status": dict(self.by_status),
+            }
+
+
+def is_retryable(exc: BaseException) -> bool:
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    # Matched by name so the SDK's exception classes needn't be imported here.
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(exc).__mro__)
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds the server asked us to wait, from retry-after-ms or Retry-After."""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def request_tokens(kwargs: Dict[str, Any], default_completion: int) -> int:
+    """Upper-bound estimate of a call's TPM cost: prompt plus allowed completion."""
+    prompt = sum(estimate_tokens(str(m.get("content") or "")) for m in kwargs.get("messages", ()))
+    return prompt + int(kwargs.get("max_tokens") or default_completion)
+
+
+class LLMGateway:
+    def __init__(self, settings: Optional[GatewaySettings] = None):
+        self.settings = settings or GatewaySettings()
+        self.requests = TokenBucket(self.settings.rpm) if self.settings.rpm > 0 else None
+        self.tokens = TokenBucket(self.settings.tpm) if self.settings.tpm > 0 else None
+        self.stats = GatewayStats()
+        self._gate = PriorityGate(self.settings.max_concurrency)
+        # asyncio primitives belong to one loop; keep a gate per running loop.
+        self._async_gates: Dict[int, Tuple[Any, AsyncPriorityGate]] = {}
+        self._rng = random.Random()
+
+    def _throttle_delay(self, priority: int, cost: int) -> float:
+        """Seconds to wait before the quotas admit this call; 0 once admitted."""
+        reserve = self.settings.batch_reserve if priority == BATCH else 0.0
+        if self.requests is not None:
+            wait = self.requests.take(1, reserve * self.requests.capacity)
+            if wait:
+                return wait
+        if self.tokens is not None:
+            wait = self.tokens.take(cost, reserve * self.tokens.capacity)
+            if wait:
+                if self.requests is not None:
+                    self.requests.adjust(1)
+                return wait
+        return 0.0
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        # Full jitter, but never sooner than the server asked for.
+        cap = min(self.settings.backoff_max, self.settings.backoff_base * 2 ** attempt)
+        return max(self._rng.uniform(0, cap), retry_after(exc) or 0.0)
+
+    def _settle(self, response: Any, cost: int) -> None:
+        usage = getattr(response, "usage", None)
+        used = getattr(usage, "total_tokens", None)
+        if self.tokens is not None and isinstance(used, int) and used > 0:
+            self.tokens.adjust(cost - used)
+
+    @staticmethod
+    def _bind(client: Any, remaining: float) -> Any:
+        # The gateway owns retries, so turn the SDK's own off and bound the request.
+        with_options = getattr(client, "with_options", None)
+        if callable(with_options):
+            return with_options(timeout=remaining, max_retries=0)
+        return client
+
+    def _deadline(self, priority: int, deadline: Optional[float]) -> float:
+        return time.monotonic() + (deadline if deadline is not None else self.settings.deadline_for(priority))
+
+    def _expired(self) -> DeadlineExceeded:
+        self.stats.bump("deadline_exceeded")
+        return DeadlineExceeded("LLM call did not finish within its deadline")
+
+    def _failed(self, attempt: int, exc: BaseException, until: float) -> float:
+        """Return the backoff before the next attempt, or re-raise `exc`."""
+        status = getattr(exc, "status_code", None)
+        if attempt + 1 >= self.settings.max_attempts or not is_retryable(exc):
+            self.stats.bump("failures", status)
+            raise exc
+        delay = self._backoff(attempt, exc)
+        if time.monotonic() + delay >= until:
+            self.stats.bump("failures", status)
+            raise exc
+        self.stats.bump("retries", status)
+        annotate(llm_retries=attempt + 1)
+        return delay
+
+    def create(self, client: Any, priority: int = INTERACTIVE, deadline: Optional[float] = None, **kwargs) -> Any:
+        """`client.chat.completions.create(**kwargs)` under the gateway's limits."""
+        until = self._deadline(priority, deadline)
+        cost = request_tokens(kwargs, self.settings.default_completion_tokens)
+        self.stats.bump("calls")
+        for attempt in range(self.settings.max_attempts):
+            while (wait := self._throttle_delay(priority, cost)) > 0:
+                self.stats.bump("throttled")
+                if time.monotonic() + wait >= until:
+                    raise self._expired()
+                time.sleep(wait)
+            if not self._gate.acquire(priority, until - time.monotonic()):
+                raise self._expired()
+            try:
+                bound = self._bind(client, until - time.monotonic())
+                response = bound.chat.completions.create(**kwargs)
+            except Exception as exc:
+                delay = self._failed(attempt, exc, until)
+            else:
+                self._settle(response, cost)
+                return response
+            finally:
+                # Streams hold their slot only until the response starts.
+                self._gate.release()
+            time.sleep(delay)
+        raise AssertionError("unreachable")
+
+    def _async_gate(self) -> AsyncPriorityGate:
+        loop = asyncio.get_running_loop()
+        entry = self._async_gates.get(id(loop))
+        if entry is None or entry[0] is not loop:
+            entry = (loop, AsyncPriorityGate(self.settings.max_concurrency))
+            self._async_gates = {k: v for k, v in self._async_gates.items() if not v[0].is_closed()}
+            self._async_gates[id(loop)] = entry
+        return entry[1]
+
+    async def create_async(
+        self, client: Any, priority: int = INTERACTIVE, deadline: Optional[float] = None, **kwargs
+    ) -> Any:
+        """`create` for an AsyncOpenAI client."""
+        gate = self._async_gate()
+        until = self._deadline(priority, deadline)
+        cost = request_tokens(kwargs, self.settings.default_completion_tokens)
+        self.stats.bump("calls")
+        for attempt in range(self.settings.max_attempts):
+            while (wait := self._throttle_delay(priority, cost)) > 0:
+                self.stats.bump("throttled")
+                if time.monotonic() + wait >= until:
+                    raise self._expired()
+                await asyncio.sleep(wait)
+            if not await gate.acquire(priority, until - time.monotonic()):
+                raise self._expired()
+            try:
+                bound = self._bind(client, until - time.monotonic())
+                response = await bound.chat.completions.create(**kwargs)
+            except Exception as exc:
+                delay = self._failed(attempt, exc, until)
+            else:
+                self._settle(response, cost)
+                return response
+            finally:
+                await gate.release()
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    """Process-wide gateway, so every call shares one set of quotas."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway(GatewaySettings.from_env())
+    return _gateway
+
+
+def set_gateway(gateway: Optional[LLMGateway]) -> None:
+    global _gateway
+    with _gateway_lock:
+        _gateway = gateway
+
+
+def complete(client: Any, priority: int = INTERACTIVE, deadline: Optional[float] = None, **kwargs) -> Any:
+    return get_gateway().create(client, priority=priority, deadline=deadline, **kwargs)
+
+
+async def complete_async(client: Any, priority: int = INTERACTIVE, deadline: Optional[float] = None, **kwargs) -> Any:
+    return await get_gateway().create_async(client, priority=priority, deadline=deadline, **kwargs)
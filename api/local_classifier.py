@@ -0,0 +1,251 @@
+"""
+A local, network-free answer-relevance classifier.
+
+Each (question, message) pair becomes a handful of text features: hashed
+word and character-trigram similarity against the question, how much the
+message says, first-person talk, and deflections ("not sure", a question
+back). A logistic model turns them into a calibrated probability that the
+message answers the question. Question vectors are precomputed for every
+registered survey, and whole batches are scored with NumPy matrix products.
+
+Only probabilities inside the uncertainty band are escalated to the model
+(`does_answer`); see verdict_cache.classify_answer. A message is only ever
+accepted locally when it is close to the question, shares a word with it,
+adds words of its own and is not a question back; anything else is rejected
+or escalated, however long it is. Tune the band and the weights offline with
+`python -m bench.eval_classifier`, and check them on the held-out set.
+"""
+import json
+import math
+import os
+import re
+import threading
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from api.survey_templates import all_templates
+    from api.verdict_cache import normalize
+    from api.startup import load_env
+except ImportError:
+    from survey_templates import all_templates
+    from verdict_cache import normalize
+    from startup import load_env
+
+DIMENSION = 1 << 12
+
+STOPWORDS = frozenset(
+    "a about all also am an and any are as at be been being but by can could do did does few for from had has "
+    "have how i if in is it its just me more most much my not of on or other really so some such than that "
+    "the their them then there these they this those to very was we were what when where which who why will "
+    "with would you your".split()
+)
+FIRST_PERSON = frozenset("i im ive id ill me my mine myself we our us".split())
+ACKNOWLEDGEMENTS = frozenset("ok okay sure yes yeah yep no nope fine thanks thank cool alright hmm um uh".split())
+DEFLECTIONS = re.compile(
+    r"\b(i dont know|idk|not sure|no idea|who knows|cant remember|dont remember|what do you mean|"
+    r"can you repeat|rather not|dont (?:want to|wanna) (?:talk|answer|say|discuss|get into)|"
+    r"none of your business|skip|pass|next question|why do you ask|why are you asking|"
+    r"why do you want to know)\b"
+)
+
+FEATURES = (
+    "similarity",      # cosine of hashed word + trigram vectors, question vs message
+    "content_words",   # log1p of words that aren't stopwords
+    "first_person",    # share of words about the speaker
+    "ack_only",        # nothing but acknowledgements ("ok", "sure", "yes")
+    "deflection",      # "not sure", "skip", "what do you mean"
+    "asks_back",       # the message is itself a question
+)
+
+# Hand-set starting point until weights are fitted on labeled verdicts.
+DEFAULT_WEIGHTS = (6.0, 1.0, 1.5, -3.0, -4.0, -1.5)
+DEFAULT_BIAS = -1.2
+
+# Words are compared by their first letters, so "drained" matches "drains".
+STEM = 5
+# The ceiling for a message the classifier may not accept on its own: one that
+# shares no word with its question, only echoes the question's words, is a
+# question itself or is too far from the question. Without real overlap,
+# length and first-person talk can't tell an answer from small talk.
+UNSURE = 0.5
+# Cosine similarity a message needs before it can be accepted locally.
+MIN_SIMILARITY = 0.25
+
+
+def _words(text: str) -> List[str]:
+    return normalize(text).split()
+
+
+def _stems(text: str) -> frozenset:
+    return frozenset(w[:STEM] for w in _words(text) if w not in STOPWORDS)
+
+
+def _hashed_terms(words: Sequence[str]) -> List[int]:
+    terms = list(words)
+    for word in words:
+        padded = f"<{word}>"
+        terms += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    return [zlib.crc32(term.encode("utf-8")) % DIMENSION for term in terms]
+
+
+def _vectors(texts: Sequence[str]) -> np.ndarray:
+    """L2-normalised hashed bag of words and trigrams, one row per text."""
+    rows, cols = [], []
+    for row, text in enumerate(texts):
+        indices = _hashed_terms([w for w in _words(text) if w not in STOPWORDS])
+        rows += [row] * len(indices)
+        cols += indices
+    matrix = np.zeros((len(texts), DIMENSION), dtype=np.float32)
+    np.add.at(matrix, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)), 1.0)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-9)
+
+
+def message_features(messages: Sequence[str]) -> np.ndarray:
+    """The question-independent features (every column but similarity)."""
+    out = np.zeros((len(messages), len(FEATURES) - 1), dtype=np.float32)
+    for i, message in enumerate(messages):
+        words = _words(message)
+        content = [w for w in words if w not in STOPWORDS]
+        out[i, 0] = math.log1p(len(content))
+        out[i, 1] = sum(w in FIRST_PERSON for w in words) / len(words) if words else 0.0
+        out[i, 2] = float(bool(words) and all(w in ACKNOWLEDGEMENTS for w in words))
+        out[i, 3] = float(bool(DEFLECTIONS.search(" ".join(words))))
+        out[i, 4] = float(message.strip().endswith("?"))
+    return out
+
+
+@dataclass
+class LocalClassifierStats:
+    answered: int = 0
+    unanswered: int = 0
+    escalated: int = 0
+
+
+@dataclass
+class LocalClassifier:
+    weights: np.ndarray = field(default_factory=lambda: np.asarray(DEFAULT_WEIGHTS, dtype=np.float32))
+    bias: float = DEFAULT_BIAS
+    # Probabilities strictly inside (low, high) go to the model.
+    band: Tuple[float, float] = (0.2, 0.8)
+    stats: LocalClassifierStats = field(default_factory=LocalClassifierStats)
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+        self._index: Dict[str, int] = {}
+        self._questions = np.zeros((0, DIMENSION), dtype=np.float32)
+        self._question_stems: List[frozenset] = []
+        self.add_questions(q for t in all_templates() for theme in t.theme_questions for q in theme)
+
+    @classmethod
+    def from_file(cls, path: Path, **kwargs) -> "LocalClassifier":
+        data = json.loads(Path(path).read_text())
+        if list(data.get("features", FEATURES)) != list(FEATURES):
+            raise ValueError(f"{path} was fitted for different features")
+        return cls(weights=np.asarray(data["weights"], dtype=np.float32), bias=float(data["bias"]), **kwargs)
+
+    @classmethod
+    def from_env(cls) -> "LocalClassifier":
+        """NOORISH_LOCAL_CLASSIFIER_BAND ("low,high") and NOORISH_LOCAL_CLASSIFIER_WEIGHTS (a fitted file)."""
+        load_env()
+        low, _, high = os.environ.get("NOORISH_LOCAL_CLASSIFIER_BAND", "0.2,0.8").partition(",")
+        band = (float(low), float(high or low))
+        path = os.environ.get("NOORISH_LOCAL_CLASSIFIER_WEIGHTS")
+        return cls.from_file(Path(path), band=band) if path else cls(band=band)
+
+    def save(self, path: Path) -> None:
+        data = {"features": list(FEATURES), "weights": [round(float(w), 6) for w in self.weights], "bias": round(float(self.bias), 6)}
+        Path(path).write_text(json.dumps(data, indent=2) + "\n")
+
+    def add_questions(self, questions: Iterable[str]) -> None:
+        with self._lock:
+            new = [q for q in dict.fromkeys(questions) if q not in self._index]
+            if not new:
+                return
+            self._questions = np.vstack([self._questions, _vectors(new)])
+            self._question_stems += [_stems(q) for q in new]
+            for q in new:
+                self._index[q] = len(self._index)
+
+    def features(self, questions: Sequence[str], messages: Sequence[str]) -> np.ndarray:
+        """Feature matrix for aligned (question, message) pairs."""
+        self.add_questions(questions)
+        # Positions first: the matrix only ever grows, so it covers every position seen.
+        positions = [self._index[q] for q in questions]
+        rows = self._questions[positions]
+        similarity = np.einsum("ij,ij->i", rows, _vectors(messages))
+        return np.column_stack([similarity, message_features(messages)])
+
+    def probabilities(self, questions: Sequence[str], messages: Sequence[str]) -> np.ndarray:
+        if not len(messages):
+            return np.zeros(0, dtype=np.float32)
+        x = self.features(questions, messages)
+        probabilities = 1.0 / (1.0 + np.exp(-(x @ self.weights + self.bias)))
+        # Pairs that can't be accepted can still be rejected locally, but at best they are escalated.
+        return np.where(self.acceptable(questions, messages, x), probabilities, np.minimum(probabilities, UNSURE))
+
+    def acceptable(self, questions: Sequence[str], messages: Sequence[str], x: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Whether each message may be accepted without the model: similar enough
+        to its question, on topic, saying more than the question's own words
+        and not asking something back.
+        """
+        x = self.features(questions, messages) if x is None else x
+        adds_words = np.asarray(
+            [bool(_stems(m) - self._question_stems[self._index[q]]) for q, m in zip(questions, messages)], dtype=bool
+        )
+        return (
+            (x[:, FEATURES.index("similarity")] >= MIN_SIMILARITY)
+            & (x[:, FEATURES.index("asks_back")] == 0)
+            & self.on_topic(questions, messages)
+            & adds_words
+        )
+
+    def on_topic(self, questions: Sequence[str], messages: Sequence[str]) -> np.ndarray:
+        """Whether each message shares at least one content word with its question."""
+        self.add_questions(questions)
+        return np.asarray(
+            [bool(self._question_stems[self._index[q]] & _stems(m)) for q, m in zip(questions, messages)]
+        )
+
+    def probability(self, question: str, message: str) -> float:
+        return float(self.probabilities([question], [message])[0])
+
+    def decide(self, probability: float) -> Optional[bool]:
+        low, high = self.band
+        if probability >= high:
+            return True
+        if probability <= low:
+            return False
+        return None
+
+    def verdict(self, question: str, message: str) -> Optional[bool]:
+        """True/False when confident, None when the model should decide."""
+        verdict = self.decide(self.probability(question, message))
+        with self._lock:
+            if verdict is None:
+                self.stats.escalated += 1
+            elif verdict:
+                self.stats.answered += 1
+            else:
+                self.stats.unanswered += 1
+        return verdict
+
+    def fit(self, questions: Sequence[str], messages: Sequence[str], labels: Sequence[bool],
+            epochs: int = 500, learning_rate: float = 0.5, l2: float = 1e-3) -> "LocalClassifier":
+        """Fit the logistic weights to labeled verdicts by full-batch gradient descent."""
+        x = self.features(questions, messages).astype(np.float64)
+        y = np.asarray(labels, dtype=np.float64)
+        w, b = self.weights.astype(np.float64), float(self.bias)
+        for _ in range(epochs):
+            p = 1.0 / (1.0 + np.exp(-(x @ w + b)))
+            error = p - y
+            w -= learning_rate * (x.T @ error / len(y) + l2 * w)
+            b -= learning_rate * float(error.mean())
+        self.weights, self.bias = w.astype(np.float32), b
+        return self
@@ -0,0 +1,331 @@
+"""
+Per-call-type model routing with hedging and a fallback chain.
+
+Each kind of call ("classify", "extract", "reply", "reply_lite", "assessment")
+has a RoutePolicy: the models to try in order, a latency budget per model, and
+when to send a hedged duplicate of a slow request. Whichever response arrives first wins; the rest
+are cancelled (async) or abandoned and closed (sync). A model that has not
+answered within its budget, or that failed, hands over to the next one.
+Every response's token usage is recorded by kind (see usage), and the model
+that answered is annotated on the request as `<kind>_model`.
+"""
+import asyncio
+import contextvars
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, replace
+from typing import Any, Deque, Dict, Optional, Tuple
+
+try:
+    from api.llm_gateway import BATCH, INTERACTIVE, complete, complete_async
+    from api.timing import annotate
+    from api.usage import record_usage
+    from api.startup import load_env
+except ImportError:
+    from llm_gateway import BATCH, INTERACTIVE, complete, complete_async
+    from timing import annotate
+    from usage import record_usage
+    from startup import load_env
+
+
+@dataclass(frozen=True)
+class RoutePolicy:
+    models: Tuple[str, ...]
+    # Seconds to wait on one model before falling back to the next.
+    budget: float
+    # Hedge after this many seconds until enough latencies are observed, then
+    # after the observed `hedge_quantile`. None disables hedging.
+    hedge_after: Optional[float] = None
+    hedge_quantile: float = 0.95
+    # At most this share of calls may send a hedge, so a slow provider doesn't
+    # see its load doubled.
+    max_hedge_ratio: float = 0.1
+    priority: int = INTERACTIVE
+
+    @property
+    def hedges(self) -> bool:
+        return self.hedge_after is not None
+
+
+DEFAULT_POLICIES: Dict[str, RoutePolicy] = {
+    "classify": RoutePolicy(models=("gpt-4o-mini",), budget=2.0, hedge_after=0.8),
+    "extract": RoutePolicy(models=("gpt-4o-mini",), budget=3.0, hedge_after=1.2),
+    "reply": RoutePolicy(models=("gpt-4o-mini", "gpt-4.1-mini"), budget=6.0, hedge_after=3.0),
+    # Replies for sessions close to their token budget (see usage.TokenBudget).
+    "reply_lite": RoutePolicy(models=("gpt-4.1-nano", "gpt-4o-mini"), budget=6.0, hedge_after=3.0),
+    "assessment": RoutePolicy(models=("gpt-4o-mini",), budget=60.0, priority=BATCH),
+}
+
+
+def policy_from_env(kind: str, policy: RoutePolicy) -> RoutePolicy:
+    """
+    Apply NOORISH_ROUTE_<KIND>_MODELS (comma-separated), _BUDGET and _HEDGE
+    (seconds, or "off") overrides to a policy.
+    """
+    prefix = f"NOORISH_ROUTE_{kind.upper()}_"
+    changes: Dict[str, Any] = {}
+    models = os.environ.get(prefix + "MODELS")
+    if models:
+        changes["models"] = tuple(m.strip() for m in models.split(",") if m.strip())
+    try:
+        if os.environ.get(prefix + "BUDGET"):
+            changes["budget"] = float(os.environ[prefix + "BUDGET"])
+        hedge = os.environ.get(prefix + "HEDGE")
+        if hedge:
+            changes["hedge_after"] = None if hedge.strip().lower() == "off" else float(hedge)
+    except ValueError:
+        pass
+    return replace(policy, **changes)
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per (kind, model)."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[Tuple[str, str], Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, model: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault((kind, model), deque(maxlen=self.window)).append(seconds)
+
+    def quantile(self, kind: str, model: str, q: float) -> Optional[float]:
+        """Nearest-rank quantile, or None until `min_samples` have been seen."""
+        with self._lock:
+            samples = sorted(self._samples.get((kind, model), ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[max(1, math.ceil(q * len(samples))) - 1]
+
+
+@dataclass
+class RouteStats:
+    calls: int = 0
+    hedges: int = 0
+    hedge_wins: int = 0
+    fallbacks: int = 0
+    abandoned: int = 0
+
+
+def _close(result: Any) -> None:
+    # A losing stream still holds its connection until closed.
+    close = getattr(result, "close", None)
+    if callable(close):
+        try:
+            close()
+        except Exception:
+            pass
+
+
+class ModelRouter:
+    def __init__(self, policies: Optional[Dict[str, RoutePolicy]] = None, tracker: Optional[LatencyTracker] = None):
+        self.policies = dict(policies or DEFAULT_POLICIES)
+        self.tracker = tracker or LatencyTracker()
+        self.stats: Dict[str, RouteStats] = {kind: RouteStats() for kind in self.policies}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @classmethod
+    def from_env(cls) -> "ModelRouter":
+        load_env()
+        return cls({kind: policy_from_env(kind, p) for kind, p in DEFAULT_POLICIES.items()})
+
+    def policy(self, kind: str) -> RoutePolicy:
+        return self.policies[kind]
+
+    def hedge_delay(self, kind: str, model: str) -> Optional[float]:
+        policy = self.policies[kind]
+        if not policy.hedges:
+            return None
+        observed = self.tracker.quantile(kind, model, policy.hedge_quantile)
+        return observed if observed is not None else policy.hedge_after
+
+    def _bump(self, kind: str, name: str) -> None:
+        with self._lock:
+            stats = self.stats.setdefault(kind, RouteStats())
+            setattr(stats, name, getattr(stats, name) + 1)
+
+    def _may_hedge(self, kind: str) -> bool:
+        with self._lock:
+            stats = self.stats[kind]
+            return stats.hedges < self.policies[kind].max_hedge_ratio * stats.calls + 1
+
+    def _outcome(self, kind: str, label: str, model: str) -> None:
+        # The model that actually answered: a fallback or a cheaper route differs from the policy's first.
+        annotate(**{f"{kind}_model": model})
+        if label == "hedge":
+            self._bump(kind, "hedge_wins")
+        if label != "primary":
+            annotate(**{f"{kind}_route": f"{label}:{model}"})
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="noorish-route")
+            return self._executor
+
+    def _timed_call(self, client: Any, kind: str, model: str, priority: int, kwargs: Dict[str, Any]) -> Any:
+        started = time.monotonic()
+        response = complete(client, priority=priority, **dict(kwargs, model=model))
+        self.tracker.record(kind, model, time.monotonic() - started)
+        record_usage(kind, response)
+        return response
+
+    def create(self, client: Any, kind: str, **kwargs) -> Any:
+        """Route one chat completion of type `kind`; kwargs as for chat.completions.create, minus `model`."""
+        policy = self.policies[kind]
+        self._bump(kind, "calls")
+        if len(policy.models) == 1 and not policy.hedges:
+            response = self._timed_call(client, kind, policy.models[0], policy.priority, kwargs)
+            self._outcome(kind, "primary", policy.models[0])
+            return response
+
+        executor = self._get_executor()
+        pending: Dict[Future, Tuple[str, str]] = {}
+
+        def launch(model: str, label: str) -> None:
+            ctx = contextvars.copy_context()
+            future = executor.submit(ctx.run, self._timed_call, client, kind, model, policy.priority, kwargs)
+            pending[future] = (model, label)
+
+        chain = list(policy.models)
+        model = chain.pop(0)
+        launch(model, "primary")
+        stage_started, hedged = time.monotonic(), False
+        error: Optional[BaseException] = None
+        while pending:
+            deadlines = []
+            delay = None if hedged else self.hedge_delay(kind, model)
+            if delay is not None:
+                deadlines.append(stage_started + delay)
+            if chain:
+                deadlines.append(stage_started + policy.budget)
+            timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                winner, label = pending.pop(future)
+                try:
+                    response = future.result()
+                except Exception as exc:
+                    error = exc
+                    continue
+                self._abandon(kind, pending)
+                self._outcome(kind, label, winner)
+                return response
+
+            now = time.monotonic()
+            if chain and (not pending or now >= stage_started + policy.budget):
+                model = chain.pop(0)
+                self._bump(kind, "fallbacks")
+                launch(model, "fallback")
+                stage_started, hedged = now, False
+            elif delay is not None and now >= stage_started + delay and pending:
+                hedged = True
+                if self._may_hedge(kind):
+                    self._bump(kind, "hedges")
+                    launch(model, "hedge")
+        raise error
+
+    def _abandon(self, kind: str, pending: Dict[Future, Tuple[str, str]]) -> None:
+        # A sync call already in flight can't be interrupted; close it when it lands.
+        for future in pending:
+            self._bump(kind, "abandoned")
+            if not future.cancel():
+                future.add_done_callback(lambda f: f.exception() is None and _close(f.result()))
+
+    async def _timed_call_async(
+        self, client: Any, kind: str, model: str, priority: int, kwargs: Dict[str, Any]
+    ) -> Any:
+        started = time.monotonic()
+        response = await complete_async(client, priority=priority, **dict(kwargs, model=model))
+        self.tracker.record(kind, model, time.monotonic() - started)
+        record_usage(kind, response)
+        return response
+
+    async def create_async(self, client: Any, kind: str, **kwargs) -> Any:
+        """`create` for an AsyncOpenAI client; losing requests are cancelled."""
+        policy = self.policies[kind]
+        self._bump(kind, "calls")
+        if len(policy.models) == 1 and not policy.hedges:
+            response = await self._timed_call_async(client, kind, policy.models[0], policy.priority, kwargs)
+            self._outcome(kind, "primary", policy.models[0])
+            return response
+
+        pending: Dict[asyncio.Task, Tuple[str, str]] = {}
+
+        def launch(model: str, label: str) -> None:
+            task = asyncio.ensure_future(self._timed_call_async(client, kind, model, policy.priority, kwargs))
+            pending[task] = (model, label)
+
+        chain = list(policy.models)
+        model = chain.pop(0)
+        launch(model, "primary")
+        stage_started, hedged = time.monotonic(), False
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                deadlines = []
+                delay = None if hedged else self.hedge_delay(kind, model)
+                if delay is not None:
+                    deadlines.append(stage_started + delay)
+                if chain:
+                    deadlines.append(stage_started + policy.budget)
+                timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    winner, label = pending.pop(task)
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    self._outcome(kind, label, winner)
+                    return task.result()
+
+                now = time.monotonic()
+                if chain and (not pending or now >= stage_started + policy.budget):
+                    model = chain.pop(0)
+                    self._bump(kind, "fallbacks")
+                    launch(model, "fallback")
+                    stage_started, hedged = now, False
+                elif delay is not None and now >= stage_started + delay and pending:
+                    hedged = True
+                    if self._may_hedge(kind):
+                        self._bump(kind, "hedges")
+                        launch(model, "hedge")
+            raise error
+        finally:
+            for task in pending:
+                self._bump(kind, "abandoned")
+                task.cancel()
+
+
+_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> ModelRouter:
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ModelRouter.from_env()
+    return _router
+
+
+def set_router(router: Optional[ModelRouter]) -> None:
+    global _router
+    with _router_lock:
+        _router = router
+
+
+def route(client: Any, kind: str, **kwargs) -> Any:
+    return get_router().create(client, kind, **kwargs)
+
+
+async def route_async(client: Any, kind: str, **kwargs) -> Any:
+    return await get_router().create_async(client, kind, **kwargs)
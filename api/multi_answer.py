@@ -0,0 +1,161 @@
+"""
+Multi-answer extraction: one classification call checks the latest message
+against every question still open, in this theme and the ones after it. The
+pending question's verdict drives the turn as usual; any other question the
+message also answers is recorded straight away and skipped when its turn
+comes.
+"""
+import json
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+try:
+    from api.conversation_state import ConversationState
+    from api.theme_state import ThemeState
+    from api.llm_client import get_client
+    from api.model_router import route
+    from api.prompts import build_prompt
+    from api.timing import span, annotate
+    from api.turn_steps import (
+        pending_question, skips_classifier, apply_verdict, generate_reply, finish_turn,
+    )
+    from api.verdict_cache import known_verdict, model_verdict, accepted_answers
+except ImportError:
+    from conversation_state import ConversationState
+    from theme_state import ThemeState
+    from llm_client import get_client
+    from model_router import route
+    from prompts import build_prompt
+    from timing import span, annotate
+    from turn_steps import (
+        pending_question, skips_classifier, apply_verdict, generate_reply, finish_turn,
+    )
+    from verdict_cache import known_verdict, model_verdict, accepted_answers
+
+# Keeps the prompt short; questions further out are checked on a later turn.
+MAX_EXTRACT_QUESTIONS = 12
+
+OpenQuestion = Tuple[int, int, str]
+
+
+def open_questions(state: ConversationState, theme_state: ThemeState) -> List[OpenQuestion]:
+    """
+    (theme index, question index, question) for everything still unanswered,
+    the pending question first. Greeting themes are never asked about.
+    """
+    current = theme_state.current_theme_index
+    found: List[OpenQuestion] = [
+        (current, q, state.questions[q])
+        for q in range(state.current_index, len(state.questions))
+        if q not in state.answers
+    ]
+    for t in range(current + 1, len(theme_state.theme_questions)):
+        if t in theme_state.themes_addressed or theme_state.themes[t] == "chitchat":
+            continue
+        conversation = theme_state.get_conversation_state(t)
+        answered = conversation.answers if conversation else {}
+        found += [(t, q, text) for q, text in enumerate(theme_state.theme_questions[t]) if q not in answered]
+    return found[:MAX_EXTRACT_QUESTIONS]
+
+
+def build_extraction_prompt(questions: List[OpenQuestion], user_message: str) -> str:
+    numbered = "\n".join(f"{n}. {text}" for n, (_, _, text) in enumerate(questions, 1))
+    return f"""
+        You are checking which interview questions a user's message answers.
+        A partial answer counts as answered. Don't count a question the message only touches on in passing.
+
+        Questions:
+        {numbered}
+
+        Message: {user_message}
+
+        Respond as pure JSON, no extra text, with this exact shape:
+        {{"answers": [<numbers of the questions the message answers>]}}
+        """.strip()
+
+
+def parse_extraction(content: Optional[str], count: int) -> Optional[Set[int]]:
+    """Zero-based positions of the answered questions, or None if the output is invalid."""
+    try:
+        data = json.loads(content or "")
+    except (TypeError, ValueError):
+        return None
+    numbers = data.get("answers") if isinstance(data, dict) else None
+    if not isinstance(numbers, list):
+        return None
+    return {
+        n - 1 for n in numbers
+        if isinstance(n, int) and not isinstance(n, bool) and 1 <= n <= count
+    }
+
+
+def record_extra_answers(
+    state: ConversationState,
+    theme_state: ThemeState,
+    answers: List[OpenQuestion],
+    user_message: str,
+) -> None:
+    """Store answers to questions other than the pending one, creating later themes' states as needed."""
+    for t, q, _ in answers:
+        if t == theme_state.current_theme_index:
+            conversation = state
+        else:
+            conversation = theme_state.get_conversation_state(t)
+            if conversation is None:
+                conversation = ConversationState(questions=theme_state.theme_questions[t])
+                theme_state.set_conversation_state(t, conversation)
+        conversation.answers.setdefault(q, user_message + '.')
+
+
+def extract_turn(
+    state: ConversationState,
+    theme_state: ThemeState,
+    user_message: str,
+    client: Optional[Any] = None,
+) -> tuple[str, ConversationState, ThemeState, Dict[str, Any]]:
+    """
+    Same contract as handle_turn, with the verdict for the pending question
+    coming from one extraction call over all open questions when it is not
+    already known. Falls back to the model classifier when the output does
+    not validate.
+    """
+    client = client or get_client()
+    llm_calls = 0
+    extra: List[OpenQuestion] = []
+    question = pending_question(state, theme_state)
+    answered = None
+    if question is not None:
+        if skips_classifier(theme_state):
+            answered = True
+        else:
+            # Greetings, cached and locally settled messages need no extraction call.
+            answered, _ = known_verdict(question, user_message, accepted_answers(theme_state))
+        if answered is None:
+            questions = open_questions(state, theme_state)
+            with span("extract"):
+                response = route(
+                    client,
+                    "extract",
+                    messages=[{"role": "system", "content": build_extraction_prompt(questions, user_message)}],
+                    response_format={"type": "json_object"},
+                    temperature=0.0,
+                    max_tokens=40,
+                )
+            llm_calls += 1
+            found = parse_extraction(response.choices[0].message.content, len(questions))
+            if found is None:
+                answered = model_verdict(client, question, user_message)
+                llm_calls += 1
+            else:
+                answered = 0 in found
+                extra = [questions[i] for i in sorted(found) if i != 0]
+                annotate(verdict_source="extract")
+
+    if extra:
+        record_extra_answers(state, theme_state, extra, user_message)
+        annotate(extracted=len(extra))
+    state, theme_state = apply_verdict(state, theme_state, user_message, answered)
+
+    bot_reply = generate_reply(client, build_prompt(state, theme_state, user_message))
+    llm_calls += 1
+    metrics = {"llm_calls": llm_calls, "extracted": len(extra)}
+    return finish_turn(bot_reply, state), state, theme_state, metrics
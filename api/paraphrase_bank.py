@@ -0,0 +1,231 @@
+"""
+Precomputed, vetted paraphrases of each survey question plus transition
+phrases, stored next to the survey definition in api/survey_banks/. Fast turns
+assemble deterministic replies (first question, theme change, completion)
+from the bank instead of calling the model.
+
+    python -m api.paraphrase_bank build --template burnout --variants 4
+    python -m api.paraphrase_bank check     # every bank matches its template and passes vetting
+"""
+import argparse
+import hashlib
+import json
+import re
+import sys
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+try:
+    from api.survey_templates import SurveyTemplate, all_templates, get_template
+    from api.startup import API_DIR
+    from api.llm_client import get_client
+    from api.model_router import route
+except ImportError:
+    from survey_templates import SurveyTemplate, all_templates, get_template
+    from startup import API_DIR
+    from llm_client import get_client
+    from model_router import route
+
+BANK_DIR = API_DIR / "survey_banks"
+TRANSITIONS = ("first_question", "theme_advance", "completion")
+
+_WORD = re.compile(r"[a-z']+")
+_STOPWORDS = frozenset(
+    "a an and are at be but by do for from how i in is it me my of on or so that the this to was were "
+    "what when which who you your".split()
+)
+
+
+@dataclass(frozen=True)
+class ParaphraseBank:
+    template: str
+    fingerprint: str
+    # "theme_index:question_index" -> vetted paraphrases
+    questions: Dict[str, List[str]] = field(default_factory=dict)
+    transitions: Dict[str, List[str]] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "template": self.template,
+            "fingerprint": self.fingerprint,
+            "questions": self.questions,
+            "transitions": self.transitions,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ParaphraseBank":
+        return cls(
+            template=data["template"],
+            fingerprint=data["fingerprint"],
+            questions={k: list(v) for k, v in (data.get("questions") or {}).items()},
+            transitions={k: list(v) for k, v in (data.get("transitions") or {}).items()},
+        )
+
+    @staticmethod
+    def _pick(options: Sequence[str], seed: str) -> str:
+        # Stable choice, so a retried request gets the same wording.
+        digest = hashlib.sha1(seed.encode("utf-8")).digest()
+        return options[int.from_bytes(digest[:4], "big") % len(options)]
+
+    def question(self, theme_index: int, question_index: int, seed: str) -> Optional[str]:
+        options = self.questions.get(f"{theme_index}:{question_index}")
+        return self._pick(options, seed) if options else None
+
+    def transition(self, kind: str, seed: str) -> Optional[str]:
+        options = self.transitions.get(kind)
+        return self._pick(options, seed + kind) if options else None
+
+
+def bank_path(template: SurveyTemplate) -> Path:
+    return BANK_DIR / f"{template.id}-v{template.version}.json"
+
+
+@lru_cache(maxsize=None)
+def load_bank(template_key: str) -> Optional[ParaphraseBank]:
+    """The bank for a template, or None if there is none or it was built for other content."""
+    template = get_template(template_key)
+    try:
+        bank = ParaphraseBank.from_dict(json.loads(bank_path(template).read_text(encoding="utf-8")))
+    except FileNotFoundError:
+        return None
+    return bank if bank.fingerprint == template.fingerprint else None
+
+
+def _content_words(text: str) -> set:
+    return {w for w in _WORD.findall(text.lower()) if w not in _STOPWORDS}
+
+
+def vet_paraphrase(original: str, candidate: str) -> Optional[str]:
+    """Reason to reject a paraphrase of `original`, or None if it is fit to ask."""
+    candidate = candidate.strip()
+    if not candidate:
+        return "empty"
+    if candidate.lower() == original.strip().lower():
+        return "verbatim"
+    if "?" in original and not candidate.endswith("?"):
+        return "not a question"
+    if any(c in candidate for c in "{}[]<>"):
+        return "template debris"
+    ratio = len(candidate) / max(1, len(original))
+    if not 0.5 <= ratio <= 2.0:
+        return "length"
+    words, cand_words = _content_words(original), _content_words(candidate)
+    if words and len(words & cand_words) / len(words | cand_words) < 0.1:
+        return "off topic"
+    return None
+
+
+def vet_transition(candidate: str) -> Optional[str]:
+    candidate = candidate.strip()
+    if not candidate or len(candidate) > 160:
+        return "length"
+    if "?" in candidate:
+        return "transitions must not ask anything"
+    if any(c in candidate for c in "{}[]<>"):
+        return "template debris"
+    return None
+
+
+def check_bank(template: SurveyTemplate, bank: ParaphraseBank) -> List[str]:
+    """Everything wrong with a bank, as human-readable lines."""
+    problems = []
+    if bank.fingerprint != template.fingerprint:
+        problems.append(f"{template.key}: bank was built for different survey content")
+    for key, options in bank.questions.items():
+        t, q = (int(part) for part in key.split(":"))
+        if t >= len(template.theme_questions) or q >= len(template.theme_questions[t]):
+            problems.append(f"{template.key} {key}: no such question")
+            continue
+        for option in options:
+            reason = vet_paraphrase(template.theme_questions[t][q], option)
+            if reason:
+                problems.append(f"{template.key} {key}: {reason}: {option!r}")
+    for kind, options in bank.transitions.items():
+        if kind not in TRANSITIONS:
+            problems.append(f"{template.key}: unknown transition {kind!r}")
+        for option in options:
+            reason = vet_transition(option)
+            if reason:
+                problems.append(f"{template.key} {kind}: {reason}: {option!r}")
+    return problems
+
+
+def _ask_json_list(client: Any, prompt: str, key: str) -> List[str]:
+    response = route(
+        client, "assessment",
+        messages=[{"role": "system", "content": prompt}],
+        response_format={"type": "json_object"},
+        temperature=0.9,
+    )
+    try:
+        items = json.loads(response.choices[0].message.content or "").get(key, [])
+    except (ValueError, AttributeError):
+        return []
+    return [item for item in items if isinstance(item, str)]
+
+
+def build_bank(template: SurveyTemplate, client: Any, variants: int = 4) -> ParaphraseBank:
+    """Generate candidates with the model and keep the first `variants` that pass vetting."""
+    questions: Dict[str, List[str]] = {}
+    for t, (theme, theme_questions) in enumerate(zip(template.themes, template.theme_questions)):
+        if "?" not in "".join(theme_questions):
+            continue  # e.g. the chitchat greeting; nothing is asked
+        for q, question in enumerate(theme_questions):
+            prompt = (
+                "You help a warm, empathetic interviewer vary their wording.\n"
+                f"Write {variants * 2} different ways to ask this question in natural spoken English. "
+                "Keep the meaning and any options it lists; do not add new questions.\n"
+                f"Question: {question}\n"
+                'Respond as pure JSON: {"paraphrases": ["...", "..."]}'
+            )
+            kept = [c.strip() for c in _ask_json_list(client, prompt, "paraphrases") if not vet_paraphrase(question, c)]
+            questions[f"{t}:{q}"] = list(dict.fromkeys(kept))[:variants]
+    descriptions = {
+        "first_question": "opening the interview after the user said hello, just before the first question",
+        "theme_advance": "acknowledging the user's answer and moving to a different topic, just before the next question",
+        "completion": "thanking the user after the last answer of the interview",
+    }
+    transitions = {}
+    for kind, description in descriptions.items():
+        prompt = (
+            f"Write {variants * 2} short, warm sentences (one or two each) an interviewer could say when "
+            f"{description}. They must not ask anything.\n"
+            'Respond as pure JSON: {"phrases": ["...", "..."]}'
+        )
+        kept = [c.strip() for c in _ask_json_list(client, prompt, "phrases") if not vet_transition(c)]
+        transitions[kind] = list(dict.fromkeys(kept))[:variants]
+    return ParaphraseBank(template.key, template.fingerprint, questions, transitions)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="generate and vet a bank with the model")
+    build.add_argument("--template", required=True)
+    build.add_argument("--variants", type=int, default=4)
+    commands.add_parser("check", help="validate every bank against its template")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        template = get_template(args.template)
+        bank = build_bank(template, get_client(), args.variants)
+        path = bank_path(template)
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(json.dumps(bank.to_dict(), indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"Wrote {path}; review it before committing.")
+        return 0
+
+    problems = []
+    for template in all_templates():
+        if bank_path(template).exists():
+            data = json.loads(bank_path(template).read_text(encoding="utf-8"))
+            problems += check_bank(template, ParaphraseBank.from_dict(data))
+    for line in problems:
+        print(line, file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+import logging
+import math
+import os
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    from api.conversation_state import ConversationState
+    from api.theme_state import ThemeState
+    from api.timing import span, annotate
+    from api.usage import CHEAP, REPLY_RESERVE_TOKENS, current_meter
+    from api.startup import load_env
+except ImportError:
+    from conversation_state import ConversationState
+    from theme_state import ThemeState
+    from timing import span, annotate
+    from usage import CHEAP, REPLY_RESERVE_TOKENS, current_meter
+    from startup import load_env
+
+# Stable across every turn of every session; keep it first so provider-side prefix caching can hit.
+PERSONA_AND_INSTRUCTIONS = """
+You are a super emphathtic and highly emotionally intelligent interviewer running a structured conversation.
+Your main goal is to make sure the user answers each question in a list of questions.
+When you get a reply from a user to an answer, apply your best judgement to determine whether the user actually addressed the question or not.
+
+Be warm and conversational. Acknowledge what the user said.
+
+Instructions:
+- If there is a current question, make sure your reply clearly includes a paraphrase of that question in natural language.
+- Do not repeat the question verbatim. Instead rephrase it differently but keep the same meaning.
+- If the user answers very shortly ask for clarification
+""".strip()
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_TOKENS = 1200
+SUMMARY_WORDS = 25
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)."""
+    return math.ceil(len(text) / 4)
+
+
+def history_budget() -> int:
+    """Tokens of Q&A history per prompt: NOORISH_PROMPT_HISTORY_TOKENS, or the default."""
+    load_env()
+    try:
+        return int(os.environ.get("NOORISH_PROMPT_HISTORY_TOKENS", DEFAULT_HISTORY_TOKENS))
+    except ValueError:
+        return DEFAULT_HISTORY_TOKENS
+
+
+def turn_history_budget() -> int:
+    """history_budget for this turn: halved once the session's budget mode is cheap."""
+    meter = current_meter()
+    if meter is not None and meter.mode == CHEAP:
+        return history_budget() // 2
+    return history_budget()
+
+
+def compact_answer(answer: str, max_words: int = SUMMARY_WORDS) -> str:
+    """Deterministic summary of an older answer: its first sentence, capped at `max_words`."""
+    first = _SENTENCE_END.split(answer.strip(), maxsplit=1)[0]
+    words = first.split()
+    if len(words) > max_words:
+        return " ".join(words[:max_words]) + "…"
+    return first
+
+
+@dataclass
+class BuiltPrompt:
+    text: str
+    tokens: int
+    history_tokens: int
+    summarized: int
+    omitted: int
+
+
+def _survey_block(theme_state: ThemeState, state: ConversationState) -> str:
+    if not theme_state.themes:
+        return "\n".join(f"- {q}" for q in state.questions)
+    lines = []
+    for theme, questions in zip(theme_state.themes, theme_state.theme_questions):
+        lines.append(f"{theme}:")
+        lines.extend(f"- {q}" for q in questions)
+    return "\n".join(lines)
+
+
+def _history(state: ConversationState, theme_state: ThemeState) -> List[Tuple[str, str, str, str]]:
+    """(summary key, theme label, question, answer) for every answer so far, oldest first."""
+    conversations = dict(theme_state.conversations)
+    conversations[theme_state.current_theme_index] = state
+    entries = []
+    for t_idx in sorted(conversations):
+        conv = conversations[t_idx]
+        label = theme_state.themes[t_idx] if 0 <= t_idx < len(theme_state.themes) else ""
+        for i in sorted(conv.answers):
+            question = conv.questions[i] if i < len(conv.questions) else f"Question {i + 1}"
+            entries.append((f"{t_idx}:{i}", label, question, conv.answers[i]))
+    return entries
+
+
+def _format_qa(label: str, question: str, answer: str) -> str:
+    return f"[{label}] Q: {question}\nA: {answer}" if label else f"Q: {question}\nA: {answer}"
+
+
+def _history_block(
+    state: ConversationState,
+    theme_state: ThemeState,
+    budget: int,
+    summarize: Callable[[str], str],
+) -> Tuple[str, int, int]:
+    """
+    Render the Q&A history within `budget` tokens. The oldest answers are swapped
+    for summaries first (each computed once and kept in theme_state.summaries, so
+    older history renders identically turn after turn), then dropped if needed.
+    """
+    entries = _history(state, theme_state)
+    if not entries:
+        return "None yet.", 0, 0
+
+    full = [_format_qa(label, q, a) for _, label, q, a in entries]
+    short: Dict[int, str] = {}
+    cost = sum(estimate_tokens(block) for block in full)
+    # Reuse summaries made on earlier turns before compacting anything new.
+    for n, (key, label, q, _) in enumerate(entries):
+        if key in theme_state.summaries:
+            short[n] = _format_qa(label, q, theme_state.summaries[key])
+            cost += estimate_tokens(short[n]) - estimate_tokens(full[n])
+    # Never summarize the latest answer; the model should see it verbatim.
+    for n, (key, label, q, a) in enumerate(entries[:-1]):
+        if cost <= budget:
+            break
+        if n in short:
+            continue
+        summary = theme_state.summaries.setdefault(key, summarize(a))
+        short[n] = _format_qa(label, q, summary)
+        cost += estimate_tokens(short[n]) - estimate_tokens(full[n])
+
+    blocks = [short.get(n, full[n]) for n in range(len(entries))]
+    omitted = 0
+    while cost > budget and len(blocks) - omitted > 1:
+        cost -= estimate_tokens(blocks[omitted])
+        omitted += 1
+    kept = blocks[omitted:]
+    if omitted:
+        kept.insert(0, f"({omitted} earlier answers omitted)")
+    return "\n\n".join(kept), len(short), omitted
+
+
+def turn_block(state: ConversationState, theme_state: ThemeState) -> str:
+    """This turn's position in the survey: the current theme, question and what remains."""
+    if state.complete:
+        current_q = None
+        remaining = []
+    else:
+        current_q = state.questions[state.current_index]
+        remaining = state.questions[state.current_index + 1:]
+    current_theme = theme_state.current_theme
+
+    turn = []
+    if state.complete:
+        turn.append("All questions have already been answered. Thank the user and briefly summarize their answers.")
+    if current_theme:
+        turn.append("Current theme: " + current_theme)
+    if current_q:
+        turn.append("Current question you want them to answer next: " + current_q)
+    turn.append(f"Remaining questions after that:\n{remaining}")
+    return "\n\n".join(turn)
+
+
+def compose_prompt(
+    state: ConversationState,
+    theme_state: ThemeState,
+    user_message: str,
+    history_tokens: Optional[int] = None,
+    summarize: Callable[[str], str] = compact_answer,
+    include_turn: bool = True,
+) -> BuiltPrompt:
+    """
+    Build the reply prompt, stable content first: persona and instructions, the
+    survey outline, the Q&A history, then this turn's position and message.
+    Without `include_turn` the position is left out, for callers that add it.
+    """
+    budget = history_budget() if history_tokens is None else history_tokens
+    history, summarized, omitted = _history_block(state, theme_state, budget, summarize)
+
+    sections = [
+        PERSONA_AND_INSTRUCTIONS,
+        "Survey:\n" + _survey_block(theme_state, state),
+        "Conversation context:\nPrevious questions and answers:\n" + history,
+    ]
+    if include_turn:
+        sections.append(turn_block(state, theme_state))
+    sections.append(f"Last user message:\n{user_message}")
+    text = "\n\n".join(sections)
+    built = BuiltPrompt(
+        text=text,
+        tokens=estimate_tokens(text),
+        history_tokens=estimate_tokens(history),
+        summarized=summarized,
+        omitted=omitted,
+    )
+    logger.debug(
+        "prompt built: ~%d tokens (history ~%d, %d summarized, %d omitted)",
+        built.tokens, built.history_tokens, summarized, omitted,
+    )
+    return built
+
+
+def build_prompt(
+    state: ConversationState,
+    theme_state: ThemeState,
+    user_message: str,
+    include_turn: bool = True,
+) -> str:
+    """
+    Build an instruction for the LLM.
+    The LLM's goal is to be friendly but always move toward the next question.
+    """
+    meter = current_meter()
+    with span("build_prompt"):
+        built = compose_prompt(state, theme_state, user_message, turn_history_budget(), include_turn=include_turn)
+        left = meter.turn_tokens_left() if meter is not None else None
+        if left is not None:
+            # Over the turn's token budget: give up history until the prompt fits.
+            excess = built.tokens - (left - REPLY_RESERVE_TOKENS)
+            if excess > 0 and built.history_tokens:
+                built = compose_prompt(
+                    state, theme_state, user_message, max(0, built.history_tokens - excess), include_turn=include_turn,
+                )
+                annotate(prompt_trimmed=excess)
+    annotate(prompt_tokens=built.tokens)
+    return built.text
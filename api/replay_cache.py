@@ -0,0 +1,197 @@
+"""
+Idempotent turns: a client that retries a POST with the same idempotency key
+(the `Idempotency-Key` header or an `idempotency_key` body field) gets the
+stored response back instead of running the turn again.
+
+The first request with a key claims it and runs the turn. Duplicates that
+arrive while it is still running wait for its result rather than starting a
+second execution. Responses are kept for `ttl_seconds` in a bounded LRU.
+A streamed turn is stored as its final `done` event (reply and state) and
+replayed as a one-event stream. Server errors (5xx) and streams that fail
+before `done` are not stored: their waiters and later retries run the turn
+themselves.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+try:
+    from api.startup import load_env
+except ImportError:
+    from startup import load_env
+
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyMismatch(ValueError):
+    """The key was already used for a different request body."""
+
+
+class TurnInProgress(Exception):
+    """The first request with this key is still running after the wait."""
+
+
+@dataclass(frozen=True)
+class Replay:
+    status: int
+    body: bytes
+    content_type: str = "application/json"
+
+
+@dataclass
+class ReplayStats:
+    claims: int = 0
+    replays: int = 0
+    waits: int = 0
+    mismatches: int = 0
+
+
+def idempotency_key(body: bytes, header: Optional[str] = None) -> Optional[str]:
+    """The request's idempotency key, from the header or else the body; None if it has none."""
+    key = (header or "").strip()
+    if not key:
+        try:
+            data = json.loads(body.decode("utf-8"))
+        except (UnicodeDecodeError, ValueError):
+            return None
+        value = data.get("idempotency_key") if isinstance(data, dict) else None
+        key = str(value).strip() if value is not None else ""
+    if not key:
+        return None
+    if len(key) > MAX_KEY_LENGTH:
+        raise ValueError(f"Idempotency key is longer than {MAX_KEY_LENGTH} characters")
+    return key
+
+
+def body_fingerprint(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+class Claim:
+    """One request's hold on a key: either the owner running the turn or a duplicate."""
+
+    def __init__(self, cache: "ReplayCache", key: str, future: Future, owner: bool):
+        self.cache = cache
+        self.key = key
+        self.future = future
+        self.owner = owner
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[Replay]:
+        """The owner's stored response, or None if it left nothing to replay."""
+        try:
+            return self.future.result(timeout=self.cache.wait_seconds if timeout is None else timeout)
+        except FutureTimeout:
+            raise TurnInProgress(self.key) from None
+
+    async def wait_async(self, timeout: Optional[float] = None) -> Optional[Replay]:
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(self.future)),
+                self.cache.wait_seconds if timeout is None else timeout,
+            )
+        except asyncio.TimeoutError:
+            raise TurnInProgress(self.key) from None
+
+    def finish(self, status: int, body: bytes, content_type: str = "application/json") -> None:
+        """Publish the owner's response; anything but a server error is kept for replays."""
+        replay = Replay(status, body, content_type)
+        self.cache._finish(self, replay if status < 500 else None)
+
+    def release(self) -> None:
+        """Give the key up without a stored response."""
+        self.cache._finish(self, None)
+
+
+class ReplayCache:
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 600, wait_seconds: float = 60):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.wait_seconds = wait_seconds
+        self.stats = ReplayStats()
+        # key -> (body fingerprint, result future, expiry)
+        self._entries: "OrderedDict[str, Tuple[str, Future, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ReplayCache":
+        load_env()
+        return cls(
+            max_entries=int(os.environ.get("NOORISH_REPLAY_MAX_ENTRIES", 10000)),
+            ttl_seconds=float(os.environ.get("NOORISH_REPLAY_TTL", 600)),
+            wait_seconds=float(os.environ.get("NOORISH_REPLAY_WAIT", 60)),
+        )
+
+    def claim(self, key: str, body: bytes) -> Claim:
+        """
+        Claim `key` for this request. Raises IdempotencyMismatch if the key was
+        used for a different body. A returned claim that is not the owner's
+        should `wait` for the owner's response.
+        """
+        fingerprint = body_fingerprint(body)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1].done() and entry[2] <= now:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                if entry[0] != fingerprint:
+                    self.stats.mismatches += 1
+                    raise IdempotencyMismatch(f"Idempotency key {key!r} was used for a different request")
+                self._entries.move_to_end(key)
+                if entry[1].done():
+                    self.stats.replays += 1
+                else:
+                    self.stats.waits += 1
+                return Claim(self, key, entry[1], owner=False)
+            future: Future = Future()
+            self._entries[key] = (fingerprint, future, now + self.ttl_seconds)
+            self.stats.claims += 1
+            self._evict()
+        return Claim(self, key, future, owner=True)
+
+    def _finish(self, claim: Claim, replay: Optional[Replay]) -> None:
+        if not claim.owner or claim.future.done():
+            return
+        with self._lock:
+            entry = self._entries.get(claim.key)
+            if entry is not None and entry[1] is claim.future:
+                if replay is None:
+                    del self._entries[claim.key]
+                else:
+                    self._entries[claim.key] = (entry[0], entry[1], time.monotonic() + self.ttl_seconds)
+        claim.future.set_result(replay)
+
+    def _evict(self) -> None:
+        # Oldest first; a turn still in flight keeps serving its waiters through the future.
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_cache: Optional[ReplayCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_replay_cache() -> ReplayCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ReplayCache.from_env()
+    return _cache
+
+
+def set_replay_cache(cache: Optional[ReplayCache]) -> None:
+    global _cache
+    with _cache_lock:
+        _cache = cache
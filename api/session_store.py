@@ -0,0 +1,221 @@
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    from api.conversation_state import ConversationState
+    from api.theme_state import ThemeState
+    from api.state_codec import COMPACT_VERSION, decode_compact, encode_compact
+    from api.compact_session import CompactSession
+    from api.survey_templates import get_template
+    from api.startup import load_env
+except ImportError:
+    from conversation_state import ConversationState
+    from theme_state import ThemeState
+    from state_codec import COMPACT_VERSION, decode_compact, encode_compact
+    from compact_session import CompactSession
+    from survey_templates import get_template
+    from startup import load_env
+
+
+class SessionNotFound(KeyError):
+    """The session ID is unknown or has expired."""
+
+
+class SessionConflict(Exception):
+    """The session moved on since the client's version (duplicate or out-of-order turn)."""
+
+
+def new_session_id() -> str:
+    return secrets.token_urlsafe(16)
+
+
+def _pack(payload: Dict[str, Any]) -> Any:
+    # Sessions in the compact wire format are held as CompactSession; anything else as is.
+    if payload.get("v") == COMPACT_VERSION:
+        try:
+            return CompactSession.from_payload(payload)
+        except (KeyError, TypeError, ValueError):
+            pass
+    return payload
+
+
+def _unpack(entry: Any) -> Dict[str, Any]:
+    return entry.to_payload() if isinstance(entry, CompactSession) else entry
+
+
+class MemorySessionStore:
+    """Sessions kept in process: LRU-bounded, expiring after `ttl_seconds` of inactivity."""
+
+    def __init__(self, max_sessions: int = 10000, ttl_seconds: float = 24 * 3600):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[str, Tuple[int, Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, payload: Dict[str, Any]) -> Tuple[str, int]:
+        session_id = new_session_id()
+        packed = _pack(payload)
+        with self._lock:
+            self._put(session_id, 1, packed)
+        return session_id, 1
+
+    def load(self, session_id: str) -> Tuple[Dict[str, Any], int]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or entry[2] <= time.monotonic():
+                self._sessions.pop(session_id, None)
+                raise SessionNotFound(session_id)
+            self._sessions.move_to_end(session_id)
+            version, packed, _ = entry
+        return _unpack(packed), version
+
+    def save(self, session_id: str, payload: Dict[str, Any], expected_version: int) -> int:
+        packed = _pack(payload)
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or entry[2] <= time.monotonic():
+                raise SessionNotFound(session_id)
+            if entry[0] != expected_version:
+                raise SessionConflict(session_id)
+            self._put(session_id, expected_version + 1, packed)
+            return expected_version + 1
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _put(self, session_id: str, version: int, packed: Any) -> None:
+        self._sessions[session_id] = (version, packed, time.monotonic() + self.ttl_seconds)
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+
+class SQLiteSessionStore:
+    """Sessions in a local SQLite file, shared by every process on the box."""
+
+    def __init__(self, path: str, ttl_seconds: float = 24 * 3600):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions "
+            "(id TEXT PRIMARY KEY, version INTEGER, payload TEXT, expires REAL)"
+        )
+
+    def create(self, payload: Dict[str, Any]) -> Tuple[str, int]:
+        session_id = new_session_id()
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE expires <= ?", (now,))
+            self._conn.execute(
+                "INSERT INTO sessions (id, version, payload, expires) VALUES (?, 1, ?, ?)",
+                (session_id, json.dumps(payload), now + self.ttl_seconds),
+            )
+        return session_id, 1
+
+    def load(self, session_id: str) -> Tuple[Dict[str, Any], int]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version, payload FROM sessions WHERE id = ? AND expires > ?",
+                (session_id, time.time()),
+            ).fetchone()
+        if row is None:
+            raise SessionNotFound(session_id)
+        return json.loads(row[1]), row[0]
+
+    def save(self, session_id: str, payload: Dict[str, Any], expected_version: int) -> int:
+        now = time.time()
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE sessions SET version = version + 1, payload = ?, expires = ? "
+                "WHERE id = ? AND version = ? AND expires > ?",
+                (json.dumps(payload), now + self.ttl_seconds, session_id, expected_version, now),
+            ).rowcount
+            if updated:
+                return expected_version + 1
+            exists = self._conn.execute(
+                "SELECT 1 FROM sessions WHERE id = ? AND expires > ?", (session_id, now)
+            ).fetchone()
+        raise SessionConflict(session_id) if exists else SessionNotFound(session_id)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+
+def build_session_store(spec: str) -> Any:
+    """`memory` or `sqlite:<path>`, with NOORISH_SESSION_TTL in seconds."""
+    ttl = float(os.environ.get("NOORISH_SESSION_TTL", 24 * 3600))
+    if spec.startswith("sqlite:"):
+        return SQLiteSessionStore(spec[len("sqlite:"):], ttl_seconds=ttl)
+    if spec == "memory":
+        return MemorySessionStore(ttl_seconds=ttl)
+    raise ValueError(f"Unknown session store: {spec}")
+
+
+_store: Optional[Any] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> Any:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                load_env()
+                _store = build_session_store(os.environ.get("NOORISH_SESSION_STORE", "memory"))
+    return _store
+
+
+def set_session_store(store: Optional[Any]) -> None:
+    global _store
+    with _store_lock:
+        _store = store
+
+
+@dataclass
+class Session:
+    """A session checked out of the store for one turn."""
+    store: Any
+    session_id: str
+    version: int
+    state: ConversationState
+    theme_state: ThemeState
+
+    def commit(self, theme_state: ThemeState) -> Dict[str, Any]:
+        """Write the turn back; raises SessionConflict if another turn got there first."""
+        self.version = self.store.save(self.session_id, encode_compact(theme_state), self.version)
+        return {"session_id": self.session_id, "version": self.version}
+
+
+def wants_session(data: Dict[str, Any]) -> bool:
+    return "session_id" in data or "template" in data
+
+
+def open_session(data: Dict[str, Any], store: Optional[Any] = None) -> Session:
+    """
+    Check out the session named by `session_id`, or start one from `template`.
+    A client-supplied `version` that is not the stored one is rejected up front.
+    """
+    store = store or get_session_store()
+    session_id = data.get("session_id")
+    if session_id:
+        payload, version = store.load(session_id)
+        expected = data.get("version")
+        if expected is not None and int(expected) != version:
+            raise SessionConflict(session_id)
+    else:
+        payload = encode_compact(get_template(data["template"]).new_theme_state())
+        session_id, version = store.create(payload)
+    state, theme_state = decode_compact(payload)
+    return Session(store, session_id, version, state, theme_state)
@@ -0,0 +1,178 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Optional
+
+try:
+    from api.conversation_state import ConversationState
+    from api.theme_state import ThemeState
+    from api.verdict_cache import known_verdict, model_verdict, accepted_answers
+    from api.llm_client import get_client
+    from api.prompts import build_prompt
+    from api.turn_steps import (
+        pending_question, skips_classifier, apply_verdict, preview_branch, score_finished_themes,
+        generate_reply, finish_turn,
+    )
+except ImportError:
+    from conversation_state import ConversationState
+    from theme_state import ThemeState
+    from verdict_cache import known_verdict, model_verdict, accepted_answers
+    from llm_client import get_client
+    from prompts import build_prompt
+    from turn_steps import (
+        pending_question, skips_classifier, apply_verdict, preview_branch, score_finished_themes,
+        generate_reply, finish_turn,
+    )
+
+
+@dataclass
+class TurnMetrics:
+    """What happened on a single speculative turn."""
+    speculated: bool = False
+    verdict: Optional[bool] = None
+    hit: Optional[bool] = None
+    llm_calls: int = 0
+    wasted_calls: int = 0
+    duration_ms: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class SpeculationStats:
+    """Process-wide counters of how often the speculative branch was used."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.turns = 0
+        self.speculated = 0
+        self.hits = 0
+        self.misses = 0
+        self.wasted_calls = 0
+
+    def record(self, metrics: TurnMetrics) -> None:
+        with self._lock:
+            self.turns += 1
+            self.wasted_calls += metrics.wasted_calls
+            if metrics.speculated:
+                self.speculated += 1
+                if metrics.hit:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.speculated if self.speculated else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "turns": self.turns,
+                "speculated": self.speculated,
+                "hits": self.hits,
+                "misses": self.misses,
+                "wasted_calls": self.wasted_calls,
+                "hit_rate": self.hit_rate,
+            }
+
+
+SPECULATION_STATS = SpeculationStats()
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="noorish-turn")
+    return _executor
+
+
+def _submit(executor: ThreadPoolExecutor, fn, *args) -> Future:
+    # Run in a copy of this context so stage timings land on the current request.
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+def _discard(future: Future, metrics: TurnMetrics) -> None:
+    # A call that already started can't be recalled from a sync client; just drop its result.
+    if future.cancel():
+        metrics.llm_calls -= 1
+    else:
+        metrics.wasted_calls += 1
+
+
+def speculative_turn(
+    state: ConversationState,
+    theme_state: ThemeState,
+    user_message: str,
+    client: Optional[Any] = None,
+    generate_both: bool = False,
+    stats: Optional[SpeculationStats] = None,
+) -> tuple[str, ConversationState, ThemeState, TurnMetrics]:
+    """
+    Same contract as handle_turn, but the reply for "the user answered, move on"
+    is generated while does_answer is still running. Verdicts known without the
+    model (greetings, cached, local) are applied first and nothing is speculated. If the verdict disagrees the
+    speculative reply is discarded and the "ask again" reply is used instead; with
+    `generate_both` that reply is generated in parallel up front too.
+    """
+    client = client or get_client()
+    stats = stats or SPECULATION_STATS
+    metrics = TurnMetrics()
+    started = time.perf_counter()
+
+    question = pending_question(state, theme_state)
+    answered = known = None
+    if question is not None:
+        if skips_classifier(theme_state):
+            answered = True
+        else:
+            answered, _ = known_verdict(question, user_message, accepted_answers(theme_state))
+            known = answered
+    if question is None or answered is not None:
+        # No model verdict to wait for, so there is nothing to speculate on.
+        metrics.verdict = known
+        state, theme_state = apply_verdict(state, theme_state, user_message, answered)
+        bot_reply = generate_reply(client, build_prompt(state, theme_state, user_message))
+        metrics.llm_calls = 1
+    else:
+        executor = get_executor()
+        metrics.speculated = True
+        advance = preview_branch(state, theme_state, user_message, True)
+        verdict_future = _submit(executor, model_verdict, client, question, user_message)
+        advance_future = _submit(executor, generate_reply, client, advance[2])
+        stay = stay_future = None
+        if generate_both:
+            stay = preview_branch(state, theme_state, user_message, False)
+            stay_future = _submit(executor, generate_reply, client, stay[2])
+        # Calls discarded before they start are taken back off in _discard.
+        metrics.llm_calls = 3 if generate_both else 2
+
+        metrics.verdict = verdict_future.result()
+        metrics.hit = metrics.verdict
+        if metrics.verdict:
+            if stay_future is not None:
+                _discard(stay_future, metrics)
+            state, theme_state, _ = advance
+            bot_reply = advance_future.result()
+        else:
+            _discard(advance_future, metrics)
+            if stay_future is not None:
+                state, theme_state, _ = stay
+                bot_reply = stay_future.result()
+            else:
+                state, theme_state, prompt = preview_branch(state, theme_state, user_message, False)
+                bot_reply = generate_reply(client, prompt)
+                metrics.llm_calls += 1
+        score_finished_themes(theme_state)
+
+    bot_reply = finish_turn(bot_reply, state)
+    metrics.duration_ms = (time.perf_counter() - started) * 1000
+    stats.record(metrics)
+    return bot_reply, state, theme_state, metrics
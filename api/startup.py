@@ -0,0 +1,188 @@
+"""
+Lazy, memoized process initialisation and a cold-start profiler.
+
+Nothing here runs at import time: `load_env()` and `read_asset()` do their work
+on first call and cache the result for the life of the (warm) instance.
+
+    python -m api.startup                          # import + init time per module
+    python -m api.startup --json > startup.json
+    python -m api.startup --baseline startup.json  # fail on cold-start regressions
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+API_DIR = Path(__file__).resolve().parent
+ROOT_DIR = API_DIR.parent
+
+
+@lru_cache(maxsize=None)
+def load_env() -> None:
+    """Load .env.local first (local dev) and fall back to a standard .env; once per process."""
+    try:
+        import dotenv
+    except ImportError:
+        return
+    dotenv.load_dotenv(ROOT_DIR / ".env.local")
+    dotenv.load_dotenv(ROOT_DIR / ".env")
+
+
+@lru_cache(maxsize=None)
+def read_asset(name: str) -> str:
+    """Read a file shipped next to the api modules, independent of the working directory."""
+    return (API_DIR / name).read_text(encoding="utf-8")
+
+
+@dataclass
+class ImportTiming:
+    module: str
+    self_ms: float
+    cumulative_ms: float
+    depth: int
+
+
+def parse_importtime(stderr: str) -> List[ImportTiming]:
+    """Parse `python -X importtime` output (microseconds) into per-module timings."""
+    timings = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the header row
+        name = fields[2].rstrip()
+        stripped = name.lstrip()
+        timings.append(ImportTiming(
+            module=stripped,
+            self_ms=int(fields[0]) / 1000,
+            cumulative_ms=int(fields[1]) / 1000,
+            depth=(len(name) - len(stripped) - 1) // 2,
+        ))
+    return timings
+
+
+def _build_client() -> None:
+    from api.llm_client import build_client
+
+    build_client().close()
+
+
+def _build_local_classifier() -> None:
+    # Only paid when NOORISH_LOCAL_CLASSIFIER is on: NumPy plus the question vectors.
+    from api.local_classifier import LocalClassifier
+
+    LocalClassifier()
+
+
+# First-use initialisation a cold instance pays on its first turn, in order.
+INIT_STEPS: Dict[str, Callable[[], Any]] = {
+    "load_env": load_env,
+    "burnout_prompt": lambda: read_asset("burnout-prompt.txt"),
+    "llm_client": _build_client,
+    "local_classifier": _build_local_classifier,
+}
+
+
+def time_init_steps() -> Dict[str, float]:
+    durations = {}
+    for name, step in INIT_STEPS.items():
+        started = time.perf_counter()
+        step()
+        durations[name] = round((time.perf_counter() - started) * 1000, 3)
+    return durations
+
+
+_CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+import_ms = (time.perf_counter() - started) * 1000
+from api.startup import time_init_steps
+print(json.dumps({{"import_ms": import_ms, "init_ms": time_init_steps()}}))
+"""
+
+
+def profile_startup(module: str = "api.convo", python: str = sys.executable) -> Dict[str, Any]:
+    """
+    Import `module` in a fresh interpreter, as a cold start would, and report
+    wall time, per-module import time and the first-use init steps.
+    """
+    env = dict(os.environ, OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "profile"))
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", _CHILD.format(module=module)],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    child = json.loads(result.stdout.strip().splitlines()[-1])
+    timings = parse_importtime(result.stderr)
+    # Top-level packages only, so nested modules aren't counted twice.
+    packages: Dict[str, float] = {}
+    for timing in timings:
+        if timing.depth == 0:
+            packages[timing.module] = packages.get(timing.module, 0.0) + timing.cumulative_ms
+    api_modules = {t.module: round(t.self_ms, 3) for t in timings if t.module.startswith("api.")}
+    return {
+        "module": module,
+        "import_ms": round(child["import_ms"], 3),
+        "init_ms": child["init_ms"],
+        "api_modules_self_ms": api_modules,
+        "top_imports_ms": {
+            name: round(ms, 3) for name, ms in sorted(packages.items(), key=lambda kv: -kv[1])[:15]
+        },
+        "imports": [asdict(t) for t in timings],
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Describe the cold-start costs that grew by more than `tolerance` over baseline."""
+    pairs = [("import_ms", report["import_ms"], baseline.get("import_ms"))]
+    for name, ms in report["init_ms"].items():
+        pairs.append((f"init_ms.{name}", ms, baseline.get("init_ms", {}).get(name)))
+    regressions = []
+    for name, current, before in pairs:
+        if before and current > before * (1 + tolerance):
+            regressions.append(f"{name}: {before} -> {current} (+{(current / before - 1):.0%})")
+    return regressions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="api.convo", help="entry point to import")
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    parser.add_argument("--baseline", type=Path, default=None)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    args = parser.parse_args(argv)
+
+    report = profile_startup(args.module)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"import {report['module']}: {report['import_ms']:.1f} ms")
+        for name, ms in report["init_ms"].items():
+            print(f"  init {name}: {ms:.1f} ms")
+        print("heaviest imports (cumulative):")
+        for name, ms in report["top_imports_ms"].items():
+            print(f"  {ms:8.1f} ms  {name}")
+
+    if args.baseline is None:
+        return 0
+    if args.update_baseline:
+        summary = {k: report[k] for k in ("module", "import_ms", "init_ms")}
+        args.baseline.write_text(json.dumps(summary, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    regressions = compare(report, json.loads(args.baseline.read_text()), args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
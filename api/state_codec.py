@@ -0,0 +1,140 @@
+import json
+from typing import Any, Dict, Tuple
+
+try:
+    from api.conversation_state import ConversationState
+    from api.theme_state import ThemeState
+    from api.survey_templates import find_template, get_template
+except ImportError:
+    from conversation_state import ConversationState
+    from theme_state import ThemeState
+    from survey_templates import find_template, get_template
+
+# Version of the compact wire format ("v" field)
+COMPACT_VERSION = 1
+STATE_FORMATS = ("legacy", "compact")
+
+_AWAITING = 1
+_DID_ANSWER = 2
+
+
+def encode_compact(theme_state: ThemeState) -> Dict[str, Any]:
+    """
+    Encode the session against its survey template: questions are referenced by
+    template key and only positions, flags and answers travel on the wire.
+    Raises ValueError if the survey is not a registered template.
+    """
+    if theme_state.template:
+        template = get_template(theme_state.template)
+    else:
+        template = find_template(theme_state.themes, theme_state.theme_questions)
+        if template is None:
+            raise ValueError("Survey does not match a registered template")
+    conversations = {}
+    for idx, conv in theme_state.conversations.items():
+        flags = (_AWAITING if conv.awaiting_answer else 0) | (_DID_ANSWER if conv.did_answer else 0)
+        conversations[str(idx)] = [
+            conv.current_index,
+            flags,
+            {str(k): v for k, v in conv.answers.items()},
+        ]
+    encoded = {
+        "v": COMPACT_VERSION,
+        "t": template.key,
+        "i": theme_state.current_theme_index,
+        "d": sorted(theme_state.themes_addressed),
+        "c": conversations,
+        "s": theme_state.summaries,
+    }
+    if theme_state.theme_scores:
+        encoded["p"] = theme_state.theme_scores
+    if theme_state.usage:
+        encoded["u"] = theme_state.usage
+    return encoded
+
+
+def decode_compact(data: Dict[str, Any]) -> Tuple[ConversationState, ThemeState]:
+    """Rebuild the current conversation and theme state from the compact encoding."""
+    if data.get("v") != COMPACT_VERSION:
+        raise ValueError(f"Unsupported state version: {data.get('v')}")
+    template = get_template(data["t"])
+    theme_state = ThemeState(
+        themes=template.themes,
+        theme_questions=template.theme_questions,
+        current_theme_index=int(data.get("i", 0)),
+        template=template.key,
+        summaries=dict(data.get("s") or {}),
+        theme_scores=dict(data.get("p") or {}),
+        usage=dict(data.get("u") or {}),
+    )
+    for idx in data.get("d") or []:
+        idx = int(idx)
+        if 0 <= idx < len(template.themes):
+            theme_state.themes_addressed[idx] = template.themes[idx]
+    for idx_str, (current_index, flags, answers) in (data.get("c") or {}).items():
+        idx = int(idx_str)
+        questions = template.theme_questions[idx] if 0 <= idx < len(template.theme_questions) else []
+        theme_state.conversations[idx] = ConversationState(
+            questions=questions,
+            current_index=int(current_index),
+            answers={int(k): v for k, v in answers.items()},
+            awaiting_answer=bool(flags & _AWAITING),
+            did_answer=bool(flags & _DID_ANSWER),
+        )
+    state = theme_state.get_conversation_state(theme_state.current_theme_index)
+    if state is None:
+        state = ConversationState(questions=theme_state.current_questions)
+        theme_state.set_conversation_state(theme_state.current_theme_index, state)
+    return state, theme_state
+
+
+def load_request_state(data: Dict[str, Any]) -> Tuple[ConversationState, ThemeState, str]:
+    """
+    Parse the session out of a request body in either wire format. Legacy
+    payloads whose survey matches a registered template are tagged with it so
+    they can be answered in the compact format ("state_format": "compact").
+    """
+    fmt = data.get("state_format") or ("compact" if "state" in data else "legacy")
+    if fmt not in STATE_FORMATS:
+        raise ValueError(f"Unknown state format: {fmt}")
+
+    if "state" in data:
+        raw = data["state"]
+        if isinstance(raw, str):
+            raw = json.loads(raw or "{}")
+        state, theme_state = decode_compact(raw)
+        return state, theme_state, fmt
+
+    raw_state = data.get("conversation_state", {})
+    raw_theme = data.get("theme_state", {})
+    if isinstance(raw_state, str):
+        raw_state = json.loads(raw_state or "{}")
+    if isinstance(raw_theme, str):
+        raw_theme = json.loads(raw_theme or "{}")
+    conversation_state = ConversationState.from_dict(raw_state)
+    theme_state = ThemeState.from_dict(raw_theme)
+    if not theme_state.template:
+        template = find_template(theme_state.themes, theme_state.theme_questions)
+        if template is not None:
+            theme_state.template = template.key
+
+    # If no questions present, pull them from the current theme.
+    if not conversation_state.questions and theme_state.theme_questions:
+        conversation_state.questions = theme_state.current_questions
+    # Track conversation state per theme
+    theme_state.set_conversation_state(theme_state.current_theme_index, conversation_state)
+    return conversation_state, theme_state, fmt
+
+
+def dump_response_state(state: ConversationState, theme_state: ThemeState, fmt: str) -> Dict[str, Any]:
+    """Serialize the session for the response in the format the client asked for."""
+    if fmt == "compact":
+        try:
+            return {"state": encode_compact(theme_state)}
+        except (KeyError, ValueError):
+            # Unregistered survey: the legacy format is the only lossless option.
+            pass
+    return {
+        "conversation_state": state.to_dict(),
+        "theme_state": theme_state.to_dict(),
+    }
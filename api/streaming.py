@@ -0,0 +1,100 @@
+import json
+from typing import Any, Callable, Dict, Iterator, Optional
+
+try:
+    from api.conversation_state import ConversationState
+    from api.theme_state import ThemeState
+    from api.verdict_cache import classify_answer, accepted_answers
+    from api.llm_client import get_client
+    from api.prompts import build_prompt
+    from api.state_codec import dump_response_state
+    from api.timing import span
+    from api.fast_turn import plain_reply
+    from api.usage import TEMPLATE, budget_mode, record_usage
+    from api.model_router import route
+    from api.turn_steps import (
+        pending_question, skips_classifier, apply_verdict, finish_turn, reply_kind,
+    )
+except ImportError:
+    from conversation_state import ConversationState
+    from theme_state import ThemeState
+    from verdict_cache import classify_answer, accepted_answers
+    from llm_client import get_client
+    from prompts import build_prompt
+    from state_codec import dump_response_state
+    from timing import span
+    from fast_turn import plain_reply
+    from usage import TEMPLATE, budget_mode, record_usage
+    from model_router import route
+    from turn_steps import (
+        pending_question, skips_classifier, apply_verdict, finish_turn, reply_kind,
+    )
+
+STREAM_FORMATS = ("sse", "ndjson")
+STREAM_CONTENT_TYPES = {"sse": "text/event-stream", "ndjson": "application/x-ndjson"}
+
+
+def stream_turn(
+    state: ConversationState,
+    theme_state: ThemeState,
+    user_message: str,
+    client: Optional[Any] = None,
+    dump_state: Optional[Callable[[ConversationState, ThemeState], Dict[str, Any]]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming variant of handle_turn. Yields {"type": "delta", "content": ...}
+    events as the reply is generated, then one {"type": "done", ...} event with
+    the full reply and the updated states, serialized by `dump_state`
+    (legacy format by default).
+    """
+    client = client or get_client()
+    question = pending_question(state, theme_state)
+    answered = None
+    if question is not None:
+        answered = skips_classifier(theme_state) or classify_answer(
+            client, question, user_message, accepted_answers(theme_state)
+        )
+    state, theme_state = apply_verdict(state, theme_state, user_message, answered)
+
+    parts = []
+    if budget_mode() == TEMPLATE:
+        # The session's token budget is spent: no reply call.
+        parts.append(plain_reply(state, theme_state, user_message, answered))
+        yield {"type": "delta", "content": parts[0]}
+    else:
+        prompt = build_prompt(state, theme_state, user_message)
+        kind = reply_kind()
+        with span("reply"):
+            response = route(
+                client,
+                kind,
+                messages=[{"role": "user", "content": prompt}],
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            for chunk in response:
+                if not chunk.choices:
+                    # The closing chunk carries the usage and no choices.
+                    record_usage(kind, chunk)
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield {"type": "delta", "content": delta}
+
+    streamed = "".join(parts)
+    bot_reply = finish_turn(streamed, state)
+    if len(bot_reply) > len(streamed):
+        yield {"type": "delta", "content": bot_reply[len(streamed):]}
+    done = {"type": "done", "content": bot_reply}
+    dump_state = dump_state or (lambda s, t: dump_response_state(s, t, "legacy"))
+    done.update(dump_state(state, theme_state))
+    yield done
+
+
+def encode_event(event: Dict[str, Any], fmt: str = "sse") -> bytes:
+    """Frame one stream event as a Server-Sent Event or a JSON line."""
+    if fmt == "ndjson":
+        return (json.dumps(event) + "\n").encode("utf-8")
+    data = {k: v for k, v in event.items() if k != "type"}
+    return f"event: {event['type']}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
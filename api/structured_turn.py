@@ -0,0 +1,131 @@
+import json
+from typing import Any, Dict, Optional
+
+try:
+    from api.conversation_state import ConversationState
+    from api.theme_state import ThemeState
+    from api.llm_client import get_client
+    from api.prompts import build_prompt, turn_block
+    from api.timing import span, annotate
+    from api.model_router import route
+    from api.turn_steps import (
+        pending_question, skips_classifier, apply_verdict, branch_states, score_finished_themes,
+        generate_reply, finish_turn, reply_kind,
+    )
+    from api.verdict_cache import known_verdict, model_verdict, accepted_answers
+except ImportError:
+    from conversation_state import ConversationState
+    from theme_state import ThemeState
+    from llm_client import get_client
+    from prompts import build_prompt, turn_block
+    from timing import span, annotate
+    from model_router import route
+    from turn_steps import (
+        pending_question, skips_classifier, apply_verdict, branch_states, score_finished_themes,
+        generate_reply, finish_turn, reply_kind,
+    )
+    from verdict_cache import known_verdict, model_verdict, accepted_answers
+
+
+def build_structured_prompt(question: str, context: str, answered_turn: str, unanswered_turn: str) -> str:
+    """
+    One prompt that asks for the does_answer verdict and the matching reply
+    together: the shared context once, then where each verdict leaves the survey.
+    """
+    return f"""
+{context}
+
+First decide whether the user's last message answers this question:
+Question: {question}
+If it only partially answers the question, count it as answered.
+
+If the message answers the question, write your reply for this point in the survey:
+<turn>
+{answered_turn}
+</turn>
+
+Otherwise, write your reply for this point in the survey:
+<turn>
+{unanswered_turn}
+</turn>
+
+Respond as pure JSON, no extra text, with this exact shape:
+{{"answered": <true or false>, "reply": "<your reply to the user>"}}
+""".strip()
+
+
+def parse_structured_reply(content: Optional[str]) -> Optional[tuple[bool, str]]:
+    """Return (answered, reply) if the model output is valid, otherwise None."""
+    try:
+        data = json.loads(content or "")
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(data, dict):
+        return None
+    answered = data.get("answered")
+    reply = data.get("reply")
+    if not isinstance(answered, bool) or not isinstance(reply, str) or not reply.strip():
+        return None
+    return answered, reply
+
+
+def structured_turn(
+    state: ConversationState,
+    theme_state: ThemeState,
+    user_message: str,
+    client: Optional[Any] = None,
+) -> tuple[str, ConversationState, ThemeState, Dict[str, Any]]:
+    """
+    Same contract as handle_turn, but the verdict and the reply come back from a
+    single model call as JSON. A verdict known without the model needs only the
+    reply call; output that does not validate falls back to the model
+    classifier and a plain reply.
+    """
+    # Imported here because convo imports this module for its mode dispatch.
+    try:
+        from api.convo import handle_turn
+    except ImportError:
+        from convo import handle_turn
+
+    client = client or get_client()
+    question = pending_question(state, theme_state)
+    if question is None or skips_classifier(theme_state):
+        reply, state, theme_state = handle_turn(state, theme_state, user_message, client=client)
+        return reply, state, theme_state, {"llm_calls": 1, "fallback": False}
+    answered, _ = known_verdict(question, user_message, accepted_answers(theme_state))
+    if answered is not None:
+        # Settled without the model: one plain reply call, no verdict to ask for.
+        state, theme_state = apply_verdict(state, theme_state, user_message, answered)
+        reply = generate_reply(client, build_prompt(state, theme_state, user_message))
+        return finish_turn(reply, state), state, theme_state, {"llm_calls": 1, "fallback": False}
+
+    answered_branch = branch_states(state, theme_state, user_message, True)
+    unanswered_branch = branch_states(state, theme_state, user_message, False)
+    prompt = build_structured_prompt(
+        question,
+        build_prompt(state, theme_state, user_message, include_turn=False),
+        turn_block(*answered_branch),
+        turn_block(*unanswered_branch),
+    )
+    with span("structured_reply"):
+        response = route(
+            client,
+            reply_kind(),
+            messages=[{"role": "user", "content": prompt}],
+            response_format={"type": "json_object"},
+        )
+    llm_calls = 1
+    parsed = parse_structured_reply(response.choices[0].message.content)
+    if parsed is None:
+        # Fall back to the two-call path: the model classifier, then a plain reply.
+        answered = model_verdict(client, question, user_message)
+        state, theme_state = apply_verdict(state, theme_state, user_message, answered)
+        reply = generate_reply(client, build_prompt(state, theme_state, user_message))
+        llm_calls += 2
+        return finish_turn(reply, state), state, theme_state, {"llm_calls": llm_calls, "fallback": True}
+
+    answered, reply = parsed
+    annotate(verdict_source="structured")
+    state, theme_state = answered_branch if answered else unanswered_branch
+    score_finished_themes(theme_state)
+    return finish_turn(reply, state), state, theme_state, {"llm_calls": llm_calls, "fallback": False}
@@ -0,0 +1,97 @@
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+try:
+    from api.conversation_state import ConversationState
+    from api.theme_state import ThemeState
+except ImportError:
+    from conversation_state import ConversationState
+    from theme_state import ThemeState
+
+
+def survey_fingerprint(themes: Sequence[str], theme_questions: Sequence[Sequence[str]]) -> str:
+    """Stable hash of a survey's content, used to recognise legacy payloads."""
+    raw = json.dumps([list(themes), [list(q) for q in theme_questions]], ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class SurveyTemplate:
+    """
+    An immutable survey definition. The question lists are shared by every
+    session built from the template, so treat them as read-only.
+    """
+    id: str
+    version: int
+    themes: List[str]
+    theme_questions: List[List[str]]
+    fingerprint: str = field(init=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "fingerprint", survey_fingerprint(self.themes, self.theme_questions))
+
+    @property
+    def key(self) -> str:
+        return f"{self.id}@{self.version}"
+
+    def new_theme_state(self) -> ThemeState:
+        """Fresh session state for this survey, positioned on the first question."""
+        theme_state = ThemeState(themes=self.themes, theme_questions=self.theme_questions, template=self.key)
+        state = ConversationState(questions=theme_state.current_questions)
+        theme_state.set_conversation_state(theme_state.current_theme_index, state)
+        return theme_state
+
+
+_TEMPLATES: Dict[str, SurveyTemplate] = {}
+_BY_FINGERPRINT: Dict[str, SurveyTemplate] = {}
+_LATEST: Dict[str, SurveyTemplate] = {}
+
+
+def register_template(template: SurveyTemplate) -> SurveyTemplate:
+    existing = _TEMPLATES.get(template.key)
+    if existing is not None and existing.fingerprint != template.fingerprint:
+        raise ValueError(f"Template {template.key} is already registered with different content")
+    _TEMPLATES[template.key] = template
+    _BY_FINGERPRINT.setdefault(template.fingerprint, template)
+    latest = _LATEST.get(template.id)
+    if latest is None or template.version > latest.version:
+        _LATEST[template.id] = template
+    return template
+
+
+def get_template(key: str) -> SurveyTemplate:
+    """Look up a template by "id@version", or by bare id for the latest version."""
+    template = _TEMPLATES.get(key) or _LATEST.get(key)
+    if template is None:
+        raise KeyError(f"Unknown survey template: {key}")
+    return template
+
+
+def all_templates() -> List[SurveyTemplate]:
+    return list(_TEMPLATES.values())
+
+
+def find_template(themes: Sequence[str], theme_questions: Sequence[Sequence[str]]) -> Optional[SurveyTemplate]:
+    """Match a legacy payload's inline survey against the registry."""
+    return _BY_FINGERPRINT.get(survey_fingerprint(themes, theme_questions))
+
+
+BURNOUT_V1 = register_template(SurveyTemplate(
+    id="burnout",
+    version=1,
+    themes=["chitchat", "Exhaustion", "Depersonalization", "Professional efficacy"],
+    theme_questions=[
+        # Chitchat
+        ["Hi, I’d love to ask you a few questions to understand your situation better."],
+        # Exhaustion
+        ['Tell me about the last time you felt completely wiped out. What was happening that day?',
+         'When you hit that wiped-out feeling, what drains fastest: your patience with people, your physical energy, or your ability to think clearly?'],
+        # Depersonalization
+        ['These days, what part of work makes you want to just check out or stop caring?'],
+        # Professional efficacy
+        ['When you think about your actual skills and what you can do—not how you feel—how confident are you that you\'re still good at your work?',
+         'Looking back over the last few months, is this feeling getting better, staying the same, or getting worse?']
+    ],
+))
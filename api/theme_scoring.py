@@ -0,0 +1,249 @@
+"""
+Score each burnout dimension as soon as its theme is finished, in the
+background, so the final assessment only has to merge finished pieces.
+
+Jobs are keyed by a fingerprint of the theme's questions and answers: a
+speculative preview and the state that is finally adopted share one job, and
+a later turn (or the final assessment) picks up the result by the same key.
+A job meters its own model call, and that usage is charged to the session
+when its score is merged.
+"""
+import contextvars
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    from api.theme_state import ThemeState
+    from api.llm_client import get_client
+    from api.model_router import route
+    from api.startup import load_env
+    from api.usage import charge, metered
+except ImportError:
+    from theme_state import ThemeState
+    from llm_client import get_client
+    from model_router import route
+    from startup import load_env
+    from usage import charge, metered
+
+# Theme name (lower-cased) -> burnout dimension it measures.
+DIMENSIONS = {
+    "exhaustion": "exhaustion",
+    "depersonalization": "cynicism",
+    "cynicism": "cynicism",
+    "professional efficacy": "efficacy",
+    "efficacy": "efficacy",
+}
+
+DIMENSION_GUIDES = {
+    "exhaustion": (
+        "Exhaustion: how drained they are. Higher is worse. For the driver, name the type "
+        "(emotional, physical or mental) and its main trigger."
+    ),
+    "cynicism": (
+        "Cynicism: detachment from work. Higher is worse. For the driver, name the main AWS factor "
+        "(Workload, Control, Reward, Community, Fairness or Values) and what they detach from."
+    ),
+    "efficacy": (
+        "Professional efficacy: confidence in their ability and sense of accomplishment. Higher is "
+        "better. For the driver, name what sustains or erodes their confidence."
+    ),
+}
+
+
+class InvalidThemeScore(ValueError):
+    pass
+
+
+@dataclass
+class ThemeScore:
+    dimension: str
+    score: float
+    driver: str
+    summary: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ThemeScore":
+        return cls(
+            dimension=data["dimension"],
+            score=float(data["score"]),
+            driver=data.get("driver") or "",
+            summary=data.get("summary") or "",
+        )
+
+
+def dimension_for(theme: str) -> Optional[str]:
+    return DIMENSIONS.get(theme.strip().lower())
+
+
+def theme_answers(theme_state: ThemeState, index: int) -> list:
+    conversation = theme_state.get_conversation_state(index)
+    if conversation is None:
+        return []
+    return [
+        (conversation.questions[q] if q < len(conversation.questions) else "", answer)
+        for q, answer in sorted(conversation.answers.items())
+    ]
+
+
+def theme_fingerprint(theme: str, answers: list) -> str:
+    raw = json.dumps([theme, answers], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:24]
+
+
+def theme_score_request(dimension: str, answers: list) -> dict:
+    """Keyword arguments for scoring one dimension from that theme's answers."""
+    qa = "\n".join(f"Q: {q}\nA: {a}" for q, a in answers)
+    prompt = (
+        "You are scoring one dimension of a Maslach Burnout Inventory style assessment.\n"
+        f"{DIMENSION_GUIDES[dimension]}\n\n"
+        f"{qa}\n\n"
+        "Respond as pure JSON, no extra text, with this exact shape:\n"
+        '{"score": <number 0.0-5.0>, "driver": "<a few words>", '
+        '"summary": "<2-3 sentences addressed to them, quoting their own words where powerful>"}'
+    )
+    return dict(
+        messages=[{"role": "system", "content": prompt}],
+        response_format={"type": "json_object"},
+        temperature=0.0,
+        max_tokens=300,
+    )
+
+
+def parse_theme_score(content: Optional[str], dimension: str) -> ThemeScore:
+    try:
+        data = json.loads(content or "")
+    except (TypeError, ValueError):
+        raise InvalidThemeScore("not JSON") from None
+    if not isinstance(data, dict):
+        raise InvalidThemeScore("expected a JSON object")
+    score = data.get("score")
+    if isinstance(score, bool) or not isinstance(score, (int, float)) or not 0 <= score <= 5:
+        raise InvalidThemeScore(f"score must be a number 0-5, got {score!r}")
+    summary = data.get("summary")
+    if not isinstance(summary, str) or not summary.strip():
+        raise InvalidThemeScore("summary must be a non-empty string")
+    driver = data.get("driver") if isinstance(data.get("driver"), str) else ""
+    return ThemeScore(dimension=dimension, score=round(float(score), 1), driver=driver, summary=summary)
+
+
+class ThemeScorer:
+    """Runs and remembers per-theme scoring jobs; one per process."""
+
+    def __init__(self, client: Optional[Any] = None, enabled: bool = True, max_jobs: int = 1024, workers: int = 4):
+        self.client = client
+        self.enabled = enabled
+        self.max_jobs = max_jobs
+        self.workers = workers
+        self._jobs: "OrderedDict[str, Future]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _run(self, request: dict, dimension: str) -> Tuple[ThemeScore, Dict[str, Dict[str, int]]]:
+        client = self.client or get_client()
+        # The turn that started the job has usually answered already, so the job meters itself.
+        with metered() as meter:
+            response = route(client, "assessment", **request)
+        return parse_theme_score(response.choices[0].message.content, dimension), meter.snapshot()
+
+    def _job(self, theme_state: ThemeState, index: int, start: bool) -> Optional[Future]:
+        theme = theme_state.themes[index] if 0 <= index < len(theme_state.themes) else ""
+        dimension = dimension_for(theme)
+        answers = theme_answers(theme_state, index)
+        if dimension is None or not answers:
+            return None
+        key = theme_fingerprint(theme, answers)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None:
+                self._jobs.move_to_end(key)
+                return job
+            if not start:
+                return None
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="noorish-score")
+            # The request is built now, so later edits to the state can't race the job.
+            job = self._executor.submit(
+                contextvars.copy_context().run, self._run, theme_score_request(dimension, answers), dimension
+            )
+            self._jobs[key] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        return job
+
+    def schedule(self, theme_state: ThemeState, index: int) -> Optional[Future]:
+        """Start scoring a finished theme unless it is scored or already in flight."""
+        if not self.enabled or str(index) in theme_state.theme_scores:
+            return None
+        return self._job(theme_state, index, start=True)
+
+    def collect(self, theme_state: ThemeState, timeout: Optional[float] = 0) -> Dict[str, ThemeScore]:
+        """
+        Copy finished results for addressed themes into theme_state.theme_scores,
+        charging their usage to the session, and return all scores by dimension. With a timeout, missing themes are
+        started and waited for; failed jobs are dropped so they can be retried.
+        """
+        if timeout:
+            for index in theme_state.themes_addressed:
+                self.schedule(theme_state, index)
+        jobs = {}
+        for index in theme_state.themes_addressed:
+            if str(index) not in theme_state.theme_scores:
+                job = self._job(theme_state, index, start=False)
+                if job is not None:
+                    jobs[index] = job
+        if timeout and jobs:
+            wait(jobs.values(), timeout=timeout)
+        for index, job in jobs.items():
+            if not job.done():
+                continue
+            if job.exception() is not None:
+                self._forget(job)
+                continue
+            score, usage = job.result()
+            theme_state.theme_scores[str(index)] = score.to_dict()
+            charge(theme_state, usage)
+        return {
+            data["dimension"]: ThemeScore.from_dict(data) for data in theme_state.theme_scores.values()
+        }
+
+    def drain(self, timeout: Optional[float] = None) -> None:
+        """Wait for every job in flight, e.g. before shutting down."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        wait(jobs, timeout=timeout)
+
+    def _forget(self, job: Future) -> None:
+        with self._lock:
+            for key, value in list(self._jobs.items()):
+                if value is job:
+                    del self._jobs[key]
+
+
+_scorer: Optional[ThemeScorer] = None
+_scorer_lock = threading.Lock()
+
+
+def get_theme_scorer() -> ThemeScorer:
+    global _scorer
+    if _scorer is None:
+        with _scorer_lock:
+            if _scorer is None:
+                load_env()
+                enabled = os.environ.get("NOORISH_THEME_SCORING", "1").strip().lower() not in ("0", "false", "off")
+                _scorer = ThemeScorer(enabled=enabled)
+    return _scorer
+
+
+def set_theme_scorer(scorer: Optional[ThemeScorer]) -> None:
+    global _scorer
+    with _scorer_lock:
+        _scorer = scorer
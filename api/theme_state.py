@@ -14,9 +14,18 @@ class ThemeState:
     current_theme_index: int = 0
     themes_addressed: Dict[int, str] = field(default_factory=dict)
     conversations: Dict[int, ConversationState] = field(default_factory=dict)
+    # "id@version" of the registered survey template, if known
+    template: str = ""
+    # Compacted older answers for the prompt history, keyed "theme_index:question_index"
+    summaries: Dict[str, str] = field(default_factory=dict)
+    # Per-dimension scores of finished themes, keyed by theme index (see theme_scoring)
+    theme_scores: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # Token usage so far, by call type: {"reply": {"calls", "prompt_tokens", "completion_tokens"}} (see usage)
+    usage: Dict[str, Dict[str, int]] = field(default_factory=dict)
 
     def to_dict(self) -> Dict[str, Any]:
         return {
+            "template": self.template,
             "themes": self.themes,
             "theme_questions": self.theme_questions,
             "current_theme_index": self.current_theme_index,
@@ -24,6 +33,9 @@ class ThemeState:
             "conversations": {
                 idx: conv.to_dict() for idx, conv in self.conversations.items()
             },
+            "summaries": self.summaries,
+            "theme_scores": self.theme_scores,
+            "usage": self.usage,
         }
 
     @classmethod
@@ -44,6 +56,10 @@ class ThemeState:
             current_theme_index=int(data.get("current_theme_index", 0)),
             themes_addressed={int(k): v for k, v in (data.get("themes_addressed") or {}).items()},
             conversations=convs,
+            template=data.get("template") or "",
+            summaries=dict(data.get("summaries") or {}),
+            theme_scores=dict(data.get("theme_scores") or {}),
+            usage=dict(data.get("usage") or {}),
         )
 
     @property
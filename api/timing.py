@@ -0,0 +1,107 @@
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger("noorish.timing")
+
+Sink = Callable[[Dict[str, Any]], None]
+_sinks: List[Sink] = []
+_current: ContextVar[Optional["TurnTimer"]] = ContextVar("noorish_turn_timer", default=None)
+
+
+class TurnTimer:
+    """Stage durations and annotations for one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.fields: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, ms: float) -> None:
+        # Stages can repeat (e.g. a fallback reply) or run on worker threads; durations accumulate.
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + ms
+
+    def annotate(self, **fields: Any) -> None:
+        with self._lock:
+            self.fields.update(fields)
+
+    @property
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self) -> str:
+        """Value for the Server-Timing response header."""
+        with self._lock:
+            stages = list(self.stages.items())
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in stages)
+
+    def record(self) -> Dict[str, Any]:
+        with self._lock:
+            record = {"event": "turn", "total_ms": round(self.total_ms, 1)}
+            record["stages_ms"] = {name: round(ms, 1) for name, ms in self.stages.items()}
+            record.update(self.fields)
+        return record
+
+
+def add_sink(sink: Sink) -> None:
+    """Receive one record dict per request, e.g. to forward to a metrics backend."""
+    _sinks.append(sink)
+
+
+def remove_sink(sink: Sink) -> None:
+    if sink in _sinks:
+        _sinks.remove(sink)
+
+
+def current_timer() -> Optional[TurnTimer]:
+    return _current.get()
+
+
+@contextmanager
+def timed_request() -> Iterator[TurnTimer]:
+    """Make a fresh TurnTimer current for the duration of one request."""
+    timer = TurnTimer()
+    token = _current.set(timer)
+    try:
+        yield timer
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a stage against the current request; a no-op outside of one."""
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(stage, (time.perf_counter() - started) * 1000)
+
+
+def annotate(**fields: Any) -> None:
+    timer = _current.get()
+    if timer is not None:
+        timer.annotate(**fields)
+
+
+def emit(timer: TurnTimer) -> None:
+    """Write the request's structured log line and hand the record to every sink."""
+    if not _sinks and not logger.isEnabledFor(logging.INFO):
+        return
+    record = timer.record()
+    logger.info(json.dumps(record))
+    for sink in list(_sinks):
+        try:
+            sink(record)
+        except Exception:
+            logger.exception("timing sink failed")
@@ -0,0 +1,168 @@
+import copy
+from typing import Any, Optional
+
+try:
+    from api.conversation_state import ConversationState
+    from api.theme_state import ThemeState
+    from api.prompts import build_prompt
+    from api.timing import span
+    from api.model_router import route, route_async
+    from api.theme_scoring import get_theme_scorer
+    from api.usage import CHEAP, budget_mode
+except ImportError:
+    from conversation_state import ConversationState
+    from theme_state import ThemeState
+    from prompts import build_prompt
+    from timing import span
+    from model_router import route, route_async
+    from theme_scoring import get_theme_scorer
+    from usage import CHEAP, budget_mode
+
+COMPLETION_SUFFIX = " Thanks for completing the survey, next steps to follow..."
+
+
+def pending_question(state: ConversationState, theme_state: ThemeState) -> Optional[str]:
+    """
+    Return the question the latest message should be checked against,
+    or None if no answer is expected this turn.
+    """
+    # If this is the very first turn and no flag was set, expect an answer
+    if not state.awaiting_answer and not state.answers and state.current_index == 0:
+        state.awaiting_answer = True
+
+    if (
+        state.awaiting_answer
+        and not state.complete
+        and state.current_index not in state.answers
+    ):
+        return state.questions[state.current_index]
+    return None
+
+
+def skips_classifier(theme_state: ThemeState) -> bool:
+    # don't check chitchat theme for does answer
+    return theme_state.current_theme == 'chitchat'
+
+
+def apply_verdict(
+    state: ConversationState,
+    theme_state: ThemeState,
+    user_message: str,
+    answered: Optional[bool],
+    score: bool = True,
+) -> tuple[ConversationState, ThemeState]:
+    """
+    Record the verdict for the pending question (None when nothing was asked)
+    and move on to the next unanswered question, or the next theme when this
+    one is done. Questions answered earlier (e.g. by extraction) are skipped
+    here so every turn mode moves past them.
+    With `score`, a finished theme starts scoring in the background.
+    """
+    if answered is not None:
+        if answered:
+            state.answers[state.current_index] = user_message + '.'
+            state.current_index += 1
+            state.did_answer = True
+        else:
+            state.did_answer = False
+
+    while True:
+        while not state.complete and state.current_index in state.answers:
+            state.current_index += 1
+
+        # Persist the latest state for the current theme
+        theme_state.set_conversation_state(theme_state.current_theme_index, state)
+
+        # If we finished this theme and there is another theme, move to the next one
+        if not state.complete:
+            break
+        theme_state.mark_current_addressed()
+        if not theme_state.has_more_themes():
+            break
+        theme_state.advance_theme()
+        # Resume a prior conversation for this theme if it exists; otherwise start fresh
+        existing = theme_state.get_conversation_state(theme_state.current_theme_index)
+        if existing:
+            state = existing
+        else:
+            state = ConversationState(
+                questions=theme_state.current_questions,
+                current_index=0,
+                answers={},
+                awaiting_answer=True,
+                did_answer=False,
+            )
+            theme_state.set_conversation_state(theme_state.current_theme_index, state)
+    if score:
+        score_finished_themes(theme_state)
+    return state, theme_state
+
+
+def score_finished_themes(theme_state: ThemeState) -> None:
+    """Merge finished theme scores and start scoring addressed themes that have none yet."""
+    scorer = get_theme_scorer()
+    scorer.collect(theme_state)
+    for index in theme_state.themes_addressed:
+        scorer.schedule(theme_state, index)
+
+
+def branch_states(
+    state: ConversationState,
+    theme_state: ThemeState,
+    user_message: str,
+    answered: bool,
+) -> tuple[ConversationState, ThemeState]:
+    """
+    Apply a verdict to private copies of the states.
+    Nothing is scored: call score_finished_themes on the branch that is kept.
+    """
+    # Copy both together so theme_state.conversations keeps pointing at the same state object
+    state, theme_state = copy.deepcopy((state, theme_state))
+    return apply_verdict(state, theme_state, user_message, answered, score=False)
+
+
+def preview_branch(
+    state: ConversationState,
+    theme_state: ThemeState,
+    user_message: str,
+    answered: bool,
+) -> tuple[ConversationState, ThemeState, str]:
+    """branch_states plus that branch's reply prompt."""
+    state, theme_state = branch_states(state, theme_state, user_message, answered)
+    return state, theme_state, build_prompt(state, theme_state, user_message)
+
+
+def reply_kind() -> str:
+    """The route for this turn's reply: the cheaper one once the session nears its token budget."""
+    return "reply_lite" if budget_mode() == CHEAP else "reply"
+
+
+def generate_reply(client: Any, prompt: str) -> str:
+    # Call the model. Using chat completions for stability on Vercel.
+    with span("reply"):
+        response = route(
+            client,
+            reply_kind(),
+            messages=[{"role": "user", "content": prompt}],
+        )
+    return response.choices[0].message.content
+
+
+async def generate_reply_async(client: Any, prompt: str) -> str:
+    """generate_reply for an AsyncOpenAI client."""
+    with span("reply"):
+        response = await route_async(
+            client,
+            reply_kind(),
+            messages=[{"role": "user", "content": prompt}],
+        )
+    return response.choices[0].message.content
+
+
+def finish_turn(bot_reply: str, state: ConversationState) -> str:
+    # We just asked the next question (if any); expect an answer next turn
+    state.awaiting_answer = not state.complete
+
+    if state.complete:
+        bot_reply += COMPLETION_SUFFIX
+    return bot_reply
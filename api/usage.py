@@ -0,0 +1,201 @@
+"""
+Token usage accounting and budgets.
+
+Every routed model call reports its `response.usage` here, by call type. A
+request that runs inside `metered(theme_state)` gets a UsageMeter that
+collects its turn's usage (worker threads and hedged calls included) and adds
+it to `ThemeState.usage` on commit; background theme scoring is charged to the
+session when its score is merged. Process-wide totals per call type are kept
+in USAGE_TOTALS and reported on every request's structured log line.
+
+Budgets (tokens; 0 disables) degrade a turn instead of failing it:
+  NOORISH_SESSION_TOKEN_BUDGET  past NOORISH_BUDGET_CHEAP_AT of it, replies use
+                                the cheaper "reply_lite" route and half the
+                                prompt history; once spent, replies come from
+                                templates with no reply call
+  NOORISH_TURN_TOKEN_BUDGET     the reply prompt's history is cut to fit what
+                                is left of the turn's budget
+"""
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    from api.theme_state import ThemeState
+    from api.llm_client import _env_float, _env_int
+    from api.startup import load_env
+except ImportError:
+    from theme_state import ThemeState
+    from llm_client import _env_float, _env_int
+    from startup import load_env
+
+NORMAL = "normal"
+CHEAP = "cheap"
+TEMPLATE = "template"
+
+# Room kept for the reply itself when fitting a prompt into the turn budget.
+REPLY_RESERVE_TOKENS = 300
+
+
+@dataclass
+class Usage:
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add(self, other: "Usage") -> None:
+        self.calls += other.calls
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+
+    def to_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Usage":
+        return cls(
+            calls=int(data.get("calls", 0)),
+            prompt_tokens=int(data.get("prompt_tokens", 0)),
+            completion_tokens=int(data.get("completion_tokens", 0)),
+        )
+
+    @classmethod
+    def from_response(cls, response: Any) -> Optional["Usage"]:
+        usage = getattr(response, "usage", None)
+        prompt = getattr(usage, "prompt_tokens", None)
+        completion = getattr(usage, "completion_tokens", None)
+        if not isinstance(prompt, int) or not isinstance(completion, int):
+            return None
+        return cls(calls=1, prompt_tokens=prompt, completion_tokens=completion)
+
+
+@dataclass(frozen=True)
+class TokenBudget:
+    session: int = 0
+    turn: int = 0
+    cheap_at: float = 0.75
+
+    @classmethod
+    def from_env(cls) -> "TokenBudget":
+        load_env()
+        return cls(
+            session=_env_int("NOORISH_SESSION_TOKEN_BUDGET", 0),
+            turn=_env_int("NOORISH_TURN_TOKEN_BUDGET", 0),
+            cheap_at=_env_float("NOORISH_BUDGET_CHEAP_AT", 0.75),
+        )
+
+    def mode(self, session_tokens: int) -> str:
+        if not self.session:
+            return NORMAL
+        if session_tokens >= self.session:
+            return TEMPLATE
+        if session_tokens >= self.cheap_at * self.session:
+            return CHEAP
+        return NORMAL
+
+
+def usage_by_kind(data: Dict[str, Dict[str, Any]]) -> Dict[str, Usage]:
+    return {kind: Usage.from_dict(value) for kind, value in (data or {}).items()}
+
+
+def session_tokens(theme_state: ThemeState) -> int:
+    return sum(u.total_tokens for u in usage_by_kind(theme_state.usage).values())
+
+
+class UsageMeter:
+    """Usage per call type; one per turn, plus the process-wide USAGE_TOTALS."""
+
+    def __init__(self, budget: Optional[TokenBudget] = None, session_before: int = 0):
+        self.budget = budget or TokenBudget()
+        self.session_before = session_before
+        self.mode = self.budget.mode(session_before)
+        self.by_kind: Dict[str, Usage] = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, usage: Usage) -> None:
+        with self._lock:
+            self.by_kind.setdefault(kind, Usage()).add(usage)
+
+    def total(self) -> Usage:
+        total = Usage()
+        with self._lock:
+            for usage in self.by_kind.values():
+                total.add(usage)
+        return total
+
+    def turn_tokens_left(self) -> Optional[int]:
+        if not self.budget.turn:
+            return None
+        return self.budget.turn - self.total().total_tokens
+
+    def commit(self, theme_state: ThemeState) -> ThemeState:
+        """Add this turn's usage to the session's running totals."""
+        return charge(theme_state, self.snapshot())
+
+    def summary(self) -> Dict[str, Any]:
+        """What a response reports: this turn's tokens, the session's after it, and the budget mode."""
+        turn = self.total()
+        return {
+            "turn": dict(turn.to_dict(), total_tokens=turn.total_tokens),
+            "session_tokens": self.session_before + turn.total_tokens,
+            "budget": self.mode,
+        }
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {kind: usage.to_dict() for kind, usage in self.by_kind.items()}
+
+
+def charge(theme_state: ThemeState, by_kind: Dict[str, Dict[str, int]]) -> ThemeState:
+    """Add usage per call type (a UsageMeter snapshot) to the session's running totals."""
+    for kind, usage in usage_by_kind(by_kind).items():
+        merged = Usage.from_dict(theme_state.usage.get(kind) or {})
+        merged.add(usage)
+        theme_state.usage[kind] = merged.to_dict()
+    return theme_state
+
+
+USAGE_TOTALS = UsageMeter()
+_current: ContextVar[Optional[UsageMeter]] = ContextVar("noorish_usage_meter", default=None)
+
+
+def usage_totals() -> Dict[str, Any]:
+    """Process-wide usage per call type since start-up, for logs and metrics."""
+    return {"by_kind": USAGE_TOTALS.snapshot(), "total_tokens": USAGE_TOTALS.total().total_tokens}
+
+
+def current_meter() -> Optional[UsageMeter]:
+    return _current.get()
+
+
+def budget_mode() -> str:
+    meter = _current.get()
+    return meter.mode if meter is not None else NORMAL
+
+
+@contextmanager
+def metered(theme_state: Optional[ThemeState] = None, budget: Optional[TokenBudget] = None) -> Iterator[UsageMeter]:
+    """Meter the model calls made inside the block against the session's budget."""
+    meter = UsageMeter(budget or TokenBudget.from_env(), session_tokens(theme_state) if theme_state else 0)
+    token = _current.set(meter)
+    try:
+        yield meter
+    finally:
+        _current.reset(token)
+
+
+def record_usage(kind: str, response: Any) -> None:
+    """Called for every completed model call; responses without usage (streams) are skipped."""
+    usage = Usage.from_response(response)
+    if usage is None:
+        return
+    USAGE_TOTALS.record(kind, usage)
+    meter = _current.get()
+    if meter is not None:
+        meter.record(kind, usage)
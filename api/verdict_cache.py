@@ -0,0 +1,331 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from api.theme_state import ThemeState
+    from api.does_answer import does_answer, does_answer_async, too_short
+    from api.timing import span, annotate
+    from api.startup import load_env
+except ImportError:
+    from theme_state import ThemeState
+    from does_answer import does_answer, does_answer_async, too_short
+    from timing import span, annotate
+    from startup import load_env
+
+GREETINGS = {
+    "hi", "hey", "hello", "hiya", "yo", "sup", "howdy", "greetings",
+    "good morning", "good afternoon", "good evening",
+    "hi there", "hey there", "hello there", "whats up", "how are you",
+}
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text: Optional[str]) -> str:
+    """Lowercase, drop punctuation and collapse whitespace so trivial variants share a key."""
+    text = _NON_WORD.sub("", (text or "").lower())
+    return _SPACES.sub(" ", text).strip()
+
+
+def pre_classify(message: str, accepted_answers: Iterable[str] = ()) -> Optional[bool]:
+    """
+    Cheap deterministic verdict for the obvious cases, or None if the model is needed.
+    Empty messages, bare greetings and exact repeats of an answer already accepted
+    for another question never answer the current question.
+    """
+    normalized = normalize(message)
+    if not normalized or normalized in GREETINGS:
+        return False
+    if any(normalized == normalize(answer) for answer in accepted_answers):
+        return False
+    return None
+
+
+def accepted_answers(theme_state: ThemeState) -> List[str]:
+    """Every answer recorded so far, across all themes."""
+    return [
+        answer
+        for conversation in theme_state.conversations.values()
+        for answer in conversation.answers.values()
+    ]
+
+
+class SQLiteVerdictBackend:
+    """Verdict store in a local SQLite file, shared by every process on the box."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts (key TEXT PRIMARY KEY, verdict INTEGER, expires REAL)"
+        )
+
+    def get(self, key: str) -> Optional[bool]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT verdict FROM verdicts WHERE key = ? AND expires > ?", (key, time.time())
+            ).fetchone()
+        return None if row is None else bool(row[0])
+
+    def set(self, key: str, verdict: bool, ttl_seconds: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO verdicts (key, verdict, expires) VALUES (?, ?, ?)",
+                (key, int(verdict), time.time() + ttl_seconds),
+            )
+
+
+class VerdictCache:
+    """In-process LRU with TTL for model verdicts, optionally backed by a shared store."""
+
+    def __init__(self, max_entries: int = 4096, ttl_seconds: float = 3600.0, backend: Optional[Any] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self._entries: "OrderedDict[str, Tuple[bool, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.short_circuits = 0
+
+    @staticmethod
+    def key(kind: str, question: str, message: str) -> str:
+        return f"{kind}\x1f{normalize(question)}\x1f{normalize(message)}"
+
+    def get(self, key: str) -> Optional[bool]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                verdict, expires = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return verdict
+                del self._entries[key]
+        verdict = self.backend.get(key) if self.backend is not None else None
+        with self._lock:
+            if verdict is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._store(key, verdict, now)
+        return verdict
+
+    def set(self, key: str, verdict: bool) -> None:
+        with self._lock:
+            self._store(key, verdict, time.monotonic())
+        if self.backend is not None:
+            self.backend.set(key, verdict, self.ttl_seconds)
+
+    def _store(self, key: str, verdict: bool, now: float) -> None:
+        self._entries[key] = (verdict, now + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def record_short_circuit(self) -> None:
+        with self._lock:
+            self.short_circuits += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.short_circuits = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "short_circuits": self.short_circuits,
+                "size": len(self._entries),
+            }
+
+
+def _default_cache() -> VerdictCache:
+    load_env()
+    path = os.environ.get("NOORISH_VERDICT_CACHE_DB")
+    return VerdictCache(
+        max_entries=int(os.environ.get("NOORISH_VERDICT_CACHE_SIZE", 4096)),
+        ttl_seconds=float(os.environ.get("NOORISH_VERDICT_CACHE_TTL", 3600)),
+        backend=SQLiteVerdictBackend(path) if path else None,
+    )
+
+
+_cache: Optional[VerdictCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_verdict_cache() -> VerdictCache:
+    """Process-wide verdict cache, configured from NOORISH_VERDICT_CACHE_* on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = _default_cache()
+    return _cache
+
+
+def set_verdict_cache(cache: Optional[VerdictCache]) -> None:
+    global _cache
+    with _cache_lock:
+        _cache = cache
+
+
+_local_classifier: Optional[Any] = None
+_local_loaded = False
+_local_lock = threading.Lock()
+
+
+def get_local_classifier() -> Optional[Any]:
+    """The local relevance classifier when NOORISH_LOCAL_CLASSIFIER is on, else None."""
+    global _local_classifier, _local_loaded
+    if not _local_loaded:
+        with _local_lock:
+            if not _local_loaded:
+                load_env()
+                if os.environ.get("NOORISH_LOCAL_CLASSIFIER", "0").strip().lower() in ("1", "true", "on"):
+                    # NumPy is only imported once the classifier is switched on.
+                    try:
+                        from api.local_classifier import LocalClassifier
+                    except ImportError:
+                        from local_classifier import LocalClassifier
+                    _local_classifier = LocalClassifier.from_env()
+                _local_loaded = True
+    return _local_classifier
+
+
+def set_local_classifier(classifier: Optional[Any]) -> None:
+    global _local_classifier, _local_loaded
+    with _local_lock:
+        _local_classifier, _local_loaded = classifier, True
+
+
+def _local_verdict(question: str, message: str) -> Optional[bool]:
+    classifier = get_local_classifier()
+    if classifier is None:
+        return None
+    with span("local_classifier"):
+        return classifier.verdict(question, message)
+
+
+def _cached_verdict(
+    question: str, message: str, accepted: Iterable[str], cache: VerdictCache
+) -> Tuple[Optional[bool], str, str]:
+    """
+    Verdict from the pre-classifier, the cache or the local classifier and
+    where it came from, plus the cache key.
+    """
+    key = VerdictCache.key("does_answer", question, message)
+    verdict = pre_classify(message, accepted)
+    if verdict is not None:
+        cache.record_short_circuit()
+        return verdict, key, "short_circuit"
+    verdict = cache.get(key)
+    if verdict is not None:
+        return verdict, key, "cache"
+    return _local_verdict(question, message), key, "local"
+
+
+def known_verdict(
+    question: str,
+    message: str,
+    accepted: Iterable[str] = (),
+    cache: Optional[VerdictCache] = None,
+) -> Tuple[Optional[bool], str]:
+    """
+    The verdict when no model call is needed, and where it came from
+    (short_circuit, cache or local); (None, "model") when the model must decide.
+    """
+    cache = cache or get_verdict_cache()
+    with span("does_answer"):
+        verdict, _, source = _cached_verdict(question, message, accepted, cache)
+    if verdict is None:
+        return None, "model"
+    annotate(verdict_source=source)
+    return verdict, source
+
+
+def model_verdict(client, question: str, message: str, cache: Optional[VerdictCache] = None) -> bool:
+    """does_answer for a message known_verdict could not settle; the verdict is cached."""
+    cache = cache or get_verdict_cache()
+    with span("does_answer"):
+        verdict = does_answer(client, question, message)
+    cache.set(VerdictCache.key("does_answer", question, message), verdict)
+    annotate(verdict_source="model")
+    return verdict
+
+
+async def model_verdict_async(client, question: str, message: str, cache: Optional[VerdictCache] = None) -> bool:
+    """model_verdict for an AsyncOpenAI client."""
+    cache = cache or get_verdict_cache()
+    with span("does_answer"):
+        verdict = await does_answer_async(client, question, message)
+    cache.set(VerdictCache.key("does_answer", question, message), verdict)
+    annotate(verdict_source="model")
+    return verdict
+
+
+def classify_answer_with_source(
+    client,
+    question: str,
+    message: str,
+    accepted: Iterable[str] = (),
+    cache: Optional[VerdictCache] = None,
+) -> Tuple[bool, str]:
+    """classify_answer, plus where the verdict came from: short_circuit, cache, local or model."""
+    verdict, source = known_verdict(question, message, accepted, cache)
+    if verdict is None:
+        verdict = model_verdict(client, question, message, cache)
+    return verdict, source
+
+
+def classify_answer(
+    client,
+    question: str,
+    message: str,
+    accepted: Iterable[str] = (),
+    cache: Optional[VerdictCache] = None,
+) -> bool:
+    """
+    does_answer behind the pre-classifier, the verdict cache and, when enabled,
+    the local classifier; only uncertain messages reach the model.
+    """
+    return classify_answer_with_source(client, question, message, accepted, cache)[0]
+
+
+async def classify_answer_async(
+    client,
+    question: str,
+    message: str,
+    accepted: Iterable[str] = (),
+    cache: Optional[VerdictCache] = None,
+) -> bool:
+    """classify_answer for an AsyncOpenAI client."""
+    verdict, _ = known_verdict(question, message, accepted, cache)
+    if verdict is None:
+        verdict = await model_verdict_async(client, question, message, cache)
+    return verdict
+
+
+def classify_too_short(client, question: str, answer: str, cache: Optional[VerdictCache] = None) -> bool:
+    """too_short behind the verdict cache; an empty answer is always too short."""
+    cache = cache or get_verdict_cache()
+    if not normalize(answer):
+        cache.record_short_circuit()
+        return True
+    key = VerdictCache.key("too_short", question, answer)
+    verdict = cache.get(key)
+    if verdict is None:
+        verdict = too_short(client, question, answer)
+        cache.set(key, verdict)
+    return verdict
@@ -0,0 +1 @@
+# Marks bench as a package so the harness runs with `python -m bench.run_bench`.
@@ -0,0 +1,123 @@
+"""
+Evaluate the local answer-relevance classifier against LLM verdicts.
+
+Input is JSONL with one {"question", "message", "label"} object per line,
+where `label` is the model's does_answer verdict. The report gives, for the
+chosen band and a sweep of others, how often the classifier escalates to the
+model and how often its own verdicts agree with the model's, so the band can
+be picked for cost vs. accuracy.
+
+    python -m bench.eval_classifier bench/data/verdicts_sample.jsonl --band 0.2,0.8
+    python -m bench.eval_classifier bench/data/verdicts_heldout.jsonl  # kept out of tuning
+    python -m bench.eval_classifier labeled.jsonl --fit weights.json   # fit on 70%, report on the rest
+    python -m bench.eval_classifier pairs.jsonl --label labeled.jsonl  # fill in labels with the model
+"""
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from api.local_classifier import LocalClassifier
+
+SWEEP = ((0.5, 0.5), (0.4, 0.6), (0.3, 0.7), (0.2, 0.8), (0.1, 0.9), (0.05, 0.95))
+
+
+def read_examples(path: Path) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def parse_band(text: str) -> Tuple[float, float]:
+    low, _, high = text.partition(",")
+    return float(low), float(high or low)
+
+
+def band_report(probabilities: np.ndarray, labels: np.ndarray, band: Tuple[float, float]) -> Dict[str, Any]:
+    """Escalation rate and agreement for one band, counting escalated cases as settled by the model."""
+    low, high = band
+    local = (probabilities <= low) | (probabilities >= high)
+    agree = (probabilities >= high) == labels
+    n_local = int(local.sum())
+    return {
+        "band": [low, high],
+        "escalation_rate": round(1 - n_local / len(labels), 3),
+        "local_agreement": round(float(agree[local].mean()), 3) if n_local else None,
+        "final_agreement": round(float((agree | ~local).mean()), 3),
+        "false_answered": int((local & (probabilities >= high) & ~labels).sum()),
+        "false_unanswered": int((local & (probabilities <= low) & labels).sum()),
+    }
+
+
+def calibration(probabilities: np.ndarray, labels: np.ndarray, bins: int = 10) -> Dict[str, float]:
+    p = np.clip(probabilities, 1e-6, 1 - 1e-6)
+    log_loss = float(-np.mean(labels * np.log(p) + (~labels) * np.log(1 - p)))
+    which = np.minimum((p * bins).astype(int), bins - 1)
+    ece = sum(
+        abs(float(p[which == b].mean()) - float(labels[which == b].mean())) * float((which == b).mean())
+        for b in range(bins) if (which == b).any()
+    )
+    return {"log_loss": round(log_loss, 4), "expected_calibration_error": round(ece, 4)}
+
+
+def evaluate(classifier: LocalClassifier, examples: Sequence[Dict[str, Any]], band: Tuple[float, float]) -> Dict[str, Any]:
+    questions = [e["question"] for e in examples]
+    messages = [e["message"] for e in examples]
+    labels = np.asarray([bool(e["label"]) for e in examples])
+    probabilities = classifier.probabilities(questions, messages)
+    return {
+        "examples": len(examples),
+        "answered_share": round(float(labels.mean()), 3),
+        **band_report(probabilities, labels, band),
+        **calibration(probabilities, labels),
+        "sweep": [band_report(probabilities, labels, b) for b in SWEEP],
+    }
+
+
+def label_with_model(examples: List[Dict[str, Any]], output: Path) -> int:
+    from api.does_answer import does_answer
+    from api.llm_client import get_client
+
+    client = get_client()
+    with open(output, "w", encoding="utf-8") as f:
+        for example in examples:
+            if "label" not in example:
+                example = dict(example, label=does_answer(client, example["question"], example["message"]))
+            f.write(json.dumps(example, ensure_ascii=False) + "\n")
+    return len(examples)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", type=Path)
+    parser.add_argument("--band", type=parse_band, default=(0.2, 0.8))
+    parser.add_argument("--weights", type=Path, default=None, help="a previously fitted weights file")
+    parser.add_argument("--fit", type=Path, default=None, help="fit weights and write them here")
+    parser.add_argument("--holdout", type=float, default=0.3, help="share of examples kept out of fitting")
+    parser.add_argument("--label", type=Path, default=None, help="label unlabeled lines with the model, write here")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    examples = read_examples(args.input)
+    if args.label:
+        print(f"Labeled {label_with_model(examples, args.label)} examples into {args.label}", file=sys.stderr)
+        return 0
+    classifier = LocalClassifier.from_file(args.weights, band=args.band) if args.weights else LocalClassifier(band=args.band)
+    report: Dict[str, Any] = {}
+    if args.fit:
+        random.Random(args.seed).shuffle(examples)
+        cut = int(len(examples) * (1 - args.holdout))
+        train, examples = examples[:cut], examples[cut:]
+        classifier.fit([e["question"] for e in train], [e["message"] for e in train], [bool(e["label"]) for e in train])
+        classifier.save(args.fit)
+        report["fitted_on"] = len(train)
+    report.update(evaluate(classifier, examples, args.band))
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
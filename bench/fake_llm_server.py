@@ -0,0 +1,283 @@
+"""
+A local stand-in for the OpenAI chat completions API with configurable latency
+and failure injection, so turn latency can be measured without network noise.
+
+    python -m bench.fake_llm_server --port 8765 --latency lognormal:-2.5,0.5 --failure-rate 0.02
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+
+class LatencyModel:
+    """
+    Samples a delay in seconds from a spec string:
+    `fixed:S`, `uniform:LO,HI`, `lognormal:MU,SIGMA` (of the underlying normal).
+    """
+
+    def __init__(self, spec: str, rng: Optional[random.Random] = None):
+        self.spec = spec
+        self.rng = rng or random.Random()
+        kind, _, args = spec.partition(":")
+        self.kind = kind
+        self.args = [float(a) for a in args.split(",") if a]
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            return self.args[0] if self.args else 0.0
+        if self.kind == "uniform":
+            return self.rng.uniform(self.args[0], self.args[1])
+        return self.rng.lognormvariate(self.args[0], self.args[1])
+
+
+def call_type(body: Dict) -> str:
+    """Tell the call sites apart from the request shape alone."""
+    if body.get("max_tokens") == 1:
+        return "classify"
+    if body.get("max_tokens") == 2:
+        return "too_short"
+    if body.get("response_format"):
+        system = next((m.get("content") or "" for m in body.get("messages", []) if m.get("role") == "system"), "")
+        if "score_percent" in system:
+            return "assessment"
+        if '"answers":' in system:
+            return "extract"
+        return "theme_score" if '"score":' in system else "structured"
+    return "reply"
+
+
+@dataclass
+class FakeLLMConfig:
+    latency: str = "fixed:0"
+    # Optional override for the short classifier calls
+    classify_latency: Optional[str] = None
+    failure_rate: float = 0.0
+    failure_status: int = 500
+    # Probability the classifier says the message answered the question
+    answer_rate: float = 1.0
+    # Probability an extraction call finds each further open question answered too
+    extra_answer_rate: float = 0.0
+    reply: str = "Thanks for sharing that. Could you tell me a bit more about how that felt?"
+    seed: Optional[int] = None
+
+
+@dataclass
+class FakeLLMStats:
+    calls: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    failures: int = 0
+    latencies: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    tokens: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def record(self, kind: str, seconds: float, failed: bool) -> None:
+        with self.lock:
+            self.calls[kind] += 1
+            self.latencies[kind].append(seconds)
+            if failed:
+                self.failures += 1
+
+    def record_tokens(self, kind: str, usage: Dict[str, int]) -> None:
+        with self.lock:
+            self.tokens[kind] += usage["total_tokens"]
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(self.tokens.values())
+
+
+class FakeLLMServer:
+    def __init__(self, config: FakeLLMConfig, host: str = "127.0.0.1", port: int = 0):
+        self.config = config
+        self.stats = FakeLLMStats()
+        self._rng = random.Random(config.seed)
+        self._rng_lock = threading.Lock()
+        self._latency = LatencyModel(config.latency, self._rng)
+        self._classify_latency = LatencyModel(config.classify_latency, self._rng) if config.classify_latency else None
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "FakeLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _draw(self, kind: str):
+        with self._rng_lock:
+            model = self._classify_latency if kind == "classify" and self._classify_latency else self._latency
+            delay = max(0.0, model.sample())
+            failed = self._rng.random() < self.config.failure_rate
+            answered = self._rng.random() < self.config.answer_rate
+        return delay, failed, answered
+
+    def _extracted(self, system: str, answered: bool) -> List[int]:
+        count = len(re.findall(r"^\s*\d+\. ", system, re.MULTILINE))
+        with self._rng_lock:
+            extra = [n for n in range(2, count + 1) if self._rng.random() < self.config.extra_answer_rate]
+        return ([1] if answered else []) + extra
+
+    def _content(self, kind: str, answered: bool, body: Optional[Dict] = None) -> str:
+        if kind == "classify":
+            return "true" if answered else "false"
+        if kind == "extract":
+            system = (body or {}).get("messages", [{}])[0].get("content") or ""
+            return json.dumps({"answers": self._extracted(system, answered)})
+        if kind == "too_short":
+            return "long enough"
+        if kind == "assessment":
+            return json.dumps({"score_percent": 50, "evaluation_markdown": "You're in the Overextended zone"})
+        if kind == "theme_score":
+            return json.dumps({"score": 3.0, "driver": "Workload", "summary": "It has been a heavy stretch."})
+        if kind == "structured":
+            return json.dumps({"answered": answered, "reply": self.config.reply})
+        return self.config.reply
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                kind = call_type(body)
+                delay, failed, answered = server._draw(kind)
+                time.sleep(delay)
+                server.stats.record(kind, delay, failed)
+                if failed:
+                    self._send_json(server.config.failure_status, {
+                        "error": {"message": "injected failure", "type": "server_error"}
+                    })
+                    return
+                content = server._content(kind, answered, body)
+                usage = _usage(body, content)
+                server.stats.record_tokens(kind, usage)
+                if body.get("stream"):
+                    self._send_stream(body, content, usage)
+                else:
+                    self._send_json(200, completion(body.get("model", ""), content, usage))
+
+            def _send_json(self, status: int, payload: Dict) -> None:
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, body: Dict, content: str, usage: Dict[str, int]) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for i in range(0, len(content), 8):
+                    chunk = completion_chunk(body.get("model", ""), content[i:i + 8])
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    chunk = dict(completion_chunk(body.get("model", ""), ""), choices=[], usage=usage)
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+        return Handler
+
+
+def _usage(body: Dict, content: str) -> Dict[str, int]:
+    # ~4 characters per token, like prompts.estimate_tokens
+    prompt_tokens = sum(len(m.get("content") or "") for m in body.get("messages", [])) // 4
+    completion_tokens = max(1, len(content) // 4)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def completion(model: str, content: str, usage: Dict[str, int]) -> Dict:
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": usage,
+    }
+
+
+def completion_chunk(model: str, delta: str) -> Dict:
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="fixed:0")
+    parser.add_argument("--classify-latency")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--failure-status", type=int, default=500)
+    parser.add_argument("--answer-rate", type=float, default=1.0)
+    parser.add_argument("--extra-answer-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    config = FakeLLMConfig(
+        latency=args.latency,
+        classify_latency=args.classify_latency,
+        failure_rate=args.failure_rate,
+        failure_status=args.failure_status,
+        answer_rate=args.answer_rate,
+        extra_answer_rate=args.extra_answer_rate,
+        seed=args.seed,
+    )
+    server = FakeLLMServer(config, args.host, args.port)
+    print(f"Fake LLM listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
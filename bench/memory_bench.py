@@ -0,0 +1,99 @@
+"""
+Measure how many bytes each live session costs in one process, for the
+representations a server could keep in memory:
+
+  dataclass  ThemeState/ConversationState as rebuilt from a legacy payload
+  payload    the compact wire dict (what the in-memory session store used to hold)
+  slotted    CompactSession, sharing one interned survey definition
+
+    python -m bench.memory_bench --sessions 5000
+"""
+import argparse
+import gc
+import json
+import sys
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from api.compact_session import CompactSession
+from api.conversation_state import ConversationState
+from api.state_codec import encode_compact
+from api.survey_templates import SurveyTemplate, get_template
+from api.theme_state import ThemeState
+from bench.run_bench import ANSWERS
+
+
+def synthetic_session(template: SurveyTemplate, answered: int, respondent: int) -> ThemeState:
+    """A session `answered` questions in, with answers unique to the respondent."""
+    theme_state = template.new_theme_state()
+    remaining = answered
+    for t, questions in enumerate(template.theme_questions):
+        if remaining <= 0:
+            break
+        conv = theme_state.get_conversation_state(t)
+        for q in range(min(remaining, len(questions))):
+            text = ANSWERS[(t + q) % len(ANSWERS)]
+            conv.answers[q] = f"{text} ({respondent}-{t}-{q})."
+            conv.current_index = q + 1
+        remaining -= conv.current_index
+        conv.awaiting_answer = not conv.complete
+        conv.did_answer = True
+        if conv.complete:
+            theme_state.mark_current_addressed()
+            if theme_state.has_more_themes():
+                theme_state.advance_theme()
+                theme_state.set_conversation_state(
+                    theme_state.current_theme_index,
+                    ConversationState(questions=theme_state.current_questions),
+                )
+    return theme_state
+
+
+REPRESENTATIONS: Dict[str, Callable[[ThemeState], Any]] = {
+    # Legacy requests carry the survey inline, so every session owns its own copies.
+    "dataclass": lambda theme_state: theme_state,
+    "payload": encode_compact,
+    "slotted": CompactSession.from_theme_state,
+}
+
+
+def bytes_per_session(sources: List[str], build: Callable[[ThemeState], Any]) -> float:
+    """Traced bytes still held after decoding every source and keeping `build`'s result."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [build(ThemeState.from_dict(json.loads(source))) for source in sources]
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return (after - before) / len(sources)
+
+
+def run_memory_benchmark(sessions: int = 2000, template: str = "burnout") -> Dict[str, Any]:
+    survey = get_template(template)
+    total = sum(len(q) for q in survey.theme_questions)
+    states = [synthetic_session(survey, n % (total + 1), n) for n in range(sessions)]
+    sources = [json.dumps(s.to_dict()) for s in states]
+    del states
+    report: Dict[str, Any] = {"config": {"sessions": sessions, "template": survey.key}, "bytes_per_session": {}}
+    for name, build in REPRESENTATIONS.items():
+        report["bytes_per_session"][name] = round(bytes_per_session(sources, build))
+    baseline = report["bytes_per_session"]["dataclass"]
+    report["ratio_to_dataclass"] = {
+        name: round(value / baseline, 3) for name, value in report["bytes_per_session"].items()
+    }
+    return report
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--template", default="burnout")
+    args = parser.parse_args(argv)
+    print(json.dumps(run_memory_benchmark(args.sessions, args.template), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,336 @@
+"""
+Drive whole surveys through the convo handler against the fake LLM server and
+report turn latency percentiles, LLM calls and tokens per completed survey and
+payload sizes. Token budgets apply as configured in the environment
+(NOORISH_SESSION_TOKEN_BUDGET, NOORISH_TURN_TOKEN_BUDGET).
+
+    python -m bench.run_bench --surveys 50 --concurrency 8 --latency lognormal:-2.3,0.5
+    python -m bench.run_bench --baseline bench/baseline.json            # fail on regressions
+    python -m bench.run_bench --baseline bench/baseline.json --update-baseline
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from api import llm_client
+from api.convo import handler
+from api.llm_gateway import GatewaySettings, LLMGateway, set_gateway
+from api.theme_scoring import get_theme_scorer
+from api.survey_templates import get_template
+from bench.fake_llm_server import FakeLLMConfig, FakeLLMServer
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+# One canned answer per question. Messages are made unique per respondent and turn,
+# as real users' would be, so repeated text doesn't turn into verdict cache hits.
+ANSWERS = [
+    "Hi! Sure, happy to chat.",
+    "Last Thursday I closed out a release at 2am and then had back-to-back meetings all morning.",
+    "Mostly my patience with people, I snap at small things.",
+    "The endless status reports make me want to stop caring.",
+    "I still think I'm good at the work itself, fairly confident.",
+    "It's been getting worse since the reorg in spring.",
+]
+MAX_TURNS = 40
+
+
+class QuietHandler(handler):
+    def log_message(self, format, *args):
+        pass
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile; 0 for an empty sample."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(values: Sequence[float]) -> Dict[str, float]:
+    return {
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "mean": round(sum(values) / len(values), 3) if values else 0.0,
+    }
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    """`parse;dur=0.1, reply;dur=52.3` -> {"parse": 0.1, "reply": 52.3}"""
+    stages = {}
+    for entry in filter(None, (e.strip() for e in header.split(","))):
+        name, _, params = entry.partition(";")
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip() == "dur":
+                stages[name.strip()] = float(value)
+    return stages
+
+
+class SurveyDriver:
+    """Plays one respondent through the survey over HTTP, like a real client would."""
+
+    def __init__(self, url: str, respondent: int, mode: str, state_format: str, template: str):
+        self.url = url
+        self.respondent = respondent
+        self.mode = mode
+        self.state_format = state_format
+        self.template = template
+        self.turn_ms: List[float] = []
+        self.request_bytes: List[int] = []
+        self.response_bytes: List[int] = []
+        self.server_stages: Dict[str, List[float]] = {}
+        self.errors = 0
+
+    def _post(self, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        data = json.dumps(payload).encode("utf-8")
+        request = urllib.request.Request(self.url, data=data, headers={"Content-Type": "application/json"})
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=120) as response:
+                raw = response.read()
+                timing = response.headers.get("Server-Timing", "")
+        except urllib.error.HTTPError as exc:
+            exc.read()
+            self.errors += 1
+            return None
+        self.turn_ms.append((time.perf_counter() - started) * 1000)
+        self.request_bytes.append(len(data))
+        self.response_bytes.append(len(raw))
+        for name, ms in parse_server_timing(timing).items():
+            self.server_stages.setdefault(name, []).append(ms)
+        return json.loads(raw)
+
+    def _payload(self, content: str, body: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {"content": content, "mode": self.mode}
+        if self.state_format == "session":
+            if body is None:
+                payload["template"] = self.template
+            else:
+                payload["session_id"] = body["session_id"]
+                payload["version"] = body["version"]
+        elif body is None:
+            theme_state = get_template(self.template).new_theme_state()
+            payload["theme_state"] = theme_state.to_dict()
+            payload["state_format"] = self.state_format
+        elif "state" in body:
+            payload["state"] = body["state"]
+        else:
+            payload["conversation_state"] = body["conversation_state"]
+            payload["theme_state"] = body["theme_state"]
+        return payload
+
+    @staticmethod
+    def _progress(body: Dict[str, Any]) -> int:
+        """How many questions have been answered so far, from the response alone."""
+        if "state" in body:
+            return sum(len(c[2]) for c in body["state"]["c"].values())
+        convs = body.get("theme_state", {}).get("conversations", {})
+        return sum(len(c.get("answers", {})) for c in convs.values())
+
+    def run(self, total_questions: int) -> bool:
+        body = None
+        answered = 0
+        for turn in range(MAX_TURNS):
+            answer = ANSWERS[min(answered, len(ANSWERS) - 1)]
+            content = f"{answer} (respondent {self.respondent}, turn {turn})"
+            result = self._post(self._payload(content, body))
+            if result is None:
+                continue
+            body = result
+            if self.state_format == "session":
+                answered = self._session_progress(body)
+            else:
+                answered = self._progress(body)
+            if answered >= total_questions:
+                return True
+        return False
+
+    def _session_progress(self, body: Dict[str, Any]) -> int:
+        from api.session_store import get_session_store
+
+        payload, _ = get_session_store().load(body["session_id"])
+        return sum(len(c[2]) for c in payload["c"].values())
+
+
+def run_benchmark(
+    surveys: int = 20,
+    concurrency: int = 4,
+    mode: str = "sequential",
+    state_format: str = "legacy",
+    template: str = "burnout",
+    llm: Optional[FakeLLMConfig] = None,
+) -> Dict[str, Any]:
+    llm = llm or FakeLLMConfig()
+    total_questions = sum(len(q) for q in get_template(template).theme_questions)
+    saved_env = {k: os.environ.get(k) for k in ("OPENAI_BASE_URL", "OPENAI_API_KEY")}
+    with FakeLLMServer(llm) as fake:
+        os.environ["OPENAI_BASE_URL"] = fake.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "bench")
+        llm_client.reset_client()
+        # The fake server has no quotas; keep retries and the concurrency cap.
+        set_gateway(LLMGateway(replace(GatewaySettings.from_env(), rpm=0, tpm=0)))
+        # Measure warm turns; the SDK import a cold start defers is profiled by api.startup.
+        llm_client.get_client()
+        app = ThreadingHTTPServer(("127.0.0.1", 0), QuietHandler)
+        app.daemon_threads = True
+        threading.Thread(target=app.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{app.server_address[1]}/"
+        drivers = [SurveyDriver(url, n, mode, state_format, template) for n in range(surveys)]
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                completed = sum(pool.map(lambda d: d.run(total_questions), drivers))
+            # Count the background theme scoring each survey triggers, too.
+            get_theme_scorer().drain(timeout=60)
+        finally:
+            app.shutdown()
+            app.server_close()
+            llm_client.reset_client()
+            set_gateway(None)
+            for key, value in saved_env.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+        wall_s = time.perf_counter() - started
+
+    turn_ms = [t for d in drivers for t in d.turn_ms]
+    stages = {"turn_ms": summarize(turn_ms)}
+    server_stages: Dict[str, List[float]] = {}
+    for driver in drivers:
+        for name, values in driver.server_stages.items():
+            server_stages.setdefault(name, []).extend(values)
+    for name, values in sorted(server_stages.items()):
+        stages[f"server_{name}_ms"] = summarize(values)
+    for kind, latencies in sorted(fake.stats.latencies.items()):
+        stages[f"llm_{kind}_ms"] = summarize([s * 1000 for s in latencies])
+    return {
+        "config": {
+            "surveys": surveys,
+            "concurrency": concurrency,
+            "mode": mode,
+            "state_format": state_format,
+            "latency": llm.latency,
+            "classify_latency": llm.classify_latency,
+            "failure_rate": llm.failure_rate,
+            "answer_rate": llm.answer_rate,
+            "extra_answer_rate": llm.extra_answer_rate,
+        },
+        "completed_surveys": completed,
+        "turns": len(turn_ms),
+        "turns_per_survey": round(len(turn_ms) / completed, 2) if completed else None,
+        "llm_calls_per_survey": round(fake.stats.total_calls / completed, 2) if completed else None,
+        "llm_calls": dict(fake.stats.calls),
+        "tokens_per_survey": round(fake.stats.total_tokens / completed, 1) if completed else None,
+        "llm_tokens": dict(fake.stats.tokens),
+        "failed_turns": sum(d.errors for d in drivers),
+        "stages": stages,
+        "request_bytes": summarize([b for d in drivers for b in d.request_bytes]),
+        "response_bytes": summarize([b for d in drivers for b in d.response_bytes]),
+        "wall_s": round(wall_s, 3),
+    }
+
+
+# Metrics compared against the baseline; for all of them, higher is worse.
+TRACKED = [
+    ("stages", "turn_ms", "p50"),
+    ("stages", "turn_ms", "p95"),
+    ("stages", "turn_ms", "p99"),
+    ("llm_calls_per_survey",),
+    ("turns_per_survey",),
+    ("tokens_per_survey",),
+    ("request_bytes", "p95"),
+    ("response_bytes", "p95"),
+]
+
+
+def _lookup(report: Dict[str, Any], path) -> Optional[float]:
+    value: Any = report
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Describe every tracked metric that got worse than baseline by more than `tolerance`."""
+    regressions = []
+    for path in TRACKED:
+        current, before = _lookup(report, path), _lookup(baseline, path)
+        if current is None or not before:
+            continue
+        if current > before * (1 + tolerance):
+            regressions.append(f"{'.'.join(path)}: {before} -> {current} (+{(current / before - 1):.0%})")
+    return regressions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--surveys", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--mode", default="sequential")
+    parser.add_argument("--state-format", default="legacy", choices=["legacy", "compact", "session"])
+    parser.add_argument("--template", default="burnout")
+    parser.add_argument("--latency", default="lognormal:-3.0,0.4", help="reply call latency, seconds")
+    parser.add_argument("--classify-latency", default="lognormal:-3.6,0.3", help="classifier call latency, seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--answer-rate", type=float, default=0.9)
+    parser.add_argument(
+        "--extra-answer-rate", type=float, default=0.25,
+        help="chance a message also answers each further open question (extract mode)",
+    )
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--baseline", type=Path, default=None)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(
+        surveys=args.surveys,
+        concurrency=args.concurrency,
+        mode=args.mode,
+        state_format=args.state_format,
+        template=args.template,
+        llm=FakeLLMConfig(
+            latency=args.latency,
+            classify_latency=args.classify_latency,
+            failure_rate=args.failure_rate,
+            answer_rate=args.answer_rate,
+            extra_answer_rate=args.extra_answer_rate,
+            seed=args.seed,
+        ),
+    )
+    print(json.dumps(report, indent=2))
+
+    if args.baseline is None:
+        return 0
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get("config") != report["config"]:
+        print("Warning: baseline was recorded with a different configuration", file=sys.stderr)
+    regressions = compare(report, baseline, args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""
+Run the ASGI convo app locally with several worker processes.
+
+    pip install uvicorn
+    python serve.py --workers 4 --max-concurrency 256 --port 8000
+
+Each worker runs its own event loop and AsyncOpenAI connection pool; turns spend
+almost all their time waiting on the model, so one worker holds many of them.
+"""
+import argparse
+import os
+import sys
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--max-concurrency", type=int, default=256,
+        help="turns in flight per worker; excess requests wait for a slot",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        import uvicorn
+    except ImportError:
+        print("serve.py needs uvicorn: pip install uvicorn", file=sys.stderr)
+        return 1
+
+    # Read by api.asgi in every worker process.
+    os.environ["NOORISH_MAX_CONCURRENCY"] = str(args.max_concurrency)
+    uvicorn.run(
+        "api.asgi:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        # Hard backstop above the per-worker queue: beyond this uvicorn answers 503.
+        limit_concurrency=args.max_concurrency * 4,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
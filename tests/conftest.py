@@ -1,9 +1,51 @@
 import sys
 from pathlib import Path
 
+import pytest
+
 
 # Ensure the repository root is on sys.path so package imports work when tests
 # are run from different working directories.
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture(autouse=True)
+def _fresh_verdict_cache():
+    # Verdicts are cached process-wide; keep fake-client verdicts from leaking between tests.
+    from api.verdict_cache import set_local_classifier, set_verdict_cache
+
+    set_verdict_cache(None)
+    # The local classifier is opt-in; tests that want it install their own.
+    set_local_classifier(None)
+    yield
+    set_verdict_cache(None)
+    set_local_classifier(None)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_gateway():
+    # Quotas, stats and observed latencies are process-wide too; start each test fresh.
+    from api.llm_gateway import set_gateway
+    from api.model_router import set_router
+    from api.theme_scoring import ThemeScorer, set_theme_scorer
+
+    set_gateway(None)
+    set_router(None)
+    # Background theme scoring would reach for the real client; tests opt in with a fake.
+    set_theme_scorer(ThemeScorer(enabled=False))
+    yield
+    set_gateway(None)
+    set_router(None)
+    set_theme_scorer(None)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_replay_cache():
+    # Stored turn responses would replay across tests that reuse a key.
+    from api.replay_cache import set_replay_cache
+
+    set_replay_cache(None)
+    yield
+    set_replay_cache(None)
@@ -0,0 +1,110 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from api.asgi import ConvoApp
+from api.llm_client import set_async_client
+from tests.test_convo import make_states
+
+
+class FakeAsyncCompletions:
+    def __init__(self, verdict: str = "true", reply: str = "Tell me more."):
+        self.verdict = verdict
+        self.reply = reply
+        self.calls = []
+
+    async def create(self, model, messages, **kwargs):
+        self.calls.append(messages)
+        content = self.verdict if kwargs.get("max_tokens") == 1 else self.reply
+        if kwargs.get("stream"):
+            return self._stream(content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    @staticmethod
+    async def _stream(content):
+        for i in range(0, len(content), 4):
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content[i:i + 4]))])
+
+
+class FakeAsyncClient:
+    def __init__(self, verdict: str = "true", reply: str = "Tell me more."):
+        self.chat = SimpleNamespace(completions=FakeAsyncCompletions(verdict, reply))
+
+
+def call_app(method: str, body: bytes = b"", headers=()):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": method, "path": "/", "headers": list(headers)}
+    asyncio.run(ConvoApp()(scope, receive, send))
+    start = messages[0]
+    body_out = b"".join(m.get("body", b"") for m in messages[1:])
+    return start["status"], dict(start["headers"]), body_out
+
+
+def turn_body(**extra):
+    _, theme_state = make_states()
+    return json.dumps({"content": "hi", "theme_state": theme_state.to_dict(), **extra}).encode()
+
+
+def test_options_sends_cors_headers():
+    status, headers, _ = call_app("OPTIONS")
+    assert status == 200
+    assert headers[b"access-control-allow-origin"] == b"*"
+    assert headers[b"access-control-allow-methods"] == b"POST, OPTIONS"
+
+
+def test_post_runs_turn_on_async_client():
+    client = FakeAsyncClient(reply="Welcome aboard.")
+    set_async_client(client)
+    try:
+        status, headers, body = call_app("POST", turn_body())
+    finally:
+        set_async_client(None)
+    assert status == 200
+    assert b"reply;dur=" in headers[b"server-timing"]
+    payload = json.loads(body)
+    assert payload["content"] == "Welcome aboard."
+    assert payload["theme_state"]["current_theme_index"] == 1
+    assert len(client.chat.completions.calls) == 1
+
+
+def test_post_streams_sse():
+    set_async_client(FakeAsyncClient(reply="Welcome aboard."))
+    try:
+        status, headers, body = call_app("POST", turn_body(stream=True))
+    finally:
+        set_async_client(None)
+    assert status == 200
+    assert headers[b"content-type"] == b"text/event-stream"
+    frames = [f for f in body.decode().split("\n\n") if f]
+    assert frames[-1].startswith("event: done")
+    done = json.loads(frames[-1].split("data: ", 1)[1])
+    assert done["content"] == "Welcome aboard."
+    assert done["usage"]["budget"] == "normal"
+
+
+def test_bad_request_is_400():
+    status, headers, body = call_app("POST", b"not json")
+    assert status == 400
+    assert headers[b"access-control-allow-origin"] == b"*"
+    assert "error" in json.loads(body)
+
+
+def test_lifespan_handshake():
+    queue = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+    sent = []
+
+    async def receive():
+        return queue.pop(0)
+
+    async def send(message):
+        sent.append(message["type"])
+
+    asyncio.run(ConvoApp()({"type": "lifespan"}, receive, send))
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
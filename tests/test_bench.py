@@ -0,0 +1,26 @@
+from api.theme_scoring import ThemeScorer, set_theme_scorer
+from bench.fake_llm_server import FakeLLMConfig, LatencyModel
+from bench.run_bench import compare, percentile, run_benchmark
+
+
+def test_latency_specs_and_percentiles():
+    assert LatencyModel("fixed:0.25").sample() == 0.25
+    assert 0.1 <= LatencyModel("uniform:0.1,0.2").sample() <= 0.2
+    values = list(range(1, 101))
+    assert (percentile(values, 50), percentile(values, 99)) == (50, 99)
+
+
+def test_benchmark_completes_surveys_against_fake_server():
+    set_theme_scorer(ThemeScorer())
+    report = run_benchmark(surveys=2, concurrency=2, state_format="compact", llm=FakeLLMConfig(seed=1))
+    assert report["completed_surveys"] == 2
+    # 11 turn calls plus one background score per burnout dimension
+    assert report["llm_calls_per_survey"] == 14
+    assert report["llm_calls"]["theme_score"] == 6
+    assert report["stages"]["turn_ms"]["p50"] > 0
+
+
+def test_compare_flags_only_regressions_beyond_tolerance():
+    baseline = {"stages": {"turn_ms": {"p50": 100, "p95": 200}}, "llm_calls_per_survey": 10}
+    report = {"stages": {"turn_ms": {"p50": 115, "p95": 300}}, "llm_calls_per_survey": 9}
+    assert compare(report, baseline, tolerance=0.2) == ["stages.turn_ms.p95: 200 -> 300 (+50%)"]
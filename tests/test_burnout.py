@@ -0,0 +1,126 @@
+import json
+
+import pytest
+
+from api.burnout import InvalidAssessment, assess_burnout, get_burnout, parse_burnout, transcript
+from api.burnout_batch import CheckpointMismatch, main, run_batch, score_line
+from api.conversation_state import ConversationState
+from api.llm_client import reset_client, set_client
+from tests.test_convo import FakeClient, make_states
+
+GOOD = json.dumps({"score_percent": 62, "evaluation_markdown": "You're in the Overextended zone"})
+
+
+def finished_theme_state():
+    _, theme_state = make_states()
+    theme_state.advance_theme()
+    state = ConversationState(questions=theme_state.current_questions, current_index=2)
+    state.answers = {0: "Yesterday.", 1: "My patience."}
+    theme_state.set_conversation_state(1, state)
+    return state, theme_state
+
+
+def test_parse_burnout_validates_shape():
+    assert parse_burnout(GOOD).score_percent == 62
+    for bad in ("nope", "[]", '{"score_percent": 101, "evaluation_markdown": "x"}',
+                '{"score_percent": true, "evaluation_markdown": "x"}', '{"score_percent": 5}'):
+        with pytest.raises(InvalidAssessment):
+            parse_burnout(bad)
+
+
+def test_transcript_pairs_questions_with_answers():
+    _, theme_state = finished_theme_state()
+    assert transcript(theme_state) == (
+        "## Exhaustion\nQ: When were you wiped out?\nA: Yesterday.\nQ: What drains fastest?\nA: My patience."
+    )
+
+
+def test_get_burnout_returns_validated_json():
+    state, theme_state = finished_theme_state()
+    client = FakeClient(reply=GOOD)
+    assert json.loads(get_burnout(state, theme_state, client)) == json.loads(GOOD)
+    request = client.chat.completions.calls[0]
+    assert request[0]["content"].startswith("Core Identity")
+
+
+def test_assess_burnout_asks_again_then_gives_up():
+    _, theme_state = finished_theme_state()
+    client = FakeClient(reply="not json")
+    with pytest.raises(InvalidAssessment):
+        assess_burnout(theme_state, client)
+    assert len(client.chat.completions.calls) == 2
+
+
+def write_input(path, count):
+    _, theme_state = finished_theme_state()
+    with open(path, "w") as f:
+        for n in range(count):
+            f.write(json.dumps({"id": f"r{n}", "theme_state": theme_state.to_dict()}) + "\n")
+            if n == 3:
+                f.write("\n")
+        f.write("not json\n")
+
+
+def test_batch_scores_every_line(tmp_path):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_input(source, 10)
+    stats = run_batch(source, output, concurrency=4, client=FakeClient(reply=GOOD))
+    rows = [json.loads(l) for l in output.read_text().splitlines()]
+    assert (stats.ok, stats.failed) == (10, 1)
+    assert sorted(r["id"] for r in rows if r["ok"]) == sorted(f"r{n}" for n in range(10))
+    assert [r for r in rows if not r["ok"]][0]["error"].startswith("JSONDecodeError")
+
+
+def test_batch_resumes_after_crash_without_duplicates(tmp_path):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_input(source, 30)
+    client = FakeClient(reply=GOOD)
+
+    def crashing(raw, line, client):
+        if line == 20:
+            raise KeyboardInterrupt
+        return score_line(raw, line, client)
+
+    with pytest.raises(KeyboardInterrupt):
+        run_batch(source, output, concurrency=3, client=client, score=crashing, checkpoint_every=2)
+    with open(output, "ab") as f:
+        f.write(b'{"id": "torn')
+    first_pass = len(output.read_text().splitlines()) - 1
+
+    stats = run_batch(source, output, concurrency=3, client=client)
+    lines = [json.loads(l)["line"] for l in output.read_text().splitlines()]
+    assert len(lines) == len(set(lines)) == 31
+    assert stats.ok + stats.failed + first_pass == 31
+
+
+def test_batch_refuses_output_from_another_input(tmp_path):
+    first, second, output = tmp_path / "a.jsonl", tmp_path / "b.jsonl", tmp_path / "out.jsonl"
+    write_input(first, 5)
+    write_input(second, 8)
+    client = FakeClient(reply=GOOD)
+    run_batch(first, output, concurrency=2, client=client)
+    before = output.read_bytes()
+
+    with pytest.raises(CheckpointMismatch):
+        run_batch(second, output, concurrency=2, client=client)
+    assert output.read_bytes() == before
+    # An output with no checkpoint can't be tied to any input either.
+    output.with_name(output.name + ".checkpoint").unlink()
+    with pytest.raises(CheckpointMismatch):
+        run_batch(first, output, concurrency=2, client=client)
+    assert main([str(second), str(output)]) == 2
+
+
+def test_batch_restart_rescores_every_line(tmp_path):
+    first, second, output = tmp_path / "a.jsonl", tmp_path / "b.jsonl", tmp_path / "out.jsonl"
+    write_input(first, 5)
+    write_input(second, 8)
+    run_batch(first, output, concurrency=2, client=FakeClient(reply=GOOD))
+    set_client(FakeClient(reply=GOOD))
+    try:
+        assert main([str(second), str(output), "--restart"]) == 0
+    finally:
+        reset_client()
+    rows = [json.loads(l) for l in output.read_text().splitlines()]
+    assert sorted(r["id"] for r in rows if r["ok"]) == sorted(f"r{n}" for n in range(8))
+    assert len(rows) == len({r["line"] for r in rows}) == 9
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from api.compact_session import CompactSession, intern_survey
+from api.session_store import MemorySessionStore
+from api.state_codec import encode_compact
+from api.survey_templates import BURNOUT_V1
+from bench.memory_bench import run_memory_benchmark, synthetic_session
+
+
+def test_round_trips_the_legacy_dict_exactly():
+    for answered in range(0, 6):
+        theme_state = synthetic_session(BURNOUT_V1, answered, respondent=3)
+        theme_state.summaries = {"1:0": "Tired after a late release."}
+        theme_state.theme_scores = {"1": {"dimension": "exhaustion", "score": 3.5, "driver": "", "summary": "x"}}
+        data = json.loads(json.dumps(theme_state.to_dict()))
+        assert json.loads(json.dumps(CompactSession.from_dict(data).to_dict())) == data
+
+
+def test_answers_keep_arbitrary_text():
+    theme_state = synthetic_session(BURNOUT_V1, 2, respondent=0)
+    theme_state.conversations[1].answers = {0: "", 1: "émoji 🙂 and\nnewlines."}
+    restored = CompactSession.from_theme_state(theme_state).to_theme_state()
+    assert restored.conversations[1].answers == {0: "", 1: "émoji 🙂 and\nnewlines."}
+
+
+def test_sessions_share_one_immutable_survey():
+    first = CompactSession.from_theme_state(synthetic_session(BURNOUT_V1, 1, 1))
+    second = CompactSession.from_theme_state(synthetic_session(BURNOUT_V1, 4, 2))
+    assert first.survey is second.survey is intern_survey(BURNOUT_V1.themes, BURNOUT_V1.theme_questions)
+    with pytest.raises(AttributeError):
+        first.survey.themes = ()
+    assert not hasattr(first, "__dict__") and not hasattr(first.survey, "__dict__")
+
+
+def test_state_off_its_survey_is_rejected():
+    theme_state = synthetic_session(BURNOUT_V1, 1, 0)
+    theme_state.conversations[1].questions = ["Something else?"]
+    with pytest.raises(ValueError):
+        CompactSession.from_theme_state(theme_state)
+
+
+def test_memory_store_returns_the_payload_it_was_given():
+    store = MemorySessionStore()
+    payload = encode_compact(synthetic_session(BURNOUT_V1, 3, 0))
+    session_id, _ = store.create(payload)
+    assert isinstance(store._sessions[session_id][1], CompactSession)
+    assert store.load(session_id)[0] == payload
+
+
+def test_memory_bench_reports_bytes_per_session():
+    report = run_memory_benchmark(sessions=50)
+    sizes = report["bytes_per_session"]
+    assert sizes["slotted"] < sizes["payload"] < sizes["dataclass"]
@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+from api.conversation_state import ConversationState
+from api.convo import handle_turn
+from api.theme_state import ThemeState
+
+
+class FakeCompletions:
+    """Answers the does_answer check with `verdict` and everything else with `reply`."""
+
+    def __init__(self, verdict: str = "true", reply: str = "Tell me more."):
+        self.verdict = verdict
+        self.reply = reply
+        self.calls = []
+
+    def create(self, model, messages, **kwargs):
+        self.calls.append(messages)
+        content = self.verdict if kwargs.get("max_tokens") == 1 else self.reply
+        if kwargs.get("stream"):
+            return iter(
+                SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content[i:i + 4]))])
+                for i in range(0, len(content), 4)
+            )
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+        )
+
+
+class FakeClient:
+    def __init__(self, verdict: str = "true", reply: str = "Tell me more."):
+        self.chat = SimpleNamespace(completions=FakeCompletions(verdict, reply))
+
+
+def make_states():
+    theme_state = ThemeState(
+        themes=["chitchat", "Exhaustion"],
+        theme_questions=[["Hi there?"], ["When were you wiped out?", "What drains fastest?"]],
+    )
+    state = ConversationState(questions=theme_state.current_questions)
+    theme_state.set_conversation_state(0, state)
+    return state, theme_state
+
+
+def test_chitchat_answer_advances_theme_without_classifier():
+    state, theme_state = make_states()
+    client = FakeClient(verdict="false")
+    reply, state, theme_state = handle_turn(state, theme_state, "hello", client=client)
+    assert reply == "Tell me more."
+    assert theme_state.current_theme == "Exhaustion"
+    assert state.current_index == 0
+    assert len(client.chat.completions.calls) == 1
+
+
+def test_non_answer_keeps_current_question():
+    state, theme_state = make_states()
+    client = FakeClient()
+    _, state, theme_state = handle_turn(state, theme_state, "hello", client=client)
+    client.chat.completions.verdict = "false"
+    _, state, theme_state = handle_turn(state, theme_state, "I like turtles", client=client)
+    assert state.current_index == 0
+    assert state.did_answer is False
@@ -0,0 +1,89 @@
+from api.fast_turn import fast_turn
+from api.paraphrase_bank import ParaphraseBank, check_bank, load_bank
+from api.survey_templates import BURNOUT_V1
+from tests.test_convo import FakeClient, make_states
+
+
+def _burnout_states():
+    theme_state = BURNOUT_V1.new_theme_state()
+    return theme_state.get_conversation_state(0), theme_state
+
+
+def test_shipped_bank_matches_template_and_passes_vetting():
+    bank = load_bank(BURNOUT_V1.key)
+    assert bank is not None
+    assert check_bank(BURNOUT_V1, bank) == []
+
+
+def test_bank_for_other_content_is_rejected():
+    bank = ParaphraseBank(BURNOUT_V1.key, "stale", {"1:0": ["When did you last feel totally drained?"]})
+    assert any("different survey content" in problem for problem in check_bank(BURNOUT_V1, bank))
+
+
+def test_first_question_comes_from_the_bank_without_any_call():
+    client = FakeClient()
+    state, theme_state = _burnout_states()
+    reply, state, theme_state, metrics = fast_turn(state, theme_state, "hello", client=client)
+    assert metrics == {"llm_calls": 0, "templated": True}
+    assert client.chat.completions.calls == []
+    assert theme_state.current_theme_index == 1
+    assert reply.endswith("?")
+
+
+def test_same_message_gets_the_same_wording():
+    replies = set()
+    for _ in range(3):
+        state, theme_state = _burnout_states()
+        replies.add(fast_turn(state, theme_state, "hello", client=FakeClient())[0])
+    assert len(replies) == 1
+
+
+def test_question_within_a_theme_still_uses_the_model():
+    client = FakeClient(reply="What drains you fastest?")
+    state, theme_state = _burnout_states()
+    _, state, theme_state, _ = fast_turn(state, theme_state, "hello", client=client)
+    reply, state, _, metrics = fast_turn(state, theme_state, "Last Tuesday.", client=client)
+    assert reply == "What drains you fastest?"
+    assert metrics == {"llm_calls": 2, "templated": False}
+
+
+def test_theme_advance_only_calls_the_classifier():
+    client = FakeClient()
+    state, theme_state = _burnout_states()
+    _, state, theme_state, _ = fast_turn(state, theme_state, "hello", client=client)
+    _, state, theme_state, _ = fast_turn(state, theme_state, "Last Tuesday.", client=client)
+    reply, state, theme_state, metrics = fast_turn(state, theme_state, "My patience.", client=client)
+    assert theme_state.current_theme_index == 2
+    assert metrics == {"llm_calls": 1, "templated": True}
+    assert reply != "Tell me more."
+
+
+def test_verdicts_without_the_model_are_not_counted_as_calls():
+    client = FakeClient(reply="When were you last wiped out?")
+    state, theme_state = _burnout_states()
+    _, state, theme_state, _ = fast_turn(state, theme_state, "hello", client=client)
+    calls = len(client.chat.completions.calls)
+    # A bare greeting is rejected by the pre-classifier; only the reply reaches the model.
+    _, state, _, metrics = fast_turn(state, theme_state, "hi", client=client)
+    assert state.current_index == 0
+    assert metrics == {"llm_calls": 1, "templated": False}
+    assert len(client.chat.completions.calls) == calls + 1
+
+
+def test_surveys_without_a_bank_fall_back_to_the_model():
+    client = FakeClient()
+    state, theme_state = make_states()
+    reply, _, _, metrics = fast_turn(state, theme_state, "hello", client=client)
+    assert reply == "Tell me more."
+    assert metrics["templated"] is False
+
+
+def test_completion_is_templated():
+    client = FakeClient()
+    state, theme_state = _burnout_states()
+    for message in ["hello", "a", "b", "c", "d"]:
+        _, state, theme_state, _ = fast_turn(state, theme_state, message, client=client)
+    reply, state, _, metrics = fast_turn(state, theme_state, "e", client=client)
+    assert state.complete
+    assert metrics == {"llm_calls": 1, "templated": True}
+    assert "next steps" in reply
@@ -0,0 +1,26 @@
+from api import llm_client
+from api.llm_client import ClientSettings, get_client, reset_client, set_client
+
+
+def test_settings_read_from_env(monkeypatch):
+    monkeypatch.setenv("NOORISH_LLM_MAX_CONNECTIONS", "7")
+    monkeypatch.setenv("NOORISH_LLM_HTTP2", "false")
+    monkeypatch.setenv("NOORISH_LLM_READ_TIMEOUT", "not-a-number")
+    settings = ClientSettings.from_env()
+    assert settings.max_connections == 7
+    assert settings.http2 is False
+    assert settings.read_timeout == ClientSettings().read_timeout
+
+
+def test_shared_client_is_built_once(monkeypatch):
+    built = []
+    monkeypatch.setattr(llm_client, "build_client", lambda: built.append(object()) or built[-1])
+    reset_client()
+    try:
+        assert get_client() is get_client()
+        assert len(built) == 1
+        fake = object()
+        set_client(fake)
+        assert get_client() is fake
+    finally:
+        reset_client()
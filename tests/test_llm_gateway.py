@@ -0,0 +1,141 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from api.llm_gateway import (
+    BATCH, INTERACTIVE, DeadlineExceeded, GatewaySettings, LLMGateway, PriorityGate, TokenBucket,
+    retry_after,
+)
+from tests.test_asgi import FakeAsyncClient
+from tests.test_convo import FakeClient
+
+
+class APIStatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+class FlakyClient(FakeClient):
+    """Raises the queued errors first, then answers normally."""
+
+    def __init__(self, errors):
+        super().__init__(reply="ok")
+        self.errors = list(errors)
+        create = self.chat.completions.create
+
+        def flaky_create(**kwargs):
+            if self.errors:
+                raise self.errors.pop(0)
+            return create(**kwargs)
+
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=flaky_create))
+
+
+def fast_gateway(**overrides):
+    settings = dict(rpm=0, tpm=0, backoff_base=0.001, backoff_max=0.002)
+    settings.update(overrides)
+    return LLMGateway(GatewaySettings(**settings))
+
+
+def call(gateway, client, **kwargs):
+    return gateway.create(client, model="m", messages=[{"role": "user", "content": "hi"}], **kwargs)
+
+
+def test_token_bucket_refills_and_keeps_reserve():
+    now = [0.0]
+    bucket = TokenBucket(60, clock=lambda: now[0])
+    assert bucket.take(50) == 0
+    assert bucket.take(5, floor=10) == pytest.approx(5.0)
+    now[0] += 5
+    assert bucket.take(5, floor=10) == 0
+
+
+def test_retries_transient_errors_then_succeeds():
+    gateway = fast_gateway()
+    client = FlakyClient([APIStatusError(429), APIStatusError(503)])
+    assert call(gateway, client).choices[0].message.content == "ok"
+    assert gateway.stats.retries == 2
+    assert gateway.stats.by_status == {429: 1, 503: 1}
+
+
+def test_client_errors_are_not_retried():
+    gateway = fast_gateway()
+    with pytest.raises(APIStatusError):
+        call(gateway, FlakyClient([APIStatusError(400)]))
+    assert gateway.stats.retries == 0
+    assert gateway.stats.failures == 1
+
+
+def test_retry_after_is_honoured():
+    assert retry_after(APIStatusError(429, {"retry-after-ms": "250"})) == 0.25
+    gateway = fast_gateway()
+    client = FlakyClient([APIStatusError(429, {"retry-after": "0.05"})])
+    started = time.perf_counter()
+    call(gateway, client)
+    assert time.perf_counter() - started >= 0.05
+
+
+def test_retry_that_would_miss_the_deadline_fails_fast():
+    gateway = fast_gateway()
+    client = FlakyClient([APIStatusError(429, {"retry-after": "30"})])
+    with pytest.raises(APIStatusError):
+        call(gateway, client, deadline=1.0)
+
+
+def test_exhausted_quota_raises_deadline_exceeded():
+    gateway = fast_gateway(rpm=1)
+    call(gateway, FakeClient())
+    with pytest.raises(DeadlineExceeded):
+        call(gateway, FakeClient(), deadline=0.5)
+    assert gateway.stats.deadline_exceeded == 1
+
+
+def test_batch_cannot_use_interactive_reserve():
+    gateway = fast_gateway(rpm=10, batch_reserve=0.5)
+    for _ in range(5):
+        call(gateway, FakeClient(), priority=BATCH)
+    with pytest.raises(DeadlineExceeded):
+        call(gateway, FakeClient(), priority=BATCH, deadline=0.1)
+    call(gateway, FakeClient(), priority=INTERACTIVE)
+
+
+def test_priority_gate_serves_interactive_first():
+    gate = PriorityGate(1)
+    assert gate.acquire(INTERACTIVE, 1)
+    order = []
+
+    def waiter(priority, name):
+        assert gate.acquire(priority, 5)
+        order.append(name)
+        gate.release()
+
+    batch = threading.Thread(target=waiter, args=(BATCH, "batch"))
+    batch.start()
+    time.sleep(0.05)
+    interactive = threading.Thread(target=waiter, args=(INTERACTIVE, "interactive"))
+    interactive.start()
+    time.sleep(0.05)
+    gate.release()
+    batch.join()
+    interactive.join()
+    assert order == ["interactive", "batch"]
+
+
+def test_async_create_goes_through_gate():
+    gateway = fast_gateway(max_concurrency=2)
+    client = FakeAsyncClient(reply="ok")
+
+    async def run():
+        return await asyncio.gather(*(
+            gateway.create_async(client, model="m", messages=[{"role": "user", "content": "hi"}])
+            for _ in range(5)
+        ))
+
+    responses = asyncio.run(run())
+    assert [r.choices[0].message.content for r in responses] == ["ok"] * 5
+    assert gateway.stats.calls == 5
@@ -0,0 +1,104 @@
+from pathlib import Path
+
+import numpy as np
+
+from api.local_classifier import LocalClassifier
+from api.survey_templates import BURNOUT_V1
+from api.verdict_cache import classify_answer, set_local_classifier
+from bench.eval_classifier import evaluate, read_examples
+from tests.test_convo import FakeClient
+
+SAMPLE = Path(__file__).resolve().parents[1] / "bench" / "data" / "verdicts_sample.jsonl"
+# Kept out of fitting and of the sample the default weights were tuned on.
+HELDOUT = SAMPLE.with_name("verdicts_heldout.jsonl")
+QUESTION = BURNOUT_V1.theme_questions[1][0]
+
+
+def test_obvious_answers_and_deflections_are_confident():
+    classifier = LocalClassifier()
+    assert classifier.verdict(QUESTION, "Last Thursday I closed a release at 2am and felt drained.") is True
+    assert classifier.verdict(QUESTION, "what do you mean?") is False
+    assert classifier.verdict(QUESTION, "idk") is False
+
+
+def test_long_off_topic_messages_are_never_accepted_locally():
+    classifier = LocalClassifier()
+    questions = [q for theme in BURNOUT_V1.theme_questions for q in theme]
+    for message in (
+        "I went to the store and bought some apples and bananas for my family",
+        "The weather is nice today and my cat is cute",
+    ):
+        assert not classifier.on_topic(questions, [message] * len(questions)).any()
+        assert all(classifier.verdict(q, message) is not True for q in questions)
+
+
+def test_refusals_echoes_and_questions_back_are_never_accepted_locally():
+    classifier = LocalClassifier()
+    questions = [q for theme in BURNOUT_V1.theme_questions[1:] for q in theme]
+    for message in (
+        "I dont want to talk about work",
+        "Why are you asking me about my work skills",
+        "work",
+        "my work",
+        "better or worse, who knows",
+        "are you asking about my skills or my feelings?",
+    ):
+        assert all(classifier.verdict(q, message) is not True for q in questions), message
+    assert classifier.verdict(BURNOUT_V1.theme_questions[2][0], "I dont want to talk about work") is False
+
+
+def test_batch_scoring_matches_single_pairs():
+    classifier = LocalClassifier()
+    messages = ["Yesterday after a long shift.", "ok", "My cat is called Biscuit."]
+    batch = classifier.probabilities([QUESTION] * 3, messages)
+    assert np.allclose(batch, [classifier.probability(QUESTION, m) for m in messages])
+    # Questions outside the registered surveys are vectorised on first use.
+    assert 0 <= classifier.probability("What is your favourite colour?", "Blue") <= 1
+
+
+def test_band_decides_when_to_escalate():
+    classifier = LocalClassifier(band=(0.3, 0.7))
+    assert classifier.decide(0.75) is True
+    assert classifier.decide(0.3) is False
+    assert classifier.decide(0.5) is None
+    assert LocalClassifier(band=(0.0, 1.01)).verdict(QUESTION, "Yesterday.") is None
+
+
+def test_classify_answer_only_asks_the_model_inside_the_band():
+    client = FakeClient(verdict="true")
+    set_local_classifier(LocalClassifier(band=(0.2, 0.8)))
+    assert classify_answer(client, QUESTION, "what do you mean?") is False
+    assert classify_answer(client, QUESTION, "Last Thursday I closed a release at 2am and felt drained.") is True
+    assert client.chat.completions.calls == []
+
+    set_local_classifier(LocalClassifier(band=(0.0, 1.01)))
+    assert classify_answer(client, QUESTION, "Monday was rough") is True
+    assert len(client.chat.completions.calls) == 1
+
+
+def test_fit_improves_fit_and_round_trips(tmp_path):
+    examples = read_examples(SAMPLE)
+    before = evaluate(LocalClassifier(), examples, (0.2, 0.8))["log_loss"]
+    fitted = LocalClassifier().fit(
+        [e["question"] for e in examples], [e["message"] for e in examples], [e["label"] for e in examples]
+    )
+    assert evaluate(fitted, examples, (0.2, 0.8))["log_loss"] < before
+    fitted.save(tmp_path / "weights.json")
+    loaded = LocalClassifier.from_file(tmp_path / "weights.json")
+    assert np.allclose(loaded.weights, fitted.weights, atol=1e-5)
+
+
+def test_evaluation_reports_agreement_and_escalation():
+    report = evaluate(LocalClassifier(), read_examples(SAMPLE), (0.2, 0.8))
+    assert report["examples"] == 52
+    assert 0 <= report["escalation_rate"] <= 1
+    assert report["local_agreement"] >= 0.9
+    assert [b["band"] for b in report["sweep"]][0] == [0.5, 0.5]
+    assert report["sweep"][0]["escalation_rate"] == 0.0
+
+
+def test_heldout_set_has_no_false_local_verdicts():
+    report = evaluate(LocalClassifier(), read_examples(HELDOUT), (0.2, 0.8))
+    assert report["false_answered"] == 0
+    assert report["false_unanswered"] == 0
+    assert report["escalation_rate"] < 1
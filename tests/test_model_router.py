@@ -0,0 +1,120 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from api.model_router import LatencyTracker, ModelRouter, RoutePolicy, policy_from_env
+from api.timing import timed_request
+
+
+def response(text):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+class ScriptedClient:
+    """Each call pops (delay, outcome) from the script; outcome is text or an exception."""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.models = []
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def _next(self, model):
+        with self._lock:
+            self.models.append(model)
+            return self.script.pop(0)
+
+    def create(self, model, messages, **kwargs):
+        delay, outcome = self._next(model)
+        time.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return response(outcome)
+
+
+class ScriptedAsyncClient(ScriptedClient):
+    def __init__(self, script):
+        super().__init__(script)
+        self.cancelled = 0
+
+    async def create(self, model, messages, **kwargs):
+        delay, outcome = self._next(model)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if isinstance(outcome, Exception):
+            raise outcome
+        return response(outcome)
+
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+def router(**policy):
+    return ModelRouter({"reply": RoutePolicy(**policy)})
+
+
+def test_slow_primary_is_hedged_and_hedge_wins():
+    r = router(models=("a",), budget=5, hedge_after=0.05)
+    client = ScriptedClient([(0.5, "slow"), (0.0, "hedged")])
+    started = time.monotonic()
+    assert r.create(client, "reply", messages=MESSAGES).choices[0].message.content == "hedged"
+    assert time.monotonic() - started < 0.4
+    assert r.stats["reply"].hedges == r.stats["reply"].hedge_wins == 1
+    assert r.stats["reply"].abandoned == 1
+
+
+def test_budget_overrun_falls_back_to_next_model():
+    r = router(models=("a", "b"), budget=0.05)
+    client = ScriptedClient([(0.5, "late"), (0.0, "fallback")])
+    assert r.create(client, "reply", messages=MESSAGES).choices[0].message.content == "fallback"
+    assert client.models == ["a", "b"]
+    assert r.stats["reply"].fallbacks == 1
+
+
+def test_answering_model_is_annotated():
+    r = ModelRouter({"reply_lite": RoutePolicy(models=("a", "b"), budget=5), "classify": RoutePolicy(models=("c",), budget=5)})
+    client = ScriptedClient([(0.0, ValueError("a down")), (0.0, "b ok"), (0.0, "true")])
+    with timed_request() as timer:
+        r.create(client, "reply_lite", messages=MESSAGES)
+        r.create(client, "classify", messages=MESSAGES)
+    assert timer.fields["reply_lite_model"] == "b"
+    assert timer.fields["classify_model"] == "c"
+
+
+def test_failure_falls_back_immediately_and_last_error_surfaces():
+    r = router(models=("a", "b"), budget=5)
+    client = ScriptedClient([(0.0, ValueError("a down")), (0.0, "b ok")])
+    assert r.create(client, "reply", messages=MESSAGES).choices[0].message.content == "b ok"
+    client = ScriptedClient([(0.0, ValueError("a down")), (0.0, ValueError("b down"))])
+    with pytest.raises(ValueError, match="b down"):
+        r.create(client, "reply", messages=MESSAGES)
+
+
+def test_hedge_delay_follows_observed_latency():
+    tracker = LatencyTracker(min_samples=3)
+    r = ModelRouter({"reply": RoutePolicy(models=("a",), budget=5, hedge_after=1.0)}, tracker)
+    assert r.hedge_delay("reply", "a") == 1.0
+    for seconds in (0.1, 0.2, 0.3):
+        tracker.record("reply", "a", seconds)
+    assert r.hedge_delay("reply", "a") == 0.3
+
+
+def test_async_loser_is_cancelled():
+    r = router(models=("a",), budget=5, hedge_after=0.05)
+    client = ScriptedAsyncClient([(1.0, "slow"), (0.0, "hedged")])
+    result = asyncio.run(r.create_async(client, "reply", messages=MESSAGES))
+    assert result.choices[0].message.content == "hedged"
+    assert client.cancelled == 1
+
+
+def test_policy_from_env(monkeypatch):
+    monkeypatch.setenv("NOORISH_ROUTE_REPLY_MODELS", "x, y")
+    monkeypatch.setenv("NOORISH_ROUTE_REPLY_HEDGE", "off")
+    policy = policy_from_env("reply", RoutePolicy(models=("a",), budget=1, hedge_after=0.5))
+    assert policy.models == ("x", "y") and policy.hedge_after is None
@@ -0,0 +1,117 @@
+from types import SimpleNamespace
+
+from api.convo import run_turn
+from api.multi_answer import extract_turn, open_questions, parse_extraction
+from api.survey_templates import BURNOUT_V1
+from tests.test_convo import FakeClient, FakeCompletions
+
+
+class ExtractingCompletions(FakeCompletions):
+    """Answers extraction calls with `extracted`, the rest like FakeCompletions."""
+
+    def __init__(self, extracted: str, verdict: str = "true"):
+        super().__init__(verdict=verdict)
+        self.extracted = extracted
+
+    def create(self, model, messages, **kwargs):
+        if kwargs.get("response_format"):
+            self.calls.append(messages)
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.extracted))])
+        return super().create(model, messages, **kwargs)
+
+
+def extracting_client(extracted: str, verdict: str = "true") -> FakeClient:
+    client = FakeClient()
+    client.chat.completions = ExtractingCompletions(extracted, verdict)
+    return client
+
+
+def _past_greeting(client):
+    theme_state = BURNOUT_V1.new_theme_state()
+    state = theme_state.get_conversation_state(0)
+    _, state, theme_state, _ = extract_turn(state, theme_state, "hi", client=client)
+    return state, theme_state
+
+
+def test_parse_keeps_only_valid_question_numbers():
+    assert parse_extraction('{"answers": [1, 3, 9, true, "2"]}', 4) == {0, 2}
+    assert parse_extraction('{"answers": []}', 4) == set()
+    assert parse_extraction("not json", 4) is None
+    assert parse_extraction('{"answers": 1}', 4) is None
+
+
+def test_open_questions_start_with_pending_and_skip_greeting():
+    state, theme_state = _past_greeting(FakeClient())
+    questions = open_questions(state, theme_state)
+    assert questions[0] == (1, 0, BURNOUT_V1.theme_questions[1][0])
+    assert [(t, q) for t, q, _ in questions] == [(1, 0), (1, 1), (2, 0), (3, 0), (3, 1)]
+
+
+def test_answer_to_a_later_question_is_recorded_and_skipped():
+    client = extracting_client('{"answers": [1, 2]}')
+    state, theme_state = _past_greeting(client)
+    calls_before = len(client.chat.completions.calls)
+    _, state, theme_state, metrics = extract_turn(state, theme_state, "Tuesday, and my patience goes first", client=client)
+    assert metrics == {"llm_calls": 2, "extracted": 1}
+    assert len(client.chat.completions.calls) == calls_before + 2
+    # Both exhaustion questions are answered, so the turn moved straight on.
+    assert theme_state.current_theme_index == 2
+    assert theme_state.get_conversation_state(1).answers.keys() == {0, 1}
+
+
+def test_answers_in_later_themes_are_kept_for_when_they_come_up():
+    client = extracting_client('{"answers": [1, 4]}')
+    state, theme_state = _past_greeting(client)
+    _, state, theme_state, _ = extract_turn(state, theme_state, "Tuesday; I'm still confident at work", client=client)
+    assert state.current_index == 1 and theme_state.current_theme_index == 1
+    assert theme_state.get_conversation_state(3).answers == {0: "Tuesday; I'm still confident at work."}
+
+    client.chat.completions.extracted = '{"answers": [1]}'
+    _, state, theme_state, _ = extract_turn(state, theme_state, "My patience", client=client)
+    _, state, theme_state, _ = extract_turn(state, theme_state, "The status reports", client=client)
+    # Theme 3 opens on its second question; its first was answered two turns ago.
+    assert theme_state.current_theme_index == 3 and state.current_index == 1
+
+
+def test_unanswered_pending_question_does_not_advance():
+    client = extracting_client('{"answers": []}')
+    state, theme_state = _past_greeting(client)
+    _, state, theme_state, metrics = extract_turn(state, theme_state, "hmm", client=client)
+    assert state.current_index == 0 and not state.did_answer
+    assert metrics["extracted"] == 0
+
+
+def test_invalid_output_falls_back_to_the_classifier():
+    client = extracting_client("nonsense", verdict="true")
+    state, theme_state = _past_greeting(client)
+    _, state, _, metrics = extract_turn(state, theme_state, "Last Tuesday.", client=client)
+    assert metrics["llm_calls"] == 3
+    assert state.current_index == 1
+
+
+def test_extract_is_a_turn_mode():
+    client = extracting_client('{"answers": [1]}')
+    state, theme_state = _past_greeting(client)
+    _, _, _, metrics = run_turn("extract", state, theme_state, "Last Tuesday.", client=client)
+    assert metrics == {"extract": {"llm_calls": 2, "extracted": 0}}
+
+
+def test_answers_extracted_earlier_are_skipped_in_every_mode():
+    client = extracting_client('{"answers": [2]}')
+    state, theme_state = _past_greeting(client)
+    _, state, theme_state, _ = extract_turn(state, theme_state, "My patience, not sure when", client=client)
+    assert state.current_index == 0 and state.answers.keys() == {1}
+
+    # A plain sequential turn answers the first question and moves past the second.
+    _, state, theme_state, _ = run_turn("sequential", state, theme_state, "Last Tuesday.", client=client)
+    assert theme_state.current_theme_index == 2 and state.current_index == 0
+
+
+def test_greeting_needs_no_extraction_call():
+    client = extracting_client('{"answers": [1]}')
+    state, theme_state = _past_greeting(client)
+    calls_before = len(client.chat.completions.calls)
+    _, state, _, metrics = extract_turn(state, theme_state, "hi", client=client)
+    assert metrics == {"llm_calls": 1, "extracted": 0}
+    assert len(client.chat.completions.calls) == calls_before + 1
+    assert state.current_index == 0 and not state.did_answer
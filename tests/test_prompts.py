@@ -0,0 +1,46 @@
+from api.conversation_state import ConversationState
+from api.prompts import PERSONA_AND_INSTRUCTIONS, compact_answer, compose_prompt
+from api.theme_state import ThemeState
+
+
+def _answered_states(answer_words: int):
+    questions = [f"Question number {n}?" for n in range(4)]
+    answer = "First sentence here. " + " ".join(["word"] * answer_words)
+    state = ConversationState(questions=questions, current_index=3, answers={0: answer, 1: answer, 2: answer})
+    theme_state = ThemeState(themes=["Exhaustion"], theme_questions=[questions])
+    theme_state.set_conversation_state(0, state)
+    return state, theme_state
+
+
+def test_stable_prefix_comes_first_and_message_last():
+    state, theme_state = _answered_states(5)
+    built = compose_prompt(state, theme_state, "my latest message")
+    assert built.text.startswith(PERSONA_AND_INSTRUCTIONS)
+    assert built.text.endswith("Last user message:\nmy latest message")
+    assert built.text.index("Survey:") < built.text.index("Previous questions") < built.text.index("Current question")
+    assert built.tokens > 0 and built.summarized == 0
+
+
+def test_history_is_compacted_to_budget_once():
+    state, theme_state = _answered_states(400)
+    calls = []
+
+    def summarize(answer):
+        calls.append(answer)
+        return compact_answer(answer)
+
+    built = compose_prompt(state, theme_state, "hi", history_tokens=600, summarize=summarize)
+    assert built.history_tokens <= 600
+    assert built.summarized == 2 and set(theme_state.summaries) == {"0:0", "0:1"}
+    assert theme_state.summaries["0:0"] == "First sentence here."
+
+    again = compose_prompt(state, theme_state, "hi again", history_tokens=600, summarize=summarize)
+    assert len(calls) == 2
+    assert again.text.split("Previous questions")[0] == built.text.split("Previous questions")[0]
+
+
+def test_oldest_answers_are_dropped_when_summaries_do_not_fit():
+    state, theme_state = _answered_states(400)
+    built = compose_prompt(state, theme_state, "hi", history_tokens=10)
+    assert built.omitted == 2
+    assert "(2 earlier answers omitted)" in built.text
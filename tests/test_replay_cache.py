@@ -0,0 +1,147 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from api.llm_client import set_async_client, set_client
+from api.replay_cache import (
+    IdempotencyMismatch, ReplayCache, TurnInProgress, get_replay_cache, idempotency_key,
+)
+from api.session_store import MemorySessionStore, set_session_store
+from tests.test_asgi import FakeAsyncClient, FakeAsyncCompletions, call_app, turn_body
+from tests.test_convo import FakeClient
+from tests.test_session_store import _post
+
+
+def test_key_comes_from_header_or_body():
+    assert idempotency_key(b"{}", "abc") == "abc"
+    assert idempotency_key(b'{"idempotency_key": "xyz"}') == "xyz"
+    assert idempotency_key(b"{}") is None
+    assert idempotency_key(b"not json") is None
+    with pytest.raises(ValueError):
+        idempotency_key(b"{}", "k" * 300)
+
+
+def test_finished_response_is_replayed():
+    cache = ReplayCache()
+    claim = cache.claim("k", b"body")
+    assert claim.owner
+    claim.finish(200, b"reply")
+    duplicate = cache.claim("k", b"body")
+    assert not duplicate.owner
+    assert duplicate.wait(0).body == b"reply"
+    assert cache.stats.replays == 1
+
+
+def test_key_reused_for_another_body_is_rejected():
+    cache = ReplayCache()
+    cache.claim("k", b"one").finish(200, b"reply")
+    with pytest.raises(IdempotencyMismatch):
+        cache.claim("k", b"two")
+
+
+def test_server_errors_and_releases_are_not_kept():
+    cache = ReplayCache()
+    failed = cache.claim("k", b"body")
+    failed.finish(500, b"boom")
+    assert cache.claim("k", b"body").owner
+    cache = ReplayCache()
+    cache.claim("k", b"body").release()
+    assert cache.claim("k", b"body").owner
+
+
+def test_entries_expire_and_stay_bounded():
+    cache = ReplayCache(ttl_seconds=-1)
+    cache.claim("k", b"body").finish(200, b"reply")
+    assert cache.claim("k", b"body").owner
+    cache = ReplayCache(max_entries=2)
+    for key in "abc":
+        cache.claim(key, b"body").finish(200, b"reply")
+    assert len(cache) == 2 and cache.claim("a", b"body").owner
+
+
+def test_duplicate_in_flight_waits_for_the_first():
+    cache = ReplayCache()
+    owner = cache.claim("k", b"body")
+    threading.Timer(0.05, owner.finish, (200, b"reply")).start()
+    duplicate = cache.claim("k", b"body")
+    assert cache.stats.waits == 1
+    assert duplicate.wait(2).body == b"reply"
+    cache.claim("slow", b"body")
+    with pytest.raises(TurnInProgress):
+        cache.claim("slow", b"body").wait(0.01)
+
+
+def test_http_retry_replays_without_model_calls():
+    store = MemorySessionStore()
+    set_session_store(store)
+    client = FakeClient()
+    set_client(client)
+    try:
+        _, started = _post({"template": "burnout", "content": "hi"})
+        turn = {"session_id": started["session_id"], "version": 2, "content": "Last week", "idempotency_key": "t-1"}
+        first = _post(turn)
+        calls = len(client.chat.completions.calls)
+        assert _post(turn) == first
+        assert len(client.chat.completions.calls) == calls
+        status, _ = _post(dict(turn, content="Something else"))
+        assert status == 422
+    finally:
+        set_client(None)
+        set_session_store(None)
+
+
+class SlowAsyncCompletions(FakeAsyncCompletions):
+    async def create(self, model, messages, **kwargs):
+        await asyncio.sleep(0.05)
+        return await super().create(model, messages, **kwargs)
+
+
+def test_concurrent_asgi_duplicates_run_the_turn_once():
+    client = FakeAsyncClient()
+    client.chat.completions = SlowAsyncCompletions()
+    set_async_client(client)
+    body = turn_body()
+    headers = [(b"idempotency-key", b"dup-1")]
+
+    async def both():
+        return await asyncio.gather(
+            asyncio.to_thread(call_app, "POST", body, headers),
+            asyncio.to_thread(call_app, "POST", body, headers),
+        )
+
+    try:
+        first, second = asyncio.run(both())
+    finally:
+        set_async_client(None)
+    assert first[0] == second[0] == 200
+    assert json.loads(first[2]) == json.loads(second[2])
+    assert len(client.chat.completions.calls) == 1
+    assert get_replay_cache().stats.claims == 1
+
+
+def test_concurrent_streamed_duplicate_replays_the_done_event():
+    client = FakeAsyncClient()
+    client.chat.completions = SlowAsyncCompletions()
+    set_async_client(client)
+    body = turn_body(stream=True)
+    headers = [(b"idempotency-key", b"dup-stream")]
+
+    async def both():
+        return await asyncio.gather(
+            asyncio.to_thread(call_app, "POST", body, headers),
+            asyncio.to_thread(call_app, "POST", body, headers),
+        )
+
+    try:
+        first, second = asyncio.run(both())
+    finally:
+        set_async_client(None)
+    streamed, replayed = sorted((first, second), key=lambda r: len(r[2]), reverse=True)
+    assert streamed[0] == replayed[0] == 200
+    assert replayed[1][b"content-type"] == b"text/event-stream"
+    assert replayed[2].startswith(b"event: done\n")
+    assert streamed[2].endswith(replayed[2])
+    assert len(client.chat.completions.calls) == 1
+    assert get_replay_cache().stats.claims == 1
@@ -0,0 +1,83 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import HTTPServer
+
+import pytest
+
+from api.convo import handler
+from api.llm_client import reset_client, set_client
+from api.session_store import (
+    MemorySessionStore, SessionConflict, SessionNotFound, SQLiteSessionStore, set_session_store,
+)
+from tests.test_convo import FakeClient
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemorySessionStore()
+    return SQLiteSessionStore(str(tmp_path / "sessions.db"))
+
+
+def test_versioned_saves_reject_stale_writers(store):
+    session_id, version = store.create({"n": 0})
+    assert store.save(session_id, {"n": 1}, version) == 2
+    with pytest.raises(SessionConflict):
+        store.save(session_id, {"n": 2}, version)
+    assert store.load(session_id) == ({"n": 1}, 2)
+    with pytest.raises(SessionNotFound):
+        store.load("missing")
+
+
+def test_sessions_expire(tmp_path):
+    for store in (MemorySessionStore(ttl_seconds=-1), SQLiteSessionStore(str(tmp_path / "s.db"), ttl_seconds=-1)):
+        session_id, _ = store.create({})
+        with pytest.raises(SessionNotFound):
+            store.load(session_id)
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemorySessionStore(max_sessions=1)
+    first, _ = store.create({})
+    store.create({})
+    with pytest.raises(SessionNotFound):
+        store.load(first)
+
+
+def _post(payload):
+    server = HTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.handle_request, daemon=True).start()
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{server.server_port}/", data=json.dumps(payload).encode()
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as exc:
+        return exc.code, json.loads(exc.read())
+    finally:
+        server.server_close()
+
+
+def test_handler_round_trips_session_token_only():
+    store = MemorySessionStore()
+    set_session_store(store)
+    set_client(FakeClient())
+    try:
+        status, body = _post({"template": "burnout", "content": "hi"})
+        assert status == 200 and body["version"] == 2
+        assert "theme_state" not in body and "state" not in body
+        status, body = _post({"session_id": body["session_id"], "version": 2, "content": "Last week"})
+        assert status == 200 and body["version"] == 3
+        payload, _ = store.load(body["session_id"])
+        assert payload["i"] == 1 and payload["c"]["1"][0] == 1
+
+        status, _ = _post({"session_id": body["session_id"], "version": 2, "content": "Last week"})
+        assert status == 409
+        status, _ = _post({"session_id": "nope", "content": "hi"})
+        assert status == 404
+    finally:
+        set_session_store(None)
+        reset_client()
@@ -0,0 +1,81 @@
+import asyncio
+
+from api.async_turn import speculative_turn_async
+from api.speculative import SpeculationStats, speculative_turn
+from tests.test_asgi import FakeAsyncClient
+from tests.test_convo import FakeClient, make_states
+
+
+def _answer_chitchat(client):
+    state, theme_state = make_states()
+    _, state, theme_state, _ = speculative_turn(state, theme_state, "hi", client=client, stats=SpeculationStats())
+    return state, theme_state
+
+
+def test_speculation_hit_uses_advanced_reply():
+    client = FakeClient(verdict="true")
+    state, theme_state = _answer_chitchat(client)
+    stats = SpeculationStats()
+    reply, state, theme_state, metrics = speculative_turn(
+        state, theme_state, "Last Tuesday, after a double shift.", client=client, stats=stats
+    )
+    assert metrics.speculated and metrics.hit
+    assert state.current_index == 1
+    assert theme_state.conversations[1] is state
+    assert stats.snapshot()["hits"] == 1
+
+
+def test_speculation_miss_keeps_question_and_counts_waste():
+    client = FakeClient(verdict="false")
+    state, theme_state = _answer_chitchat(client)
+    stats = SpeculationStats()
+    _, state, theme_state, metrics = speculative_turn(
+        state, theme_state, "I like turtles", client=client, generate_both=True, stats=stats
+    )
+    assert metrics.hit is False
+    assert state.current_index == 0 and state.did_answer is False
+    assert state.awaiting_answer is True
+    assert stats.hit_rate == 0.0 and stats.misses == 1
+
+
+def test_known_verdict_skips_speculation():
+    client = FakeClient(verdict="true")
+    state, theme_state = _answer_chitchat(client)
+    calls_before = len(client.chat.completions.calls)
+    _, state, _, metrics = speculative_turn(
+        state, theme_state, "hello", client=client, generate_both=True, stats=SpeculationStats()
+    )
+    assert not metrics.speculated and metrics.verdict is False
+    assert metrics.llm_calls == len(client.chat.completions.calls) - calls_before == 1
+    assert state.current_index == 0
+
+
+def test_llm_calls_match_the_calls_made():
+    client = FakeClient(verdict="true")
+    state, theme_state = _answer_chitchat(client)
+    calls_before = len(client.chat.completions.calls)
+    _, _, _, metrics = speculative_turn(
+        state, theme_state, "Last Tuesday, after a double shift.", client=client, generate_both=True,
+        stats=SpeculationStats(),
+    )
+    assert metrics.llm_calls == len(client.chat.completions.calls) - calls_before
+
+
+def test_async_speculation_counts_only_calls_made():
+    client = FakeAsyncClient(verdict="true")
+    state, theme_state = _answer_chitchat(FakeClient())
+
+    async def turns():
+        _, _, _, known = await speculative_turn_async(
+            state, theme_state, "hello", client=client, generate_both=True, stats=SpeculationStats()
+        )
+        _, _, _, speculated = await speculative_turn_async(
+            state, theme_state, "Last Tuesday, after a double shift.", client=client, generate_both=True,
+            stats=SpeculationStats(),
+        )
+        return known, speculated
+
+    known, speculated = asyncio.run(turns())
+    assert not known.speculated and known.llm_calls == 1
+    assert speculated.speculated
+    assert known.llm_calls + speculated.llm_calls == len(client.chat.completions.calls)
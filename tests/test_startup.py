@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+
+from api.startup import ROOT_DIR, compare, parse_importtime, read_asset
+
+
+def test_importing_convo_does_not_load_the_sdk():
+    code = "import sys, api.convo; print('openai' in sys.modules, 'httpx' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+    assert out.stdout.split() == ["False", "False"]
+
+
+def test_read_asset_ignores_working_directory(tmp_path, monkeypatch):
+    read_asset.cache_clear()
+    monkeypatch.chdir(tmp_path)
+    assert read_asset("burnout-prompt.txt").startswith("Core Identity")
+
+
+def test_parse_importtime():
+    stderr = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       120 |        120 |   api.timing",
+        "import time:      2000 |       3500 | api.convo",
+        "unrelated line",
+    ])
+    timings = parse_importtime(stderr)
+    assert [(t.module, t.depth) for t in timings] == [("api.timing", 1), ("api.convo", 0)]
+    assert timings[1].self_ms == 2.0 and timings[1].cumulative_ms == 3.5
+
+
+def test_compare_flags_slower_cold_start():
+    baseline = {"import_ms": 100.0, "init_ms": {"load_env": 2.0}}
+    report = {"import_ms": 180.0, "init_ms": {"load_env": 2.1, "llm_client": 500.0}}
+    assert compare(report, baseline, tolerance=0.5) == ["import_ms: 100.0 -> 180.0 (+80%)"]
+
+
+def test_dotenv_settings_reach_lazily_built_singletons(tmp_path, monkeypatch):
+    from api import startup
+    from api.prompts import history_budget
+    from api.verdict_cache import get_verdict_cache, set_verdict_cache
+
+    (tmp_path / ".env").write_text("NOORISH_VERDICT_CACHE_SIZE=7\nNOORISH_PROMPT_HISTORY_TOKENS=321\n")
+    monkeypatch.setattr(startup, "ROOT_DIR", tmp_path)
+    # dotenv writes to os.environ; give it a copy so nothing leaks into later tests.
+    monkeypatch.setattr(os, "environ", {k: v for k, v in os.environ.items() if not k.startswith("NOORISH_")})
+    startup.load_env.cache_clear()
+    set_verdict_cache(None)
+    try:
+        assert get_verdict_cache().max_entries == 7
+        assert history_budget() == 321
+    finally:
+        startup.load_env.cache_clear()
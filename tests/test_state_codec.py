@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from api.convo import handle_turn
+from api.state_codec import decode_compact, dump_response_state, encode_compact, load_request_state
+from api.survey_templates import BURNOUT_V1, SurveyTemplate, get_template, register_template
+from api.theme_state import ThemeState
+from tests.test_convo import FakeClient
+
+
+def _mid_survey():
+    theme_state = BURNOUT_V1.new_theme_state()
+    state = theme_state.get_conversation_state(0)
+    client = FakeClient()
+    for message in ("hi", "Last Tuesday, after a double shift"):
+        _, state, theme_state = handle_turn(state, theme_state, message, client=client)
+    return state, theme_state
+
+
+def test_compact_round_trip_is_lossless():
+    state, theme_state = _mid_survey()
+    encoded = json.loads(json.dumps(encode_compact(theme_state)))
+    decoded_state, decoded_theme = decode_compact(encoded)
+    assert json.dumps(decoded_theme.to_dict()) == json.dumps(theme_state.to_dict())
+    assert decoded_state.to_dict() == state.to_dict()
+    assert len(json.dumps(encoded)) < len(json.dumps(theme_state.to_dict())) / 3
+
+
+def test_legacy_payload_migrates_to_compact():
+    state, theme_state = _mid_survey()
+    legacy = theme_state.to_dict()
+    legacy.pop("template")
+    data = {
+        "conversation_state": json.dumps(state.to_dict()),
+        "theme_state": json.dumps(legacy),
+        "state_format": "compact",
+    }
+    _, loaded_theme, fmt = load_request_state(data)
+    assert fmt == "compact" and loaded_theme.template == "burnout@1"
+    assert dump_response_state(state, loaded_theme, fmt)["state"]["t"] == "burnout@1"
+
+
+def test_unregistered_survey_stays_legacy():
+    theme_state = ThemeState(themes=["x"], theme_questions=[["Q?"]])
+    state, theme_state, fmt = load_request_state({"theme_state": theme_state.to_dict(), "state_format": "compact"})
+    assert set(dump_response_state(state, theme_state, fmt)) == {"conversation_state", "theme_state"}
+
+
+def test_registry_lookup_and_version_checks():
+    assert get_template("burnout") is BURNOUT_V1
+    with pytest.raises(ValueError):
+        register_template(SurveyTemplate("burnout", 1, ["other"], [["Q?"]]))
+    with pytest.raises(ValueError):
+        decode_compact({"v": 99, "t": "burnout@1"})
@@ -0,0 +1,50 @@
+import json
+import threading
+import urllib.request
+from http.server import HTTPServer
+
+from api.convo import handler
+from api.llm_client import reset_client, set_client
+from api.streaming import encode_event, stream_turn
+from tests.test_convo import FakeClient, make_states
+
+
+def test_stream_turn_yields_deltas_then_final_state():
+    state, theme_state = make_states()
+    events = list(stream_turn(state, theme_state, "hi", client=FakeClient(reply="Nice to meet you.")))
+    assert events[-1]["type"] == "done"
+    deltas = "".join(e["content"] for e in events if e["type"] == "delta")
+    assert deltas == events[-1]["content"] == "Nice to meet you."
+    assert events[-1]["theme_state"]["current_theme_index"] == 1
+
+
+def test_encode_event_formats():
+    event = {"type": "delta", "content": "Hi"}
+    assert encode_event(event) == b'event: delta\ndata: {"content": "Hi"}\n\n'
+    assert json.loads(encode_event(event, "ndjson")) == event
+
+
+def test_handler_streams_sse_with_cors():
+    server = HTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.handle_request, daemon=True).start()
+    set_client(FakeClient(reply="Welcome aboard."))
+    try:
+        _, theme_state = make_states()
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{server.server_port}/",
+            data=json.dumps({"content": "hi", "theme_state": theme_state.to_dict(), "stream": True}).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=5) as response:
+            assert response.headers["Content-Type"] == "text/event-stream"
+            assert response.headers["Access-Control-Allow-Origin"] == "*"
+            body = response.read().decode()
+    finally:
+        reset_client()
+        server.server_close()
+    frames = [f for f in body.split("\n\n") if f]
+    assert frames[-1].startswith("event: done")
+    done = json.loads(frames[-1].split("data: ", 1)[1])
+    assert done["content"] == "Welcome aboard."
+    assert done["conversation_state"]["questions"] == ["When were you wiped out?", "What drains fastest?"]
+    assert done["usage"]["budget"] == "normal" and "session_tokens" in done["usage"]
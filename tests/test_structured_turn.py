@@ -0,0 +1,69 @@
+import json
+
+from api.convo import handle_turn
+from api.prompts import PERSONA_AND_INSTRUCTIONS
+from api.structured_turn import parse_structured_reply, structured_turn
+from tests.test_convo import FakeClient, make_states
+
+
+def _past_chitchat(client):
+    state, theme_state = make_states()
+    _, state, theme_state = handle_turn(state, theme_state, "hi", client=client)
+    return state, theme_state
+
+
+def test_parse_rejects_invalid_payloads():
+    assert parse_structured_reply('{"answered": true, "reply": "Thanks!"}') == (True, "Thanks!")
+    assert parse_structured_reply("not json") is None
+    assert parse_structured_reply('{"answered": "yes", "reply": "Thanks!"}') is None
+    assert parse_structured_reply('{"answered": false, "reply": ""}') is None
+
+
+def test_single_call_advances_on_answered_verdict():
+    client = FakeClient()
+    state, theme_state = _past_chitchat(client)
+    client.chat.completions.reply = json.dumps({"answered": True, "reply": "What drains you fastest?"})
+    calls_before = len(client.chat.completions.calls)
+    reply, state, _, metrics = structured_turn(state, theme_state, "Last Tuesday.", client=client)
+    assert reply == "What drains you fastest?"
+    assert state.current_index == 1
+    assert len(client.chat.completions.calls) == calls_before + 1
+    assert metrics["fallback"] is False
+
+
+def test_invalid_json_falls_back_to_two_calls():
+    client = FakeClient(verdict="false")
+    state, theme_state = _past_chitchat(client)
+    client.chat.completions.reply = "Sorry, could you say more?"
+    reply, state, _, metrics = structured_turn(state, theme_state, "hmm", client=client)
+    assert metrics["fallback"] is True
+    assert reply == "Sorry, could you say more?"
+    assert state.current_index == 0
+
+
+def test_prompt_carries_the_shared_context_once():
+    client = FakeClient()
+    state, theme_state = _past_chitchat(client)
+    client.chat.completions.reply = json.dumps({"answered": True, "reply": "What drains you fastest?"})
+    structured_turn(state, theme_state, "Last Tuesday.", client=client)
+    prompt = client.chat.completions.calls[-1][0]["content"]
+    assert prompt.count(PERSONA_AND_INSTRUCTIONS) == 1
+    assert prompt.count("Last user message:") == 1
+    assert "Current question you want them to answer next: What drains fastest?" in prompt
+    assert "Current question you want them to answer next: When were you wiped out?" in prompt
+
+
+def test_metrics_count_the_calls_made():
+    client = FakeClient(verdict="false")
+    state, theme_state = _past_chitchat(client)
+    client.chat.completions.reply = "Sorry, could you say more?"
+    calls_before = len(client.chat.completions.calls)
+    _, state, theme_state, metrics = structured_turn(state, theme_state, "hmm", client=client)
+    assert metrics["llm_calls"] == len(client.chat.completions.calls) - calls_before == 3
+
+    # A greeting is settled without the model, so only the reply is generated.
+    calls_before = len(client.chat.completions.calls)
+    _, state, _, metrics = structured_turn(state, theme_state, "hello", client=client)
+    assert metrics == {"llm_calls": 1, "fallback": False}
+    assert len(client.chat.completions.calls) == calls_before + 1
+    assert state.current_index == 0
@@ -0,0 +1,89 @@
+import json
+
+from api.burnout import burnout_zone, get_burnout, merge_theme_scores
+from api.convo import handle_turn
+from api.speculative import SpeculationStats, speculative_turn
+from api.state_codec import decode_compact, encode_compact
+from api.structured_turn import structured_turn
+from api.survey_templates import BURNOUT_V1
+from api.theme_scoring import ThemeScore, ThemeScorer, set_theme_scorer
+from tests.test_convo import FakeClient, make_states
+
+SCORE = json.dumps({"score": 4.0, "driver": "Workload and deadlines", "summary": "You said it's 'non-stop'."})
+
+
+def test_finished_theme_is_scored_in_background_and_stored_next_turn():
+    scorer = ThemeScorer(client=FakeClient(reply=SCORE))
+    set_theme_scorer(scorer)
+    state, theme_state = make_states()
+    client = FakeClient()
+    for message in ("hi", "Yesterday", "My patience"):
+        _, state, theme_state = handle_turn(state, theme_state, message, client=client)
+    assert state.complete and theme_state.theme_scores == {}
+    scorer.drain()
+    _, state, theme_state = handle_turn(state, theme_state, "thanks", client=client)
+    assert theme_state.theme_scores["1"]["dimension"] == "exhaustion"
+    assert theme_state.theme_scores["1"]["score"] == 4.0
+    # Scored themes are never sent again.
+    assert len(scorer.client.chat.completions.calls) == 1
+
+
+def test_same_answers_share_one_job():
+    scorer = ThemeScorer(client=FakeClient(reply=SCORE))
+    _, theme_state = make_states()
+    theme_state.conversations[1] = theme_state.conversations[0].__class__(
+        questions=theme_state.theme_questions[1], current_index=2, answers={0: "a", 1: "b"},
+    )
+    first = scorer.schedule(theme_state, 1)
+    assert scorer.schedule(theme_state, 1) is first
+
+
+def test_final_assessment_merges_precomputed_scores():
+    theme_state = BURNOUT_V1.new_theme_state()
+    for index, dimension, score in ((1, "exhaustion", 4.0), (2, "cynicism", 3.5), (3, "efficacy", 2.5)):
+        theme_state.themes_addressed[index] = theme_state.themes[index]
+        theme_state.theme_scores[str(index)] = ThemeScore(dimension, score, "Workload", "...").to_dict()
+    client = FakeClient(reply="unused")
+    state = theme_state.get_conversation_state(0)
+    result = json.loads(get_burnout(state, theme_state, client))
+    assert client.chat.completions.calls == []
+    assert result["score_percent"] == round((4.0 + 3.5 + 2.5) / 15 * 100)
+    assert "**Burnout** zone" in result["evaluation_markdown"]
+    assert "agree with your manager" in result["evaluation_markdown"]
+
+
+def test_zones():
+    assert burnout_zone(4, 4, 1) == "Burnout"
+    assert burnout_zone(4, 1, 4) == "Overextended"
+    assert burnout_zone(1, 4, 4) == "Disengaged"
+    assert burnout_zone(1, 1, 1) == "Ineffective"
+    assert burnout_zone(1, 1, 4) == "Engaged"
+    scores = {d: ThemeScore(d, 0.0, "", "ok") for d in ("exhaustion", "cynicism", "efficacy")}
+    assert merge_theme_scores(scores).score_percent == 33
+
+
+def test_scores_survive_compact_round_trip():
+    theme_state = BURNOUT_V1.new_theme_state()
+    theme_state.theme_scores["1"] = ThemeScore("exhaustion", 3.0, "", "x").to_dict()
+    _, decoded = decode_compact(encode_compact(theme_state))
+    assert decoded.theme_scores == theme_state.theme_scores
+
+
+def test_rejected_verdict_schedules_no_scoring_in_previewing_modes():
+    for mode in ("speculative", "structured"):
+        scorer = ThemeScorer(client=FakeClient(reply=SCORE))
+        set_theme_scorer(scorer)
+        state, theme_state = make_states()
+        client = FakeClient()
+        for message in ("hi", "Yesterday"):
+            _, state, theme_state = handle_turn(state, theme_state, message, client=client)
+        client.chat.completions.verdict = "false"
+        if mode == "speculative":
+            _, state, theme_state, _ = speculative_turn(
+                state, theme_state, "I like turtles", client=client, generate_both=True, stats=SpeculationStats()
+            )
+        else:
+            client.chat.completions.reply = json.dumps({"answered": False, "reply": "Could you say more?"})
+            _, state, theme_state, _ = structured_turn(state, theme_state, "I like turtles", client=client)
+        assert state.current_index == 1
+        assert scorer._jobs == {}, mode
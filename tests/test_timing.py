@@ -0,0 +1,55 @@
+import json
+import threading
+import urllib.request
+from http.server import HTTPServer
+
+from api import timing
+from api.convo import handler
+from api.llm_client import reset_client, set_client
+from api.survey_templates import BURNOUT_V1
+from bench.run_bench import parse_server_timing
+from tests.test_convo import FakeClient
+
+
+def test_spans_are_noops_outside_a_request():
+    with timing.span("anything"):
+        timing.annotate(ignored=True)
+    assert timing.current_timer() is None
+
+
+def test_spans_accumulate_and_render_server_timing():
+    with timing.timed_request() as timer:
+        for _ in range(2):
+            with timing.span("reply"):
+                pass
+        timing.annotate(model="m")
+    assert list(timer.stages) == ["reply"]
+    assert parse_server_timing(timer.server_timing()).keys() == {"reply"}
+    record = timer.record()
+    assert record["model"] == "m" and record["event"] == "turn"
+
+
+def test_handler_sends_server_timing_and_notifies_sinks():
+    records = []
+    timing.add_sink(records.append)
+    set_client(FakeClient())
+    server = HTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.handle_request, daemon=True)
+    thread.start()
+    try:
+        payload = {"content": "hi", "theme_state": BURNOUT_V1.new_theme_state().to_dict()}
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{server.server_port}/", data=json.dumps(payload).encode()
+        )
+        with urllib.request.urlopen(request, timeout=5) as response:
+            stages = parse_server_timing(response.headers["Server-Timing"])
+            response.read()
+        thread.join(5)
+    finally:
+        timing.remove_sink(records.append)
+        reset_client()
+        server.server_close()
+    assert {"parse", "load_state", "turn", "build_prompt", "reply", "serialize"} <= stages.keys()
+    (record,) = records
+    assert record["status"] == 200 and record["advanced"] is True
+    assert record["reply_model"] == "gpt-4o-mini" and record["prompt_tokens"] > 0
@@ -0,0 +1,195 @@
+import json
+from types import SimpleNamespace
+
+from api.conversation_state import ConversationState
+from api.convo import handle_turn, run_turn
+from api.llm_client import set_async_client
+from api.model_router import route
+from api.prompts import build_prompt
+from api.state_codec import decode_compact, encode_compact
+from api.survey_templates import BURNOUT_V1
+from api.theme_scoring import ThemeScorer, set_theme_scorer
+from api.timing import add_sink, remove_sink
+from api.usage import CHEAP, NORMAL, TEMPLATE, USAGE_TOTALS, TokenBudget, Usage, metered, record_usage
+from tests.test_asgi import FakeAsyncClient, FakeAsyncCompletions, call_app, turn_body
+from tests.test_convo import FakeClient, FakeCompletions, make_states
+
+
+def _usage(prompt_tokens: int, completion_tokens: int):
+    return SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+
+class MeteredCompletions(FakeCompletions):
+    """FakeCompletions that reports 10 prompt + 1 completion tokens per call, and records the model."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.models = []
+
+    def create(self, model, messages, **kwargs):
+        self.models.append(model)
+        response = super().create(model, messages, **kwargs)
+        response.usage = _usage(10, 1)
+        return response
+
+
+class MeteredClient(FakeClient):
+    def __init__(self, verdict: str = "true", reply: str = "Tell me more."):
+        self.chat = SimpleNamespace(completions=MeteredCompletions(verdict, reply))
+
+
+class MeteredAsyncCompletions(FakeAsyncCompletions):
+    async def create(self, model, messages, **kwargs):
+        response = await super().create(model, messages, **kwargs)
+        response.usage = _usage(10, 1)
+        return response
+
+
+def _burnout_states(usage=None):
+    theme_state = BURNOUT_V1.new_theme_state()
+    theme_state.usage = usage or {}
+    return theme_state.get_conversation_state(0), theme_state
+
+
+def test_budget_modes():
+    budget = TokenBudget(session=1000, cheap_at=0.75)
+    assert budget.mode(0) == NORMAL
+    assert budget.mode(750) == CHEAP
+    assert budget.mode(1000) == TEMPLATE
+    assert TokenBudget().mode(10 ** 9) == NORMAL
+
+
+def test_budget_from_env_ignores_malformed_values(monkeypatch):
+    monkeypatch.setenv("NOORISH_SESSION_TOKEN_BUDGET", "50k")
+    monkeypatch.setenv("NOORISH_TURN_TOKEN_BUDGET", "800")
+    monkeypatch.setenv("NOORISH_BUDGET_CHEAP_AT", "most")
+    assert TokenBudget.from_env() == TokenBudget(session=0, turn=800, cheap_at=0.75)
+
+
+def test_routed_calls_are_metered_by_kind_and_committed():
+    client = MeteredClient()
+    _, theme_state = _burnout_states({"classify": {"calls": 1, "prompt_tokens": 5, "completion_tokens": 1}})
+    before = USAGE_TOTALS.total().total_tokens
+    with metered(theme_state) as meter:
+        route(client, "classify", model="m", messages=[], max_tokens=1)
+        route(client, "reply", model="m", messages=[])
+    # Responses without usage (e.g. streams) are skipped.
+    record_usage("reply", SimpleNamespace(choices=[]))
+    assert meter.snapshot() == {
+        "classify": {"calls": 1, "prompt_tokens": 10, "completion_tokens": 1},
+        "reply": {"calls": 1, "prompt_tokens": 10, "completion_tokens": 1},
+    }
+    assert meter.summary()["session_tokens"] == 6 + 22
+    meter.commit(theme_state)
+    assert theme_state.usage["classify"] == {"calls": 2, "prompt_tokens": 15, "completion_tokens": 2}
+    assert USAGE_TOTALS.total().total_tokens - before == 22
+
+
+def test_usage_survives_the_compact_format():
+    _, theme_state = _burnout_states({"reply": Usage(1, 10, 1).to_dict()})
+    encoded = encode_compact(theme_state)
+    assert encoded["u"] == {"reply": {"calls": 1, "prompt_tokens": 10, "completion_tokens": 1}}
+    assert decode_compact(encoded)[1].usage == theme_state.usage
+    _, fresh = _burnout_states()
+    assert "u" not in encode_compact(fresh)
+
+
+def test_near_budget_replies_take_the_cheaper_route():
+    client = MeteredClient()
+    state, theme_state = _burnout_states({"reply": Usage(1, 80, 0).to_dict()})
+    with metered(theme_state, TokenBudget(session=100)) as meter:
+        run_turn("sequential", state, theme_state, "hello", client=client)
+    assert meter.mode == CHEAP
+    assert meter.snapshot().keys() == {"reply_lite"}
+    assert client.chat.completions.models == ["gpt-4.1-nano"]
+
+
+def test_near_budget_structured_turns_take_the_cheaper_route():
+    client = MeteredClient()
+    state, theme_state = _burnout_states({"reply": Usage(1, 80, 0).to_dict()})
+    with metered(theme_state, TokenBudget(session=1000)):
+        _, state, theme_state, _ = run_turn("sequential", state, theme_state, "hello", client=client)
+    client.chat.completions.reply = json.dumps({"answered": True, "reply": "What drains you fastest?"})
+    theme_state.usage = {"reply": Usage(1, 800, 0).to_dict()}
+    with metered(theme_state, TokenBudget(session=1000)) as meter:
+        _, _, _, metrics = run_turn("structured", state, theme_state, "Last Tuesday.", client=client)
+    assert meter.mode == CHEAP
+    assert metrics["structured"]["fallback"] is False
+    assert meter.snapshot().keys() == {"reply_lite"}
+
+
+def test_spent_budget_replies_from_templates():
+    client = MeteredClient()
+    state, theme_state = _burnout_states({"reply": Usage(1, 100, 0).to_dict()})
+    with metered(theme_state, TokenBudget(session=100)):
+        _, state, theme_state, _ = run_turn("sequential", state, theme_state, "hello", client=client)
+        reply, state, _, metrics = run_turn("structured", state, theme_state, "Last Tuesday.", client=client)
+    assert metrics["fast"] == {"llm_calls": 1, "templated": True}
+    assert state.current_index == 1
+    assert reply.endswith("?")
+    # Only the classifier ran.
+    assert client.chat.completions.models == ["gpt-4o-mini"]
+
+
+def test_turn_budget_trims_prompt_history():
+    _, theme_state = make_states()
+    theme_state.conversations[0].answers = {0: "hello " * 400}
+    # The latest answer is always kept verbatim; the older one can be cut.
+    state = ConversationState(questions=theme_state.theme_questions[1], answers={0: "Last week."})
+    theme_state.current_theme_index = 1
+    theme_state.set_conversation_state(1, state)
+    full = build_prompt(state, theme_state, "hi")
+    with metered(theme_state, TokenBudget(turn=600)):
+        trimmed = build_prompt(state, theme_state, "hi")
+    assert len(trimmed) < len(full)
+    assert "earlier answers omitted" in trimmed or "…" in trimmed
+
+
+def test_response_reports_usage_and_session_keeps_it():
+    client = FakeAsyncClient()
+    client.chat.completions = MeteredAsyncCompletions()
+    set_async_client(client)
+    try:
+        status, _, out = call_app("POST", turn_body(mode="sequential"))
+        first = json.loads(out)
+        body = json.dumps({"content": "Last Tuesday.", "theme_state": first["theme_state"]}).encode()
+        status, _, out = call_app("POST", body)
+    finally:
+        set_async_client(None)
+    data = json.loads(out)
+    assert status == 200
+    assert data["usage"]["budget"] == NORMAL
+    assert data["usage"]["turn"]["total_tokens"] == 22
+    assert data["usage"]["session_tokens"] == 11 + 22
+    assert data["theme_state"]["usage"]["reply"]["calls"] == 2
+
+
+def test_background_scoring_is_charged_to_the_session():
+    score = json.dumps({"score": 3.0, "driver": "Workload", "summary": "You said it's a lot."})
+    scorer = ThemeScorer(client=MeteredClient(reply=score))
+    set_theme_scorer(scorer)
+    state, theme_state = make_states()
+    client = FakeClient()
+    for message in ("hi", "Yesterday", "My patience"):
+        _, state, theme_state = handle_turn(state, theme_state, message, client=client)
+    scorer.drain()
+    assert "assessment" not in theme_state.usage
+    _, state, theme_state = handle_turn(state, theme_state, "thanks", client=client)
+    assert theme_state.theme_scores["1"]["score"] == 3.0
+    assert theme_state.usage["assessment"] == {"calls": 1, "prompt_tokens": 10, "completion_tokens": 1}
+
+
+def test_process_totals_are_on_the_log_line():
+    records = []
+    add_sink(records.append)
+    client = FakeAsyncClient()
+    client.chat.completions = MeteredAsyncCompletions()
+    set_async_client(client)
+    try:
+        call_app("POST", turn_body(mode="sequential"))
+    finally:
+        set_async_client(None)
+        remove_sink(records.append)
+    totals = records[-1]["usage_totals"]
+    assert totals["by_kind"]["reply"]["calls"] >= 1
+    assert totals["total_tokens"] >= 11
@@ -0,0 +1,39 @@
+from api.verdict_cache import (
+    SQLiteVerdictBackend, VerdictCache, classify_answer, pre_classify,
+)
+from tests.test_convo import FakeClient
+
+
+def test_pre_classifier_short_circuits_obvious_non_answers():
+    assert pre_classify("   ") is False
+    assert pre_classify("Hello there!") is False
+    assert pre_classify("I was exhausted.", accepted_answers=["i was exhausted"]) is False
+    assert pre_classify("I was exhausted after a double shift.") is None
+
+
+def test_repeated_pair_is_served_from_cache():
+    cache = VerdictCache()
+    client = FakeClient(verdict="true")
+    assert classify_answer(client, "Q?", "Last  Tuesday", cache=cache) is True
+    assert classify_answer(client, "q", "last tuesday.", cache=cache) is True
+    assert classify_answer(client, "Q?", "hi", cache=cache) is False
+    assert len(client.chat.completions.calls) == 1
+    assert cache.stats() == {"hits": 1, "misses": 1, "short_circuits": 1, "size": 1}
+
+
+def test_lru_evicts_and_ttl_expires():
+    cache = VerdictCache(max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, True)
+    assert cache.get("a") is None and cache.get("c") is True
+    expired = VerdictCache(ttl_seconds=-1)
+    expired.set("a", True)
+    assert expired.get("a") is None
+
+
+def test_shared_backend_survives_process_cache(tmp_path):
+    path = str(tmp_path / "verdicts.db")
+    VerdictCache(backend=SQLiteVerdictBackend(path)).set("k", False)
+    fresh = VerdictCache(backend=SQLiteVerdictBackend(path))
+    assert fresh.get("k") is False
+    assert fresh.stats()["hits"] == 1